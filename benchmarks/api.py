@@ -0,0 +1,132 @@
+"""Latency benchmarks for :class:`pyzabbix.ZabbixAPI`.
+
+Run from the repository root::
+
+    python -m benchmarks.api
+"""
+import json
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # python2
+    tracemalloc = None
+
+from pyzabbix import ZabbixAPI
+
+from tests.servers import FakeFrontend
+
+
+def run(call, count):
+    """Call `call` `count` times, return calls/sec."""
+
+    start = time.time()
+    for _ in range(count):
+        call()
+    return count / (time.time() - start)
+
+
+def peak_memory(call):
+    """Call `call` once, return peak bytes allocated during the call."""
+
+    if tracemalloc is None:
+        return float('nan')
+
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_overhead(count=2000, objects=100):
+    """Measure client CPU cost per call without network."""
+
+    result = [{'hostid': str(i), 'host': 'host{0}'.format(i),
+               'name': 'Host {0}'.format(i), 'status': '0'}
+              for i in range(objects)]
+    body = json.dumps({'jsonrpc': '2.0', 'result': result,
+                       'id': '1'}).encode()
+
+    with FakeFrontend() as frontend:
+        zapi = ZabbixAPI(frontend.url, use_keep_alive=True)
+    zapi._send = lambda request_json: body
+
+    rate = run(lambda: zapi.host.get(output='extend'), count)
+    print('overhead: host.get returning {0} hosts'.format(objects))
+    print('  {0:8.1f} us/call'.format(1e6 / rate))
+
+
+def bench_keep_alive(count=500):
+    """Compare calls/sec with and without keep-alive connection."""
+
+    print('keep-alive: {0} host.get calls'.format(count))
+    results = {'host.get': [{'hostid': '10084', 'host': 'Zabbix server'}]}
+
+    for use_ssl in (False, True):
+        with FakeFrontend(results, use_ssl=use_ssl) as frontend:
+            for use_keep_alive in (False, True):
+                with ZabbixAPI(frontend.url,
+                               use_keep_alive=use_keep_alive) as zapi:
+                    rate = run(zapi.host.get, count)
+                print('  {0:5} use_keep_alive={1!s:5} {2:8.0f} calls/sec'
+                      .format('https' if use_ssl else 'http',
+                              use_keep_alive, rate))
+
+
+def bench_response_size(sizes=(10, 1000, 50000), latency=0):
+    """Measure calls/sec, serialize and parse time and peak memory of
+    `do_request` and `get_id` for small and large `item.get` results."""
+
+    print('response size: item.get, rtt={0}ms'.format(latency * 1000))
+    for size in sizes:
+        count = max(5, 20000 // size)
+        with FakeFrontend(items=size, latency=latency,
+                          record=False) as frontend:
+            with ZabbixAPI(frontend.url, use_keep_alive=True) as zapi:
+                params = {'output': 'extend'}
+                request = zapi._prepare_request('item.get', params)
+                body = zapi._send(request)
+                get_id_body = zapi._send(zapi._prepare_request(
+                    *zapi._get_id_request('item')))
+
+                rates = (
+                    run(lambda: zapi.do_request('item.get', params), count),
+                    run(lambda: zapi.get_id('item'), count),
+                )
+
+                start = time.time()
+                for _ in range(count):
+                    json.dumps(request)
+                serialized = (time.time() - start) / count
+
+                start = time.time()
+                for _ in range(count):
+                    zapi._process_response(body, request)
+                parsed = (time.time() - start) / count
+
+                # Memory of the client alone, without the server thread
+                zapi._send = lambda request_json: body
+                peaks = [peak_memory(
+                    lambda: zapi.do_request('item.get', params))]
+                zapi._send = lambda request_json: get_id_body
+                peaks.append(peak_memory(lambda: zapi.get_id('item')))
+
+        print('  {0:6} items {1:9.0f} bytes {2:8.1f} do_request/sec '
+              '{3:8.1f} get_id/sec'.format(size, len(body), *rates))
+        print('  {0:6}       serialize {1:6.1f} us parse {2:9.1f} us '
+              'peak {3:7.2f} MB do_request {4:7.2f} MB get_id'.format(
+                  '', serialized * 1e6, parsed * 1e6,
+                  peaks[0] / 1048576.0, peaks[1] / 1048576.0))
+
+
+def main():
+    bench_overhead()
+    bench_keep_alive()
+    bench_response_size()
+
+
+if __name__ == '__main__':
+    main()
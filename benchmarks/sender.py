@@ -0,0 +1,304 @@
+"""Throughput benchmarks for :class:`pyzabbix.ZabbixSender`.
+
+Run from the repository root::
+
+    python -m benchmarks.sender
+"""
+import time
+
+from pyzabbix import (MetricBatch, RoutingZabbixSender, ZabbixMetric,
+                      ZabbixSender, protocol)
+from pyzabbix.sender import COALESCE_POLICIES, coalesce
+
+from tests.servers import FakeTrapper
+
+
+# CPU time of the calling thread, the fake trapper runs in other threads
+thread_time = getattr(time, 'thread_time', None) or \
+    getattr(time, 'process_time', time.time)
+
+
+def make_metrics(count, host='host', value='42'):
+    return [ZabbixMetric(host, 'key[{0}]'.format(i), value, 1500000000)
+            for i in range(count)]
+
+
+def numeric_metrics(count):
+    return [ZabbixMetric('host', 'key[{0}]'.format(i), i * 0.5, 1500000000)
+            for i in range(count)]
+
+
+def text_metrics(count):
+    value = 'log line of a long text value ' * 34
+    return make_metrics(count, value=value)
+
+
+def escape_metrics(count):
+    value = u'"quoted" C:\\path\ttab\nnew line \u00e9t\u00e9 \U0001f600'
+    return make_metrics(count, value=value)
+
+
+def hosts_metrics(count):
+    return [ZabbixMetric('host-{0}.example.com'.format(i), 'agent.ping', 1,
+                         1500000000)
+            for i in range(count)]
+
+
+#: Payload shapes of :func:`bench_throughput`
+SHAPES = (
+    ('numeric', numeric_metrics),
+    ('long text', text_metrics),
+    ('escapes', escape_metrics),
+    ('many hosts', hosts_metrics),
+)
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of sorted `values`."""
+
+    index = int(round(percent / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(index, len(values) - 1))]
+
+
+def run(sender, metrics, rounds=1):
+    """Send `metrics` `rounds` times, return elapsed seconds."""
+
+    start = time.time()
+    for _ in range(rounds):
+        sender.send(metrics)
+    return time.time() - start
+
+
+def bench_encode(count=100000, chunk_size=250):
+    """Measure CPU cost of building packets per metric."""
+
+    metrics = make_metrics(count)
+    zs = ZabbixSender(chunk_size=chunk_size)
+
+    def per_message(chunk):
+        return zs._create_request(zs._create_messages(chunk))
+
+    print('encode: {0} metrics, chunk_size={1}'.format(count, chunk_size))
+    for name, encode in (('per-message json', per_message),
+                         ('_encode_request', zs._encode_request)):
+        start = time.time()
+        for m in range(0, count, chunk_size):
+            zs._create_packet(encode(metrics[m:m + chunk_size]))
+        elapsed = time.time() - start
+        print('  {0:18} {1:8.2f} us/metric'.format(name,
+                                                   elapsed / count * 1e6))
+
+
+def bench_batch(count=100000, chunk_size=250, repeat=5):
+    """Compare building and encoding metrics as objects and as columns.
+
+    Each figure is the best of ``repeat`` runs.
+    """
+
+    keys = ['key[{0}]'.format(i) for i in range(count)]
+    values = [i * 0.5 for i in range(count)]
+    zs = ZabbixSender(chunk_size=chunk_size)
+
+    def objects():
+        return [ZabbixMetric('host', k, v, 1500000000)
+                for k, v in zip(keys, values)]
+
+    def columns():
+        return MetricBatch('host', keys, values, 1500000000)
+
+    print('batch: {0} values of one host, chunk_size={1}'.format(
+        count, chunk_size))
+    for name, build in (('ZabbixMetric list', objects),
+                        ('MetricBatch', columns)):
+        build_times, encode_times = [], []
+        for _ in range(repeat):
+            start = time.time()
+            metrics = build()
+            built = time.time()
+            for m in range(0, count, chunk_size):
+                zs._create_packet(
+                    zs._encode_request(metrics[m:m + chunk_size]))
+            build_times.append(built - start)
+            encode_times.append(time.time() - built)
+        totals = [b + e for b, e in zip(build_times, encode_times)]
+        print('  {0:18} build {1:5.2f}, encode {2:5.2f}, total {3:5.2f} '
+              'us/metric'.format(name, min(build_times) / count * 1e6,
+                                 min(encode_times) / count * 1e6,
+                                 min(totals) / count * 1e6))
+
+
+def bench_compression(count=100000, chunk_size=250):
+    """Measure bytes on the wire and CPU cost per chunk of compression."""
+
+    metrics = make_metrics(count)
+    chunks = [metrics[m:m + chunk_size] for m in range(0, count, chunk_size)]
+    print('compression: {0} chunks x {1} metrics'.format(len(chunks),
+                                                         chunk_size))
+
+    for level in (None, 1, 6, 9):
+        zs = ZabbixSender(chunk_size=chunk_size, compression=bool(level),
+                          compression_level=level or 6)
+        sent = 0
+        start = time.time()
+        for chunk in chunks:
+            sent += len(zs._create_packet(zs._encode_request(chunk)))
+        elapsed = time.time() - start
+
+        # Decoding cost of a reply as compressed as the request
+        reply = b'{"response":"success","info":"processed: 250; failed: 0;' \
+                b' total: 250; seconds spent: 0.000050"}'
+        header, body = None, reply
+        if level:
+            packet = protocol.pack(reply, level)
+            header = protocol.unpack_header(packet[:protocol.HEADER_SIZE])
+            body = packet[protocol.HEADER_SIZE:]
+        decode_start = time.time()
+        for _ in chunks:
+            zs._decode_response(
+                protocol.unpack_data(body, header and header[2]))
+        decoded = time.time() - decode_start
+
+        print('  level={0!s:4} {1:8.0f} bytes/chunk {2:8.1f} us/chunk '
+              'encode {3:5.1f} us/chunk decode'.format(
+                  level, sent / len(chunks), elapsed / len(chunks) * 1e6,
+                  decoded / len(chunks) * 1e6))
+
+
+def bench_pool(chunks=2000, chunk_size=10):
+    """Compare chunks/sec with and without the connection pool."""
+
+    metrics = make_metrics(chunks * chunk_size)
+    print('pool: {0} chunks x {1} metrics'.format(chunks, chunk_size))
+
+    for keepalive in (False, True):
+        with FakeTrapper(keepalive=keepalive) as trapper:
+            host, port = trapper.server_address
+            for use_pool in (False, True):
+                with ZabbixSender(host, port, chunk_size=chunk_size,
+                                  use_pool=use_pool) as zs:
+                    elapsed = run(zs, metrics)
+                print('  keepalive={0!s:5} use_pool={1!s:5} '
+                      '{2:10.0f} chunks/sec'.format(
+                          keepalive, use_pool, chunks / elapsed))
+
+
+def bench_workers(count=10000, chunk_size=250, latency=0.005):
+    """Compare flush time of serial and parallel chunk dispatch."""
+
+    metrics = make_metrics(count)
+    print('workers: {0} metrics, chunk_size={1}, rtt={2}ms'.format(
+        count, chunk_size, latency * 1000))
+
+    with FakeTrapper(latency=latency) as trapper:
+        host, port = trapper.server_address
+        for workers in (1, 4, 16, 40):
+            with ZabbixSender(host, port, chunk_size=chunk_size,
+                              workers=workers) as zs:
+                elapsed = run(zs, metrics)
+            print('  workers={0:<3} {1:8.1f} ms/flush'.format(
+                workers, elapsed * 1000))
+
+
+def bench_throughput(count=50000, chunk_sizes=(50, 250, 1000, 5000)):
+    """Measure metrics/sec, chunk latency and CPU cost per metric of sending
+    chunks of different size and payload to a local trapper."""
+
+    print('throughput: {0} metrics'.format(count))
+    with FakeTrapper(record=False) as trapper:
+        host, port = trapper.server_address
+        for shape, build in SHAPES:
+            metrics = build(count)
+            for chunk_size in chunk_sizes:
+                zs = ZabbixSender(host, port, chunk_size=chunk_size)
+                latencies = []
+                start = time.time()
+                cpu_start = thread_time()
+                for m in range(0, count, chunk_size):
+                    chunk_start = time.time()
+                    zs._chunk_send(metrics[m:m + chunk_size])
+                    latencies.append(time.time() - chunk_start)
+                cpu = thread_time() - cpu_start
+                elapsed = time.time() - start
+
+                latencies.sort()
+                print('  {0:10} chunk_size={1:<5} {2:9.0f} metrics/sec '
+                      'p50 {3:7.2f} ms p99 {4:7.2f} ms '
+                      '{5:5.2f} us cpu/metric'.format(
+                          shape, chunk_size, count / elapsed,
+                          percentile(latencies, 50) * 1000,
+                          percentile(latencies, 99) * 1000,
+                          cpu / count * 1e6))
+
+
+def bench_adaptive(count=50000, latency=0.02):
+    """Compare flush time of fixed and adaptive chunk size over a link
+    with round trip time `latency`."""
+
+    metrics = make_metrics(count)
+    print('adaptive: {0} metrics, rtt={1}ms'.format(count, latency * 1000))
+
+    with FakeTrapper(latency=latency, record=False) as trapper:
+        host, port = trapper.server_address
+        for adaptive in (False, True):
+            zs = ZabbixSender(host, port, adaptive_chunk_size=adaptive)
+            elapsed = run(zs, metrics)
+            sizes = [size for _, size, _ in zs.chunk_size_history]
+            print('  adaptive={0!s:5} {1:8.1f} ms/flush sizes {2}'.format(
+                adaptive, elapsed * 1000, sizes or [zs.chunk_size]))
+
+
+def bench_routing(proxies=40, count=20000, latency=0.005):
+    """Compare flush time of routing to proxies one by one and at once."""
+
+    metrics = [ZabbixMetric('host{0}'.format(i % (proxies * 10)),
+                            'key[{0}]'.format(i), i, 1500000000)
+               for i in range(count)]
+    print('routing: {0} metrics over {1} proxies, rtt={2}ms'.format(
+        count, proxies, latency * 1000))
+
+    trappers = [FakeTrapper(latency=latency, record=False).start()
+                for _ in range(proxies)]
+    try:
+        routes = dict(('host{0}'.format(i), trappers[i % proxies]
+                       .server_address) for i in range(proxies * 10))
+        for workers in (1, 8, proxies):
+            with RoutingZabbixSender(routes, workers=workers) as zs:
+                elapsed = run(zs, metrics)
+            print('  workers={0:<3} {1:8.1f} ms/flush'.format(
+                workers, elapsed * 1000))
+    finally:
+        for trapper in trappers:
+            trapper.stop()
+
+
+def bench_coalesce(count=100000, keys=10000):
+    """Measure CPU cost per metric of coalescing `count` values of `keys`
+    distinct keys."""
+
+    metrics = [ZabbixMetric('host', 'key[{0}]'.format(i % keys), i * 0.5,
+                            1500000000)
+               for i in range(count)]
+    print('coalesce: {0} values of {1} keys'.format(count, keys))
+
+    for policy in COALESCE_POLICIES:
+        start = time.time()
+        result, merged = coalesce(metrics, policy)
+        elapsed = time.time() - start
+        print('  {0:8} {1:6.2f} us/metric {2:7} sent {3:7} merged'.format(
+            policy, elapsed / count * 1e6, len(result), merged))
+
+
+def main():
+    bench_encode()
+    bench_batch()
+    bench_compression()
+    bench_pool()
+    bench_workers()
+    bench_throughput()
+    bench_adaptive()
+    bench_routing()
+    bench_coalesce()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,7 @@
 from .api import ZabbixAPI, ZabbixAPIException, ssl_context_compat
-from .sender import ZabbixMetric, ZabbixSender, ZabbixResponse
+from .cache import ZabbixAPICache
+from .sender import (MetricBatch, ZabbixMetric, ZabbixSender, ZabbixResponse,
+                     ZabbixSenderException)
+from .buffered import BufferedZabbixSender
+from .routing import RoutingZabbixSender
+from .spool import ZabbixSpool
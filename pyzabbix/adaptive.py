@@ -0,0 +1,175 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright © 2014 Alexey Dubkov
+#
+# This file is part of py-zabbix.
+#
+# Py-zabbix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Py-zabbix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with py-zabbix. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import socket
+import threading
+import time
+from collections import deque
+
+from .logger import NullHandler
+
+null_handler = NullHandler()
+logger = logging.getLogger(__name__)
+logger.addHandler(null_handler)
+
+
+class AdaptiveChunkSize(object):
+    """The :class:`AdaptiveChunkSize` tunes number of metrics per chunk by
+    how fast chunks are delivered.
+
+    Every chunk is aimed to take from half of `target` to `target` seconds
+    from sending it to the reply:
+
+    - faster chunk means idle link, so size grows up to twice at once
+    - slower chunk shrinks size proportionally, at most by half
+    - if Zabbix spent much more time per value than it used to, as it
+      reports in `seconds spent`, server or proxy is loaded and size
+      shrinks by a quarter
+    - network error or timeout halves size
+
+    Size always stays between `min_size` and `max_size`. Every change is
+    recorded in :attr:`history`.
+
+    :type size: int
+    :param size: Initial chunk size.
+
+    :type min_size: int
+    :param min_size: Minimum chunk size. Default: 10
+
+    :type max_size: int
+    :param max_size: Maximum chunk size. Default: 10000
+
+    :type target: float
+    :param target: Seconds a chunk should take at most. Default: 0.5
+
+    :type history_size: int
+    :param history_size: Number of last changes kept in :attr:`history`.
+        Default: 100
+    """
+
+    #: Maximum growth and shrink factors of one step
+    GROWTH = 2.0
+    SHRINK = 0.5
+    #: Shrink factor if server is loaded
+    LOAD_SHRINK = 0.75
+    #: Server is loaded if it spends that many times more per value than
+    #: its best recent time
+    LOAD_FACTOR = 3.0
+    #: Server time below that is too coarse to tell load
+    MIN_SERVER_TIME = 0.001
+    #: Best server time per value is forgotten by that factor every chunk
+    BASELINE_DECAY = 1.05
+
+    def __init__(self, size=250, min_size=10, max_size=10000, target=0.5,
+                 history_size=100):
+        if not 0 < min_size <= max_size:
+            raise ValueError('Chunk size bounds must be 0 < min <= max')
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target = float(target)
+        self.size = self._clamp(size)
+        self.history = deque(maxlen=history_size)
+        self.history.append((time.time(), self.size, 'initial'))
+        self._baseline = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Represent detailed AdaptiveChunkSize view."""
+
+        return '<{0} size={1} bounds={2}..{3}>'.format(
+            self.__class__.__name__, self.size, self.min_size, self.max_size)
+
+    def _clamp(self, size):
+        return int(max(self.min_size, min(size, self.max_size)))
+
+    def _resize(self, factor, reason):
+        """Multiply size by `factor` and record the change.
+
+        Must be called with `self._lock` held.
+        """
+
+        size = self._clamp(self.size * factor)
+        if size == self.size:
+            return
+
+        logger.debug('Chunk size %d -> %d: %s', self.size, size, reason)
+        self.size = size
+        self.history.append((time.time(), size, reason))
+
+    def _loaded(self, count, seconds):
+        """Check that server spent much more time per value than its best.
+
+        Must be called with `self._lock` held.
+        """
+
+        if seconds is None or seconds < self.MIN_SERVER_TIME:
+            return False
+
+        per_value = seconds / count
+        baseline = self._baseline
+        if baseline is None:
+            self._baseline = per_value
+            return False
+
+        self._baseline = min(per_value, baseline * self.BASELINE_DECAY)
+        return per_value > baseline * self.LOAD_FACTOR
+
+    def success(self, count, elapsed, seconds=None):
+        """Adjust size after chunk was delivered.
+
+        :type count: int
+        :param count: Number of metrics in the chunk.
+
+        :type elapsed: float
+        :param elapsed: Seconds from sending the chunk to the reply.
+
+        :type seconds: float
+        :param seconds: Seconds Zabbix spent on the chunk, by its reply.
+        """
+
+        if not count:
+            return
+
+        with self._lock:
+            if count < self.size and elapsed < self.target:
+                # Last chunk of a send, smaller than the others, tells
+                # nothing about room for bigger ones
+                return
+
+            loaded = self._loaded(count, seconds)
+            if elapsed > self.target:
+                self._resize(max(self.SHRINK, self.target / elapsed), 'slow')
+            elif loaded:
+                self._resize(self.LOAD_SHRINK, 'loaded')
+            elif elapsed < self.target / 2:
+                growth = self.target / 2 / max(elapsed, 1e-6)
+                self._resize(min(self.GROWTH, growth), 'idle')
+
+    def failure(self, error):
+        """Halve size after chunk was not delivered.
+
+        :type error: :class:`Exception`
+        :param error: Network error of the chunk.
+        """
+
+        reason = 'timeout' if isinstance(error, socket.timeout) else 'failure'
+        with self._lock:
+            self._resize(self.SHRINK, reason)
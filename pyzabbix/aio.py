@@ -0,0 +1,688 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright © 2014 Alexey Dubkov
+#
+# This file is part of py-zabbix.
+#
+# Py-zabbix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Py-zabbix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with py-zabbix. If not, see <http://www.gnu.org/licenses/>.
+"""asyncio clients. Requires Python 3.5+, so it is not imported by
+:mod:`pyzabbix` itself:
+
+>>> from pyzabbix.aio import AsyncZabbixAPI, AsyncZabbixSender
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import ssl
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from .api import ZabbixAPI, ZabbixAPIException, ZabbixAPIObjectClass
+from .logger import NullHandler, HideSensitiveFilter, HideSensitiveService
+from . import protocol
+from .sender import ZabbixResponse, ZabbixSender, ZabbixSenderException
+from .version import __version__
+
+null_handler = NullHandler()
+logger = logging.getLogger(__name__)
+logger.addHandler(null_handler)
+logger.addFilter(HideSensitiveFilter())
+
+
+class AsyncZabbixSender(ZabbixSender):
+    """The :class:`AsyncZabbixSender` send metrics to Zabbix server from
+    asyncio code.
+
+    Packets are built and responses parsed the same way as in
+    :class:`pyzabbix.sender.ZabbixSender`, only network I/O is done with
+    :func:`asyncio.open_connection`.
+
+    :type zabbix_server: str
+    :param zabbix_server: Zabbix server ip address. Default: `127.0.0.1`
+
+    :type zabbix_port: int
+    :param zabbix_port: Zabbix server port. Default: `10051`
+
+    :type use_config: str
+    :param use_config: Path to zabbix_agentd.conf file to load settings from.
+         If value is `True` then default config path will used:
+         /etc/zabbix/zabbix_agentd.conf
+
+    :type chunk_size: int
+    :param chunk_size: Number of metrics send to the server at one time
+
+    :type ssl_context: :class:`ssl.SSLContext`
+    :param ssl_context: Context to wrap connections in TLS. Default: `None`
+
+    :type timeout: int
+    :param timeout: Number of seconds before exchange with Zabbix server
+         times out. Default: 10
+
+    :type concurrency: int
+    :param concurrency: Number of chunks sent at the same time. If it is
+         greater than 1, a failed chunk does not stop the others and
+         :class:`pyzabbix.sender.ZabbixSenderException` is raised after all
+         chunks are done. Default: 1
+
+    :type compression: bool
+    :param compression: Compress packets with zlib. Default: `False`
+
+    :type compression_level: int
+    :param compression_level: zlib compression level. Default: 6
+
+    :type max_packet_size: int
+    :param max_packet_size: Maximum size in bytes of a request or a reply.
+         Default: 1 GB
+
+    :type request_clock: bool
+    :param request_clock: Stamp every chunk with `clock` and `ns` of the
+         time it is sent. Default: `False`
+
+    :type dispatch: str or :class:`pyzabbix.dispatch.Dispatcher`
+    :param dispatch: How chunks are spread over servers, see
+         :class:`pyzabbix.sender.ZabbixSender`. Default: `'broadcast'`
+
+    >>> from pyzabbix import ZabbixMetric
+    >>> from pyzabbix.aio import AsyncZabbixSender
+    >>> zbx = AsyncZabbixSender('127.0.0.1', concurrency=8)
+    >>> await zbx.send([ZabbixMetric('localhost', 'cpu[usage]', 20)])
+    """
+
+    def __init__(self,
+                 zabbix_server='127.0.0.1',
+                 zabbix_port=10051,
+                 use_config=None,
+                 chunk_size=250,
+                 ssl_context=None,
+                 timeout=10,
+                 concurrency=1,
+                 compression=False,
+                 compression_level=6,
+                 max_packet_size=protocol.MAX_PACKET_SIZE,
+                 request_clock=False,
+                 dispatch='broadcast'):
+
+        super(AsyncZabbixSender, self).__init__(
+            zabbix_server=zabbix_server,
+            zabbix_port=zabbix_port,
+            use_config=use_config,
+            chunk_size=chunk_size,
+            timeout=timeout,
+            compression=compression,
+            compression_level=compression_level,
+            max_packet_size=max_packet_size,
+            request_clock=request_clock,
+            dispatch=dispatch)
+
+        self.ssl_context = ssl_context
+        self.concurrency = concurrency
+
+    async def _exchange(self, host_addr, packet):
+        """Send packet over a new connection and read the response.
+
+        :rtype: dict
+        :return: Response from zabbix server or False in case of error.
+        """
+
+        host, port = host_addr
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self.ssl_context)
+
+        try:
+            writer.write(packet)
+            await writer.drain()
+
+            try:
+                response_header = await reader.readexactly(5)
+                size = protocol.header_size(response_header)
+                if size is not None:
+                    response_header += await reader.readexactly(size - 5)
+            except asyncio.IncompleteReadError as err:
+                response_header = err.partial
+            logger.debug('Response header: %s', response_header)
+
+            header = protocol.unpack_header(response_header,
+                                            self.max_packet_size)
+            if header is None:
+                logger.debug('Zabbix return not valid response.')
+                return False
+
+            _, response_len, uncompressed_len = header
+            response_body = await reader.readexactly(response_len)
+            return self._decode_response(
+                protocol.unpack_data(response_body, uncompressed_len))
+        finally:
+            writer.close()
+
+    async def _send_packet(self, host_addr, packet):
+        """Send packet to zabbix server within `self.timeout`.
+
+        :type host_addr: tuple
+        :param host_addr: Zabbix server `(host, port)`.
+
+        :type packet: bytes
+        :param packet: Data packet for zabbix.
+
+        :rtype: dict
+        :return: Response from zabbix server or False in case of error.
+        """
+
+        try:
+            return await asyncio.wait_for(
+                self._exchange(host_addr, packet), self.timeout)
+        except asyncio.TimeoutError:
+            logger.error('Sending failed: Connection to %s timed out after'
+                         '%d seconds', host_addr, self.timeout)
+            raise socket.timeout
+        except (OSError, asyncio.IncompleteReadError) as err:
+            logger.warning('Sending failed: %s', err)
+            raise socket.error(err)
+
+    async def _chunk_send(self, metrics):
+        """Send the one chunk metrics to zabbix server.
+
+        :type metrics: list
+        :param metrics: List of :class:`zabbix.sender.ZabbixMetric` to send
+            to Zabbix
+
+        :rtype: dict
+        :return: Response from Zabbix Server
+        """
+        request = self._encode_request(metrics)
+        packet = self._create_packet(request)
+
+        delivery = self.dispatcher.delivery(self.zabbix_uri)
+        for host_addr in delivery:
+            start = time.time()
+            try:
+                response = await self._send_packet(host_addr, packet)
+            except socket.error as err:
+                delivery.failure(host_addr, err)
+                continue
+            delivery.success(host_addr, time.time() - start, response)
+
+        return delivery.result()
+
+    async def send(self, metrics):
+        """Send the metrics to zabbix server.
+
+        Metrics are sent by chunks as they are read, so a generator could be
+        passed to send any number of metrics in constant memory.
+
+        :type metrics: iterable
+        :param metrics: List, generator or any other iterable of
+            :class:`zabbix.sender.ZabbixMetric`, or
+            :class:`pyzabbix.sender.MetricBatch` to send to Zabbix
+
+        :rtype: :class:`pyzabbix.sender.ZabbixResponse`
+        :return: Parsed response from Zabbix Server
+        """
+        result = ZabbixResponse()
+        if self.concurrency <= 1:
+            for chunk in self._chunks(metrics):
+                result.parse(await self._chunk_send(chunk))
+            return result
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded_chunk_send(chunk):
+            async with semaphore:
+                return await self._chunk_send(chunk)
+
+        async def collect(index, chunk, task):
+            try:
+                result.parse(await task)
+            except Exception as err:
+                logger.warning('Chunk %d failed: %r', index, err)
+                result.add_error(index, err, len(chunk))
+
+        # No more than two chunks per connection are built ahead of sending
+        pending = deque()
+        for index, chunk in enumerate(self._chunks(metrics)):
+            pending.append((index, chunk, asyncio.ensure_future(
+                bounded_chunk_send(chunk))))
+            if len(pending) >= self.concurrency * 2:
+                await collect(*pending.popleft())
+
+        while pending:
+            await collect(*pending.popleft())
+
+        if result.errors:
+            raise ZabbixSenderException(result)
+
+        return result
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+
+class AsyncHTTPConnectionPool(object):
+    """Minimal HTTP/1.1 client which keeps connections to one server open
+    between requests.
+
+    :type url: str
+    :param url: URL requests are posted to.
+
+    :type ssl_context: :class:`ssl.SSLContext`
+    :param ssl_context: Context for `https` URLs. By default certificates
+        are not verified, the same as in :class:`pyzabbix.api.ZabbixAPI`.
+
+    :type maxsize: int
+    :param maxsize: Maximum number of connections. Default: 10
+
+    :type timeout: int
+    :param timeout: Number of seconds before request times out. Default: 30
+    """
+
+    def __init__(self, url, ssl_context=None, maxsize=10, timeout=30):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.path = parts.path or '/'
+        if parts.query:
+            self.path += '?' + parts.query
+
+        if parts.scheme == 'https' and ssl_context is None:
+            ssl_context = ssl.create_default_context()
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+        self.ssl_context = ssl_context if parts.scheme == 'https' else None
+
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._idle = []
+        self._semaphore = None
+
+    async def _exchange(self, reader, writer, head, body):
+        """Write request and read response from the connection.
+
+        :rtype: tuple
+        :return: Status, reason, body and flag if connection can be reused.
+
+        :raises protocol.ConnectionClosed: If connection was closed or reset
+            before the first byte of response.
+        """
+
+        try:
+            writer.write(head + body)
+            await writer.drain()
+            status_line = await reader.readline()
+        except (BrokenPipeError, ConnectionResetError) as err:
+            raise protocol.ConnectionClosed(
+                'Connection reset before reply: {0}'.format(err))
+        if not status_line:
+            raise protocol.ConnectionClosed('Connection closed before reply')
+
+        parts = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        version, status = parts[0], int(parts[1])
+        reason = parts[2] if len(parts) > 2 else ''
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.1':
+            keep_alive = connection != 'close'
+        else:
+            keep_alive = connection == 'keep-alive'
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b';')[0].strip(), 16)
+                if size == 0:
+                    # Skip trailer
+                    while await reader.readline() not in (b'\r\n', b'\n',
+                                                          b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            res_body = b''.join(chunks)
+        elif 'content-length' in headers:
+            res_body = await reader.readexactly(
+                int(headers['content-length']))
+        else:
+            res_body = await reader.read()
+            keep_alive = False
+
+        return status, reason, res_body, keep_alive
+
+    async def request(self, body, headers):
+        """POST `body` to the server.
+
+        Idle connection could be closed by the server in the meantime, so
+        if reused connection turns out to be closed before any reply, the
+        request is sent once more over a new one. Timeouts and errors after
+        the reply was started are never retried, since the server could
+        have already done the request.
+
+        :type body: bytes
+        :param body: Request body.
+
+        :type headers: dict
+        :param headers: Request headers.
+
+        :rtype: tuple
+        :return: HTTP status, reason and response body.
+        """
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.maxsize)
+
+        head = ['POST {0} HTTP/1.1'.format(self.path),
+                'Host: {0}:{1}'.format(self.host, self.port),
+                'Content-Length: {0}'.format(len(body))]
+        head.extend('{0}: {1}'.format(k, v) for k, v in headers.items())
+        head = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1')
+
+        async with self._semaphore:
+            while True:
+                reused = False
+                while self._idle:
+                    reader, writer = self._idle.pop()
+                    if not reader.at_eof():
+                        reused = True
+                        break
+                    writer.close()
+
+                if not reused:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port,
+                                                ssl=self.ssl_context),
+                        self.timeout)
+
+                try:
+                    status, reason, res_body, keep_alive = \
+                        await asyncio.wait_for(
+                            self._exchange(reader, writer, head, body),
+                            self.timeout)
+                except protocol.ConnectionClosed as err:
+                    writer.close()
+                    if reused:
+                        logger.debug('Keep-alive connection closed: %s', err)
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+
+                if keep_alive:
+                    self._idle.append((reader, writer))
+                else:
+                    writer.close()
+
+                return status, reason, res_body
+
+    def close(self):
+        """Close all idle connections."""
+
+        idle, self._idle = self._idle, []
+        for reader, writer in idle:
+            writer.close()
+
+
+class AsyncZabbixAPIObjectClass(ZabbixAPIObjectClass):
+    """AsyncZabbixAPI Object class, its methods are coroutines."""
+
+    def __getattr__(self, name):
+        """Dynamically create a coroutine method.
+
+        :type name: str
+        :param name: Zabbix API method name.
+            Example: `apiinfo.version` method it will be `version`.
+        """
+
+        async def fn(*args, **kwargs):
+            if args and kwargs:
+                raise TypeError("Found both args and kwargs")
+
+            method = '{0}.{1}'.format(self.group, name)
+            logger.debug("Call %s method", method)
+
+            response = await self.parent.do_request(method, args or kwargs)
+            return response['result']
+
+        return fn
+
+
+class AsyncZabbixAPI(ZabbixAPI):
+    """AsyncZabbixAPI class, implement interface to zabbix api for asyncio
+    code.
+
+    Calls are posted over a pool of keep-alive HTTP connections, so many of
+    them can run at the same time. Login happens on entering
+    `async with` block (or on :meth:`login`), logout on leaving it.
+
+    :type url: str
+    :param url: URL to zabbix api. Default: `ZABBIX_URL` or
+        `https://localhost/zabbix`
+
+    :type use_authenticate: bool
+    :param use_authenticate: Use `user.authenticate` method if `True` else
+        `user.login`.
+
+    :type use_basic_auth: bool
+    :param use_basic_auth: Using basic auth if `True`
+
+    :type user: str
+    :param user: Zabbix user name. Default: `ZABBIX_USER` or `'Admin'`.
+
+    :type password: str
+    :param password: Zabbix user password. Default `ZABBIX_PASSWORD` or
+        `zabbix`.
+
+    :type ssl_context: :class:`ssl.SSLContext`
+    :param ssl_context: Context for `https` URL. By default certificates are
+        not verified.
+
+    :type pool_size: int
+    :param pool_size: Maximum number of HTTP connections. Default: 10
+
+    :type timeout: int
+    :param timeout: Number of seconds before call times out. Default: 30
+
+    >>> from pyzabbix.aio import AsyncZabbixAPI
+    >>> async with AsyncZabbixAPI('https://zabbix.server') as z:
+    ...     hosts, items = await asyncio.gather(z.host.get(),
+    ...                                         z.item.get(hostids=[10084]))
+    """
+
+    def __init__(self, url=None, use_authenticate=False, use_basic_auth=False,
+                 user=None, password=None, ssl_context=None, pool_size=10,
+                 timeout=30):
+
+        url = url or os.environ.get('ZABBIX_URL') or 'https://localhost/zabbix'
+        user = user or os.environ.get('ZABBIX_USER') or 'Admin'
+        password = password or os.environ.get('ZABBIX_PASSWORD') or 'zabbix'
+
+        self.use_authenticate = use_authenticate
+        self.use_basic_auth = use_basic_auth
+        self.auth = None
+        self.url = url + '/api_jsonrpc.php'
+        self.base64_cred = self.cred_to_base64(user, password) if self.use_basic_auth else None
+        self._credentials = (user, password)
+        self._ids = {}
+        self.cache = None
+        self._http = AsyncHTTPConnectionPool(self.url,
+                                             ssl_context=ssl_context,
+                                             maxsize=pool_size,
+                                             timeout=timeout)
+        logger.debug("JSON-PRC Server: %s", self.url)
+
+    def __getattr__(self, name):
+        """Dynamically create an object class (ie: host).
+
+        :type name: str
+        :param name: Zabbix API method group name.
+            Example: `apiinfo.version` method it will be `apiinfo`.
+        """
+
+        return AsyncZabbixAPIObjectClass(name, self)
+
+    async def login(self):
+        """Do login to zabbix server with credentials given to constructor.
+        """
+
+        await self._login(*self._credentials)
+
+    async def _login(self, user='', password=''):
+        """Do login to zabbix server.
+
+        :type user: str
+        :param user: Zabbix user
+
+        :type password: str
+        :param password: Zabbix user password
+        """
+
+        logger.debug("AsyncZabbixAPI.login({0},{1})".format(user, HideSensitiveService.HIDEMASK))
+
+        self.auth = None
+
+        if self.use_authenticate:
+            self.auth = await self.user.authenticate(user=user,
+                                                     password=password)
+        else:
+            self.auth = await self.user.login(user=user, password=password)
+
+    async def _logout(self):
+        """Do logout from zabbix server."""
+
+        if self.auth:
+            logger.debug("AsyncZabbixAPI.logout()")
+
+            if await self.user.logout():
+                self.auth = None
+
+    def close(self):
+        """Close idle HTTP connections."""
+
+        self._http.close()
+
+    def __enter__(self):
+        raise TypeError("Use 'async with' with AsyncZabbixAPI")
+
+    async def __aenter__(self):
+        await self.login()
+        return self
+
+    async def __aexit__(self, *args):
+        try:
+            await self._logout()
+        finally:
+            self.close()
+
+    async def api_version(self):
+        """Return version of server Zabbix API.
+
+        :rtype: str
+        :return: Version of server Zabbix API.
+        """
+
+        return await self.apiinfo.version()
+
+    async def do_request(self, method, params=None):
+        """Make request to Zabbix API.
+
+        :type method: str
+        :param method: ZabbixAPI method, like: `apiinfo.version`.
+
+        :type params: str
+        :param params: ZabbixAPI method arguments.
+
+        >>> from pyzabbix.aio import AsyncZabbixAPI
+        >>> z = AsyncZabbixAPI()
+        >>> apiinfo = await z.do_request('apiinfo.version')
+        """
+
+        request_json = self._prepare_request(method, params)
+        self._invalidate(method)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'POST({0}, {1})'.format(
+                    self.url,
+                    json.dumps(request_json)))
+
+        data = json.dumps(request_json).encode("utf-8")
+
+        headers = {
+            'Content-Type': 'application/json-rpc',
+            'User-Agent': 'py-zabbix/{}'.format(__version__),
+        }
+        if self.use_basic_auth:
+            headers['Authorization'] = "Basic {}".format(self.base64_cred)
+
+        status, reason, res_body = await self._http.request(data, headers)
+        if status != 200:
+            raise ZabbixAPIException(
+                'HTTP Error {0}: {1}'.format(status, reason))
+
+        return self._process_response(res_body, request_json)
+
+    async def get_id(self, item_type, item=None, with_id=False, hostid=None,
+                     **args):
+        """Return id or ids of zabbix objects.
+
+        Takes the same arguments as :meth:`pyzabbix.api.ZabbixAPI.get_id`.
+
+        :rtype: int or list
+        :return: Return single `id`, `name` or list of values.
+        """
+
+        type_, filter_ = self._get_id_request(item_type, item, hostid,
+                                              **args)
+        response = await self.do_request(type_, filter_)
+
+        return self._get_id_result(response['result'], item_type, item,
+                                   with_id, **args)
+
+    async def get_ids(self, item_type, names, hostid=None):
+        """Return ids of zabbix objects by their names.
+
+        Takes the same arguments as :meth:`pyzabbix.api.ZabbixAPI.get_ids`.
+
+        :rtype: dict
+        :return: Name to `id` mapping. Names of missing objects are omitted.
+        """
+
+        ids, type_, filter_ = self._get_ids_request(item_type, names, hostid)
+        response = None
+        if filter_ is not None:
+            response = (await self.do_request(type_, filter_))['result']
+
+        return self._get_ids_result(ids, response, item_type, names)
+
+    def iter(self, method, params=None, page_size=1000):
+        raise TypeError(
+            'AsyncZabbixAPI has no iter(), fetch pages with `limit` instead')
+
+    def batch(self, size=None):
+        raise TypeError(
+            'AsyncZabbixAPI has no batch(), run calls concurrently with '
+            'asyncio.gather() instead')
@@ -20,20 +20,26 @@
 import json
 import logging
 import os
+import socket
 import ssl
 import sys
 import base64
 
 # For Python 2 and 3 compatibility
 try:
+    import httplib
     import urllib2
+    from urlparse import urlsplit
 except ImportError:
+    import http.client as httplib
+    from urllib.parse import urlsplit
     # Since Python 3, urllib2.Request and urlopen were moved to
     # the urllib.request.
     import urllib.request as urllib2
 
 from .version import __version__
 from .logger import NullHandler, HideSensitiveFilter, HideSensitiveService
+from .protocol import is_closed
 
 null_handler = NullHandler()
 logger = logging.getLogger(__name__)
@@ -41,6 +47,61 @@ logger.addHandler(null_handler)
 logger.addFilter(HideSensitiveFilter())
 
 
+# Field which holds object name, if it is not `name`
+ITEM_FILTER_NAME = {
+    'mediatype': 'description',
+    'trigger': 'description',
+    'triggerprototype': 'description',
+    'user': 'alias',
+    'usermacro': 'macro',
+}
+
+# Prefix of object id field, if it is not object type
+ITEM_ID_NAME = {
+    'discoveryrule': 'item',
+    'graphprototype': 'graph',
+    'hostgroup': 'group',
+    'itemprototype': 'item',
+    'map': 'selement',
+    'triggerprototype': 'trigger',
+    'usergroup': 'usrgrp',
+    'usermacro': 'hostmacro',
+}
+
+# Id field of objects paged by `ZabbixAPI.iter`, if it is not
+# `<object type>id`. Objects are fetched by `<id field>s` parameter.
+ITER_ID_NAME = {
+    'auditlog': 'auditid',
+    'discoveryrule': 'itemid',
+    'graphitem': 'gitemid',
+    'graphprototype': 'graphid',
+    'hanode': 'ha_nodeid',
+    'hostgroup': 'groupid',
+    'hostinterface': 'interfaceid',
+    'hostprototype': 'hostid',
+    'itemprototype': 'itemid',
+    'map': 'sysmapid',
+    'problem': 'eventid',
+    'proxygroup': 'proxy_groupid',
+    'templatedashboard': 'dashboardid',
+    'templategroup': 'groupid',
+    'triggerprototype': 'triggerid',
+    'usergroup': 'usrgrpid',
+    'usermacro': 'hostmacroid',
+}
+
+# Methods which return single object or values without ids, so they
+# could not be paged
+ITER_UNSUPPORTED = (
+    'apiinfo.version',
+    'authentication.get',
+    'autoregistration.get',
+    'configuration.export',
+    'housekeeping.get',
+    'settings.get',
+)
+
+
 class ZabbixAPIException(Exception):
     """ZabbixAPI exception class.
 
@@ -97,25 +158,45 @@ class ZabbixAPIObjectClass(object):
         return fn
 
 
-def ssl_context_compat(func):
-    def inner(req):
-        # We should explicitly disable cert verification to support
-        # self-signed certs with urllib2 since Python 2.7.9 and 3.4.3
+def unverified_ssl_context():
+    """Create SSL context which skips cert verification.
 
-        default_version = (2, 7, 9)
-        version = {
-            2: default_version,
-            3: (3, 4, 3),
-        }
+    We should explicitly disable cert verification to support self-signed
+    certs with urllib2 since Python 2.7.9 and 3.4.3
+
+    :rtype: :class:`ssl.SSLContext`
+    :return: SSL context or `None` if Python does not support it.
+    """
+
+    default_version = (2, 7, 9)
+    version = {
+        2: default_version,
+        3: (3, 4, 3),
+    }
 
-        python_version = sys.version_info[0]
-        minimum_version = version.get(python_version, default_version)
+    python_version = sys.version_info[0]
+    minimum_version = version.get(python_version, default_version)
 
-        if sys.version_info[0:3] >= minimum_version:
-            # Create default context to skip SSL cert verification.
-            ctx = ssl.create_default_context()
-            ctx.check_hostname = False
-            ctx.verify_mode = ssl.CERT_NONE
+    if sys.version_info[0:3] < minimum_version:
+        return None
+
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+def ssl_context_compat(func):
+    # Building SSL context is expensive, so it is done once and shared by
+    # all calls of the decorated function.
+    contexts = []
+
+    def inner(req):
+        if not contexts:
+            contexts.append(unverified_ssl_context())
+        ctx = contexts[0]
+
+        if ctx is not None:
             res = func(req, context=ctx)
         else:
             res = func(req)
@@ -130,6 +211,21 @@ def urlopen(*args, **kwargs):
     return urllib2.urlopen(*args, **kwargs)
 
 
+def _is_dead(error):
+    """Check that request failed because the server had closed keep-alive
+    connection before it started the reply, so it is safe to resend it.
+
+    :type error: :class:`Exception`
+    :param error: Error of the request.
+    """
+
+    if isinstance(error, httplib.BadStatusLine):
+        # Python 3 raises RemoteDisconnected, Python 2 empty status line
+        disconnected = getattr(httplib, 'RemoteDisconnected', ())
+        return isinstance(error, disconnected) or error.line == "''"
+    return isinstance(error, socket.error) and is_closed(error)
+
+
 class ZabbixAPI(object):
     """ZabbixAPI class, implement interface to zabbix api.
 
@@ -151,6 +247,17 @@ class ZabbixAPI(object):
     :param password: Zabbix user password. Default `ZABBIX_PASSWORD` or
         `zabbix`.
 
+    :type use_keep_alive: bool
+    :param use_keep_alive: Keep one HTTP connection open and send all calls
+        over it, instead of opening a new one per call. Default: `False`
+
+    :type timeout: int
+    :param timeout: Number of seconds before keep-alive connection times out.
+        Default: `None`, blocks as long as needed.
+
+    :type cache: :class:`pyzabbix.cache.ZabbixAPICache`
+    :param cache: Cache for responses of read-only methods. Default: `None`
+
     >>> from pyzabbix import ZabbixAPI
     >>> z = ZabbixAPI('https://zabbix.server', user='Admin', password='zabbix')
     >>> # Get API Version
@@ -166,7 +273,8 @@ class ZabbixAPI(object):
     """
 
     def __init__(self, url=None, use_authenticate=False, use_basic_auth=False, user=None,
-                 password=None):
+                 password=None, use_keep_alive=False, timeout=None,
+                 cache=None):
 
         url = url or os.environ.get('ZABBIX_URL') or 'https://localhost/zabbix'
         user = user or os.environ.get('ZABBIX_USER') or 'Admin'
@@ -177,6 +285,14 @@ class ZabbixAPI(object):
         self.auth = None
         self.url = url + '/api_jsonrpc.php'
         self.base64_cred = self.cred_to_base64(user, password) if self.use_basic_auth else None
+        self.use_keep_alive = use_keep_alive
+        self.timeout = timeout
+        self._connection = None
+        self._ssl_context = None
+        self._ids = {}
+        self.cache = cache
+        if self.use_keep_alive and self.url.startswith('https'):
+            self._ssl_context = unverified_ssl_context()
         self._login(user, password)
         logger.debug("JSON-PRC Server: %s", self.url)
 
@@ -222,7 +338,17 @@ class ZabbixAPI(object):
         return self
 
     def __exit__(self, *args):
-        self._logout()
+        try:
+            self._logout()
+        finally:
+            self.close()
+
+    def close(self):
+        """Close keep-alive connection."""
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
 
     @staticmethod
     def cred_to_base64(user, password):
@@ -246,6 +372,25 @@ class ZabbixAPI(object):
 
         return self.apiinfo.version()
 
+    def batch(self, size=None):
+        """Create batch of calls which are sent as one JSON-RPC batch request
+        when `with` block is left.
+
+        :type size: int
+        :param size: Maximum number of calls in one HTTP request. Bigger
+            batches are split. Default: `None`, no limit.
+
+        :rtype: :class:`ZabbixAPIBatch`
+        :return: Batch to queue calls in.
+
+        >>> with z.batch() as batch:
+        ...     hosts = batch.host.get(output=['hostid'])
+        ...     batch.host.update(hostid='10084', status=1)
+        >>> hosts.result
+        """
+
+        return ZabbixAPIBatch(self, size=size)
+
     def do_request(self, method, params=None):
         """Make request to Zabbix API.
 
@@ -260,6 +405,146 @@ class ZabbixAPI(object):
         >>> apiinfo = z.do_request('apiinfo.version')
         """
 
+        request_json = self._prepare_request(method, params)
+        self._invalidate(method)
+
+        cache_key = None
+        if self.cache is not None and self.cache.cacheable(method):
+            cache_key = self.cache.key(method, request_json['params'],
+                                       request_json.get('auth'))
+            res_body = self.cache.get(cache_key)
+            if res_body is not None:
+                logger.debug('Cached response for %s', method)
+                return self._process_response(res_body, request_json)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'urllib2.Request({0}, {1})'.format(
+                    self.url,
+                    json.dumps(request_json)))
+
+        res_body = self._send(request_json)
+        res_json = self._process_response(res_body, request_json)
+
+        if cache_key is not None:
+            # Raw body is cached, so every caller gets its own copy
+            self.cache.set(cache_key, method, res_body)
+
+        return res_json
+
+    def _send(self, request_json):
+        """Post JSON-RPC request to Zabbix API.
+
+        :type request_json: dict or list
+        :param request_json: JSON-RPC request or batch of requests.
+
+        :rtype: bytes
+        :return: HTTP response body.
+        """
+
+        data = json.dumps(request_json)
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+
+        headers = {
+            'Content-Type': 'application/json-rpc',
+            'User-Agent': 'py-zabbix/{}'.format(__version__),
+        }
+
+        if self.use_basic_auth:
+            headers["Authorization"] = "Basic {}".format(self.base64_cred)
+
+        if self.use_keep_alive:
+            return self._post(data, headers)
+
+        req = urllib2.Request(self.url, data, headers)
+        req.get_method = lambda: 'POST'
+        return urlopen(req).read()
+
+    def _connect(self):
+        """Open HTTP connection to zabbix frontend.
+
+        :rtype: :class:`httplib.HTTPConnection`
+        :return: HTTP or HTTPS connection.
+        """
+
+        parts = urlsplit(self.url)
+        logger.debug('Open connection to %s', parts.netloc)
+
+        if parts.scheme == 'https':
+            if self._ssl_context is not None:
+                return httplib.HTTPSConnection(parts.netloc,
+                                               timeout=self.timeout,
+                                               context=self._ssl_context)
+            return httplib.HTTPSConnection(parts.netloc, timeout=self.timeout)
+
+        return httplib.HTTPConnection(parts.netloc, timeout=self.timeout)
+
+    def _post(self, data, headers):
+        """POST request over keep-alive connection.
+
+        Connection could be closed by the server while it was idle, so if
+        reused connection turns out to be closed before any reply, the
+        request is sent once more over a new one. Timeouts and errors after
+        the reply was started are never retried, since the server could
+        have already done the request.
+
+        :type data: bytes
+        :param data: Request body.
+
+        :type headers: dict
+        :param headers: Request headers.
+
+        :rtype: bytes
+        :return: Response body.
+        """
+
+        parts = urlsplit(self.url)
+        path = parts.path + ('?' + parts.query if parts.query else '')
+
+        while True:
+            reused = self._connection is not None
+            if not reused:
+                self._connection = self._connect()
+
+            try:
+                self._connection.request('POST', path, data, headers)
+                res = self._connection.getresponse()
+            except (httplib.HTTPException, socket.error) as e:
+                self.close()
+                if reused and _is_dead(e):
+                    logger.debug('Keep-alive connection closed: %s', e)
+                    continue
+                raise
+
+            try:
+                res_body = res.read()
+            except (httplib.HTTPException, socket.error):
+                self.close()
+                raise
+
+            if res.will_close:
+                self.close()
+
+            if res.status != 200:
+                raise ZabbixAPIException(
+                    'HTTP Error {0}: {1}'.format(res.status, res.reason))
+
+            return res_body
+
+    def _prepare_request(self, method, params=None):
+        """Build JSON-RPC request object.
+
+        :type method: str
+        :param method: ZabbixAPI method, like: `apiinfo.version`.
+
+        :type params: str
+        :param params: ZabbixAPI method arguments.
+
+        :rtype: dict
+        :return: JSON-RPC request.
+        """
+
         request_json = {
             'jsonrpc': '2.0',
             'method': method,
@@ -271,32 +556,30 @@ class ZabbixAPI(object):
         if self.auth and (method not in ('apiinfo.version', 'user.login')):
             request_json['auth'] = self.auth
 
-        logger.debug(
-            'urllib2.Request({0}, {1})'.format(
-                self.url,
-                json.dumps(request_json)))
+        return request_json
 
-        data = json.dumps(request_json)
-        if not isinstance(data, bytes):
-            data = data.encode("utf-8")
+    def _process_response(self, res_body, request_json):
+        """Parse JSON-RPC response and raise on API error.
 
-        req = urllib2.Request(self.url, data)
-        req.get_method = lambda: 'POST'
-        req.add_header('Content-Type', 'application/json-rpc')
-        req.add_header('User-Agent', 'py-zabbix/{}'.format(__version__))
+        :type res_body: bytes
+        :param res_body: HTTP response body.
 
-        if self.use_basic_auth:
-            req.add_header("Authorization", "Basic {}".format(self.base64_cred))
+        :type request_json: dict
+        :param request_json: JSON-RPC request the response belongs to.
+
+        :rtype: dict
+        :return: JSON-RPC response.
+        """
 
         try:
-            res = urlopen(req)
-            res_str = res.read().decode('utf-8')
+            res_str = res_body.decode('utf-8')
             res_json = json.loads(res_str)
         except ValueError as e:
-            raise ZabbixAPIException("Unable to parse json: %s" % e.message)
+            raise ZabbixAPIException("Unable to parse json: %s" % e)
 
-        res_str = json.dumps(res_json, indent=4, separators=(',', ': '))
-        logger.debug("Response Body: %s", res_str)
+        if logger.isEnabledFor(logging.DEBUG):
+            res_str = json.dumps(res_json, indent=4, separators=(',', ': '))
+            logger.debug("Response Body: %s", res_str)
 
         if 'error' in res_json:
             err = res_json['error'].copy()
@@ -305,6 +588,224 @@ class ZabbixAPI(object):
 
         return res_json
 
+    def iter(self, method, params=None, page_size=1000):
+        """Iterate over result of `*.get` method page by page.
+
+        Only one page of objects is held in memory at a time.
+        `history.get` and `trend.get` are paged by `clock`: every page
+        starts from the last clock of the previous one. Other methods first
+        fetch only ids of all matching objects, then fetch objects by
+        `page_size` ids at a time.
+
+        :type method: str
+        :param method: ZabbixAPI `*.get` method, like: `item.get`.
+
+        :type params: dict
+        :param params: ZabbixAPI method arguments. `limit` is ignored.
+
+        :type page_size: int
+        :param page_size: Number of objects fetched by one request.
+
+        :rtype: generator
+        :return: Objects of the result.
+
+        :raises ValueError: If result of the method could not be paged.
+
+        >>> for value in z.iter('history.get', {'itemids': ids}):
+        ...     process(value)
+        """
+
+        if not method.endswith('.get') or method in ITER_UNSUPPORTED or \
+                params and params.get('countOutput'):
+            raise ValueError('Result of {0} could not be paged'.format(
+                method))
+
+        params = dict(params or {})
+        params.pop('limit', None)
+
+        if method == 'history.get':
+            params.update({'sortfield': 'clock', 'sortorder': 'ASC'})
+            return self._iter_clock(method, params, page_size)
+        if method == 'trend.get':
+            return self._iter_trends(params, page_size)
+        return self._iter_objects(method, params, page_size)
+
+    def _iter_trends(self, params, page_size):
+        """Page `trend.get` result by `clock`, one item at a time.
+
+        `trend.get` could not sort, but trends of one item come in order of
+        the table key, which is `clock` within the item.
+        """
+
+        itemids = params.get('itemids')
+        if isinstance(itemids, (list, tuple)):
+            scopes = [dict(params, itemids=[itemid]) for itemid in itemids]
+        else:
+            scopes = [params]
+
+        for scope in scopes:
+            for value in self._iter_clock('trend.get', scope, page_size):
+                yield value
+
+    def _iter_clock(self, method, params, page_size):
+        """Page values of `history.get` or `trend.get` by `clock`."""
+
+        limit = page_size
+        # Values with clock of the page border are returned again by the
+        # next page, so they are remembered to be skipped.
+        seen = set()
+
+        while True:
+            params['limit'] = limit
+            page = self.do_request(method, params)['result']
+
+            border = str(page[-1]['clock']) if page else None
+            for value in page:
+                key = tuple(sorted(value.items()))
+                if key in seen:
+                    continue
+                if str(value['clock']) == border:
+                    seen.add(key)
+                yield value
+
+            if len(page) < limit:
+                return
+
+            if border == str(params.get('time_from')):
+                # Whole page has the same clock, so the next one would
+                # start from the same place. Fetch more at once.
+                limit *= 2
+            else:
+                seen = set(k for k in seen
+                           if str(dict(k)['clock']) == border)
+                params['time_from'] = border
+                limit = page_size
+
+    def _iter_objects(self, method, params, page_size):
+        """Page `*.get` result by object ids."""
+
+        item_type = method.split('.')[0]
+        item_id = ITER_ID_NAME.get(item_type, '{0}id'.format(item_type))
+
+        id_params = dict((k, v) for k, v in params.items()
+                         if k not in ('output', 'preservekeys') and
+                         not k.startswith('select'))
+        id_params['output'] = [item_id]
+        try:
+            ids = [obj[item_id]
+                   for obj in self.do_request(method, id_params)['result']]
+        except KeyError:
+            raise ValueError('Result of {0} has no {1} field to be paged '
+                             'by'.format(method, item_id))
+
+        for i in range(0, len(ids), page_size):
+            page_ids = ids[i:i + page_size]
+            page_params = dict(params)
+            page_params['{0}s'.format(item_id)] = page_ids
+
+            page = self.do_request(method, page_params)['result']
+            if isinstance(page, dict):
+                # preservekeys returns objects keyed by id
+                page = list(page.values())
+
+            # Keep order of the first request, it could be sorted
+            objects = dict((obj.get(item_id), obj) for obj in page)
+            for id_ in page_ids:
+                if id_ in objects:
+                    yield objects[id_]
+
+    def get_ids(self, item_type, names, hostid=None):
+        """Return ids of zabbix objects by their names.
+
+        All names which were not resolved before are looked up by one
+        `<item_type>.get` request, which returns only id and name fields.
+        Resolved ids are remembered by this ZabbixAPI object until objects
+        of the type are updated or any objects are deleted through it.
+
+        :type item_type: str
+        :param item_type: Type of zabbix object. (eg host, item etc.)
+
+        :type names: list
+        :param names: Names of zabbix objects.
+
+        :type hostid: int
+        :param hostid: Filter objects by specific hostid.
+
+        :rtype: dict
+        :return: Name to `id` mapping. Names of missing objects are omitted.
+
+        >>> z.get_ids('host', ['Zabbix server', 'web01'])
+        {'Zabbix server': 10084, 'web01': 10105}
+        """
+
+        ids, type_, filter_ = self._get_ids_request(item_type, names, hostid)
+        response = None
+        if filter_ is not None:
+            response = self.do_request(type_, filter_)['result']
+
+        return self._get_ids_result(ids, response, item_type, names)
+
+    def _get_ids_request(self, item_type, names, hostid=None):
+        """Build `<item_type>.get` method name and params for
+        :meth:`get_ids`.
+
+        :rtype: tuple
+        :return: Remembered ids of the scope, method name and params, which
+            are `None` if all names are already resolved.
+        """
+
+        name_field = ITEM_FILTER_NAME.get(item_type, 'name')
+        item_id = '{0}id'.format(ITEM_ID_NAME.get(item_type, item_type))
+
+        ids = self._ids.setdefault((item_type, hostid), {})
+        missing = sorted(set(name for name in names if name not in ids))
+        if not missing:
+            return ids, None, None
+
+        filter_ = {
+            'filter': {name_field: missing},
+            'output': [item_id, name_field],
+        }
+        if hostid:
+            filter_['filter']['hostid'] = hostid
+
+        return ids, '{item_type}.get'.format(item_type=item_type), filter_
+
+    @staticmethod
+    def _get_ids_result(ids, response, item_type, names):
+        """Remember ids from `<item_type>.get` result and pick ids of
+        `names` for :meth:`get_ids`.
+
+        :rtype: dict
+        :return: Name to `id` mapping.
+        """
+
+        name_field = ITEM_FILTER_NAME.get(item_type, 'name')
+        item_id = '{0}id'.format(ITEM_ID_NAME.get(item_type, item_type))
+
+        for obj in response or []:
+            ids[obj[name_field]] = int(obj[item_id])
+
+        return dict((name, ids[name]) for name in names if name in ids)
+
+    def _invalidate(self, method):
+        """Forget data cached for objects changed by `method`.
+
+        :type method: str
+        :param method: ZabbixAPI method, like: `host.update`.
+        """
+
+        if self.cache is not None:
+            self.cache.invalidate(method)
+
+        item_type, _, action = method.partition('.')
+        if action == 'delete':
+            # Deletion cascades, eg items of a deleted host are gone too
+            self._ids.clear()
+        elif action in ('update', 'massupdate'):
+            for key in [k for k in self._ids if k[0] == item_type]:
+                del self._ids[key]
+
     def get_id(self, item_type, item=None, with_id=False, hostid=None, **args):
         """Return id or ids of zabbix objects.
 
@@ -337,35 +838,39 @@ class ZabbixAPI(object):
         :return: Return single `id`, `name` or list of values.
         """
 
-        result = None
-        name = args.get('name', False)
+        type_, filter_ = self._get_id_request(item_type, item, hostid,
+                                              **args)
 
-        type_ = '{item_type}.get'.format(item_type=item_type)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'do_request( "{type}", {filter} )'.format(
+                    type=type_,
+                    filter=filter_))
+        response = self.do_request(type_, filter_)['result']
 
-        item_filter_name = {
-            'mediatype': 'description',
-            'trigger': 'description',
-            'triggerprototype': 'description',
-            'user': 'alias',
-            'usermacro': 'macro',
-        }
+        return self._get_id_result(response, item_type, item, with_id,
+                                   **args)
 
-        item_id_name = {
-            'discoveryrule': 'item',
-            'graphprototype': 'graph',
-            'hostgroup': 'group',
-            'itemprototype': 'item',
-            'map': 'selement',
-            'triggerprototype': 'trigger',
-            'usergroup': 'usrgrp',
-            'usermacro': 'hostmacro',
-        }
+    @staticmethod
+    def _get_id_request(item_type, item=None, hostid=None, **args):
+        """Build `<item_type>.get` method name and params for :meth:`get_id`.
+
+        :rtype: tuple
+        :return: Method name and params.
+        """
+
+        type_ = '{item_type}.get'.format(item_type=item_type)
+
+        name_field = ITEM_FILTER_NAME.get(item_type, 'name')
+        item_id = '{0}id'.format(ITEM_ID_NAME.get(item_type, item_type))
 
         filter_ = {
             'filter': {
-                item_filter_name.get(item_type, 'name'): item,
+                name_field: item,
             },
-            'output': 'extend'}
+            # Template check needs template fields of the objects
+            'output': 'extend' if args.get('templateids') else [item_id,
+                                                                name_field]}
 
         if hostid:
             filter_['filter'].update({'hostid': hostid})
@@ -379,14 +884,23 @@ class ZabbixAPI(object):
         if args.get('app_name'):
             filter_['application'] = args['app_name']
 
-        logger.debug(
-            'do_request( "{type}", {filter} )'.format(
-                type=type_,
-                filter=filter_))
-        response = self.do_request(type_, filter_)['result']
+        return type_, filter_
+
+    @staticmethod
+    def _get_id_result(response, item_type, item=None, with_id=False,
+                       **args):
+        """Extract ids or names for :meth:`get_id` from `<item_type>.get`
+        result.
+
+        :rtype: int or list
+        :return: Return single `id`, `name` or list of values.
+        """
+
+        result = None
+        name = args.get('name', False)
 
         if response:
-            item_id_str = item_id_name.get(item_type, item_type)
+            item_id_str = ITEM_ID_NAME.get(item_type, item_type)
             item_id = '{item}id'.format(item=item_id_str)
             result = []
             for obj in response:
@@ -397,7 +911,7 @@ class ZabbixAPI(object):
                         continue
 
                 if name:
-                    o = obj.get(item_filter_name.get(item_type, 'name'))
+                    o = obj.get(ITEM_FILTER_NAME.get(item_type, 'name'))
                     result.append(o)
                 elif with_id:
                     result.append({item_id: int(obj.get(item_id))})
@@ -409,3 +923,191 @@ class ZabbixAPI(object):
                 result = result[0]
 
         return result
+
+
+class ZabbixAPIBatchCall(object):
+    """One call queued in :class:`ZabbixAPIBatch`.
+
+    Its :attr:`result` is available after the batch is executed.
+
+    :type request_json: dict
+    :param request_json: JSON-RPC request of the call.
+    """
+
+    def __init__(self, request_json):
+        self.request_json = request_json
+        self.error = None
+        self.done = False
+        self._result = None
+
+    def __repr__(self):
+        return '<{0} {1} id={2}>'.format(self.__class__.__name__,
+                                         self.request_json['method'],
+                                         self.request_json['id'])
+
+    @property
+    def method(self):
+        return self.request_json['method']
+
+    @property
+    def result(self):
+        """Result of the call.
+
+        :raises: :class:`ZabbixAPIException` if call failed or batch was not
+            executed yet.
+        """
+
+        if not self.done:
+            raise ZabbixAPIException('Batch is not executed yet')
+        if self.error is not None:
+            raise self.error
+        return self._result
+
+    def set_response(self, response):
+        """Fill the call from its JSON-RPC response."""
+
+        self.done = True
+        if 'error' in response:
+            err = response['error'].copy()
+            err.update({'json': str(self.request_json)})
+            self.error = ZabbixAPIException(err)
+        else:
+            self._result = response.get('result')
+
+
+class ZabbixAPIBatchObjectClass(ZabbixAPIObjectClass):
+    """ZabbixAPIBatch Object class, its methods queue calls."""
+
+    def __getattr__(self, name):
+        """Dynamically create a method which queues the call.
+
+        :type name: str
+        :param name: Zabbix API method name.
+            Example: `apiinfo.version` method it will be `version`.
+        """
+
+        def fn(*args, **kwargs):
+            if args and kwargs:
+                raise TypeError("Found both args and kwargs")
+
+            method = '{0}.{1}'.format(self.group, name)
+            return self.parent.do_request(method, args or kwargs)
+
+        return fn
+
+
+class ZabbixAPIBatch(object):
+    """Batch of Zabbix API calls sent in one JSON-RPC batch request.
+
+    Every call gets unique `id`, so responses are matched to calls whatever
+    their order. Error of one call does not affect the others, it is raised
+    when result of that call is accessed.
+
+    :type parent: :class:`ZabbixAPI`
+    :param parent: ZabbixAPI object to send calls with.
+
+    :type size: int
+    :param size: Maximum number of calls in one HTTP request. Default:
+        `None`, no limit.
+    """
+
+    def __init__(self, parent, size=None):
+        self.parent = parent
+        self.size = size
+        self.calls = []
+        self._next_id = 1
+
+    def __getattr__(self, name):
+        """Dynamically create an object class (ie: host).
+
+        :type name: str
+        :param name: Zabbix API method group name.
+            Example: `apiinfo.version` method it will be `apiinfo`.
+        """
+
+        return ZabbixAPIBatchObjectClass(name, self)
+
+    def __len__(self):
+        return len(self.calls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.execute()
+
+    def do_request(self, method, params=None):
+        """Queue call of Zabbix API method.
+
+        :type method: str
+        :param method: ZabbixAPI method, like: `apiinfo.version`.
+
+        :type params: str
+        :param params: ZabbixAPI method arguments.
+
+        :rtype: :class:`ZabbixAPIBatchCall`
+        :return: Queued call.
+        """
+
+        request_json = self.parent._prepare_request(method, params)
+        request_json['id'] = str(self._next_id)
+        self.parent._invalidate(method)
+        self._next_id += 1
+
+        call = ZabbixAPIBatchCall(request_json)
+        self.calls.append(call)
+        return call
+
+    def execute(self):
+        """Send queued calls and fill their results.
+
+        :rtype: list
+        :return: List of executed :class:`ZabbixAPIBatchCall`.
+        """
+
+        calls = [call for call in self.calls if not call.done]
+        if not calls:
+            return self.calls
+
+        size = self.size or len(calls)
+
+        for i in range(0, len(calls), size):
+            self._execute(calls[i:i + size])
+
+        return self.calls
+
+    def _execute(self, calls):
+        """Send one JSON-RPC batch request."""
+
+        request_json = [call.request_json for call in calls]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                'Batch request({0}, {1})'.format(
+                    self.parent.url,
+                    json.dumps(request_json)))
+
+        res_body = self.parent._send(request_json)
+
+        try:
+            res_json = json.loads(res_body.decode('utf-8'))
+        except ValueError as e:
+            raise ZabbixAPIException("Unable to parse json: %s" % e)
+
+        logger.debug("Batch response: %s", res_json)
+
+        # Invalid batch as a whole is answered with single error
+        if isinstance(res_json, dict):
+            res_json = [dict(res_json, id=call.request_json['id'])
+                        for call in calls]
+
+        responses = dict((str(res.get('id')), res) for res in res_json)
+        for call in calls:
+            response = responses.get(call.request_json['id'])
+            if response is None:
+                response = {'error': {
+                    'code': -32603,
+                    'message': 'Internal error.',
+                    'data': 'No response in batch.'}}
+            call.set_response(response)
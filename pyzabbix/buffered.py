@@ -0,0 +1,333 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright © 2014 Alexey Dubkov
+#
+# This file is part of py-zabbix.
+#
+# Py-zabbix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Py-zabbix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with py-zabbix. If not, see <http://www.gnu.org/licenses/>.
+
+import atexit
+import logging
+import threading
+import time
+import weakref
+from collections import deque
+
+from .logger import NullHandler
+from .sender import ZabbixSender, ZabbixSenderException
+
+null_handler = NullHandler()
+logger = logging.getLogger(__name__)
+logger.addHandler(null_handler)
+
+# Senders which are still open, to flush them on interpreter exit
+_open_senders = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_senders():
+    for sender in list(_open_senders):
+        sender.close()
+
+
+class BufferedZabbixSender(object):
+    """The :class:`BufferedZabbixSender` queue metrics and send them to
+    Zabbix from a background thread.
+
+    Metrics can be put from any number of threads. The queue is flushed as
+    soon as it holds `chunk_size` metrics of the sender, or when the oldest
+    queued metric waited for `max_latency` seconds. Remaining metrics are
+    flushed on :meth:`close`, which is also called on interpreter exit.
+
+    Metrics of chunks which the sender spooled are counted in `spooled`
+    rather than in `sent` or `failed`. Values merged by coalescing of the
+    sender are counted as sent.
+
+    :type sender: :class:`pyzabbix.sender.ZabbixSender`
+    :param sender: Sender used to send metrics. Its `chunk_size` and
+        `workers` define how many metrics are sent at once. Default:
+        `ZabbixSender()`
+
+    :type maxsize: int
+    :param maxsize: Maximum number of queued metrics. Default: 100000
+
+    :type max_latency: float
+    :param max_latency: Maximum number of seconds a metric is queued before
+        it is sent. Default: 1
+
+    :type overflow: str
+    :param overflow: What to do with new metric when queue is full:
+        `'block'` - wait for free space, `'drop_new'` - drop the new
+        metric, `'drop_old'` - drop the oldest queued metric.
+        Default: `'block'`
+
+    :type block_timeout: float
+    :param block_timeout: Maximum number of seconds to wait for free space
+        in `'block'` mode, after that the new metric is dropped.
+        Default: `None`, wait as long as needed.
+
+    >>> from pyzabbix import BufferedZabbixSender, ZabbixMetric, ZabbixSender
+    >>> zbx = BufferedZabbixSender(ZabbixSender('127.0.0.1'))
+    >>> zbx.put(ZabbixMetric('localhost', 'cpu[usage]', 20))
+    >>> zbx.queued, zbx.sent, zbx.failed, zbx.spooled, zbx.dropped
+    """
+
+    OVERFLOW_POLICIES = ('block', 'drop_new', 'drop_old')
+
+    def __init__(self, sender=None, maxsize=100000, max_latency=1,
+                 overflow='block', block_timeout=None):
+
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError('Overflow must be one of: {0}'.format(
+                ', '.join(self.OVERFLOW_POLICIES)))
+
+        self.sender = sender or ZabbixSender()
+        self.maxsize = maxsize
+        self.max_latency = max_latency
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.spooled = 0
+        self.dropped = 0
+        self.last_error = None
+
+        self._queue = deque()
+        self._oldest = None
+        self._inflight = 0
+        self._flush = False
+        self._closed = False
+        self._lock = threading.Lock()
+        # Wakes the worker up when there is something to send
+        self._ready = threading.Condition(self._lock)
+        # Wakes producers and flush() up when queued metrics were taken
+        self._taken = threading.Condition(self._lock)
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='BufferedZabbixSender')
+        self._thread.daemon = True
+        self._thread.start()
+        _open_senders.add(self)
+
+    def __repr__(self):
+        """Represent detailed BufferedZabbixSender view."""
+
+        return ('<{0} queued={1} sent={2} failed={3} dropped={4} '
+                'pending={5}>').format(self.__class__.__name__, self.queued,
+                                       self.sent, self.failed, self.dropped,
+                                       len(self._queue))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def put(self, metric):
+        """Queue one metric.
+
+        :type metric: :class:`pyzabbix.sender.ZabbixMetric`
+        :param metric: Metric to send.
+
+        :rtype: bool
+        :return: `False` if metric was dropped.
+        """
+
+        return self.put_many((metric,)) == 1
+
+    def put_many(self, metrics):
+        """Queue several metrics at once, under one lock acquisition.
+
+        :type metrics: iterable
+        :param metrics: :class:`pyzabbix.sender.ZabbixMetric` to send.
+
+        :rtype: int
+        :return: Number of queued metrics, the rest were dropped.
+        """
+
+        queued = 0
+        with self._lock:
+            if self._closed:
+                raise ValueError('BufferedZabbixSender is closed')
+
+            was_empty = not self._queue
+
+            for metric in metrics:
+                if len(self._queue) >= self.maxsize and not self._make_room():
+                    self.dropped += 1
+                    continue
+
+                if not self._queue:
+                    self._oldest = time.time()
+                self._queue.append(metric)
+                queued += 1
+
+            self.queued += queued
+            # Worker has to start counting latency of the first metric
+            if (was_empty and self._queue or
+                    len(self._queue) >= self.sender.chunk_size):
+                self._ready.notify()
+
+        return queued
+
+    def _make_room(self):
+        """Free space in the full queue according to overflow policy.
+
+        Must be called with `self._lock` held.
+
+        :rtype: bool
+        :return: `True` if there is room for a new metric.
+        """
+
+        if self.overflow == 'drop_old':
+            self._queue.popleft()
+            self.dropped += 1
+            return True
+
+        if self.overflow == 'drop_new':
+            return False
+
+        # Block until the worker takes metrics
+        self._ready.notify()
+        deadline = None
+        if self.block_timeout is not None:
+            deadline = time.time() + self.block_timeout
+
+        while len(self._queue) >= self.maxsize and not self._closed:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    return False
+            self._taken.wait(timeout)
+
+        return len(self._queue) < self.maxsize
+
+    def _take(self):
+        """Wait until queue should be flushed and take metrics from it.
+
+        Must be called with `self._lock` held.
+
+        :rtype: list
+        :return: Metrics to send, empty if worker should stop.
+        """
+
+        while True:
+            size = len(self._queue)
+            if size >= self.sender.chunk_size or (
+                    size and (self._flush or self._closed)):
+                break
+            if self._closed:
+                return []
+
+            timeout = None
+            if size:
+                timeout = self._oldest + self.max_latency - time.time()
+                if timeout <= 0:
+                    break
+            self._ready.wait(timeout)
+
+        # Take enough to keep all workers of the sender busy
+        count = self.sender.chunk_size * max(1, self.sender.workers)
+        metrics = [self._queue.popleft()
+                   for _ in range(min(count, len(self._queue)))]
+        self._oldest = time.time() if self._queue else None
+        self._inflight += len(metrics)
+        self._taken.notify_all()
+
+        return metrics
+
+    def _run(self):
+        """Worker thread."""
+
+        while True:
+            with self._lock:
+                metrics = self._take()
+            if not metrics:
+                return
+
+            response, error = None, None
+            try:
+                response = self.sender.send(metrics)
+            except ZabbixSenderException as err:
+                response, error = err.response, err
+            except Exception as err:
+                error = err
+
+            # Sender tells sizes of chunks, which could differ from its
+            # chunk_size in adaptive mode or after coalescing
+            if response is None:
+                failed, spooled = len(metrics), 0
+            else:
+                failed, spooled = response.unsent, response.spooled_values
+            sent = max(0, len(metrics) - failed - spooled)
+
+            if error is not None:
+                logger.warning('Sending %d metrics failed: %r', failed, error)
+
+            with self._lock:
+                self.sent += sent
+                self.failed += failed
+                self.spooled += spooled
+                if error is not None:
+                    self.last_error = error
+                self._inflight -= len(metrics)
+                self._taken.notify_all()
+
+    def flush(self, timeout=None):
+        """Send all queued metrics now and wait until they are sent.
+
+        :type timeout: float
+        :param timeout: Maximum number of seconds to wait.
+
+        :rtype: bool
+        :return: `True` if all metrics were sent in time.
+        """
+
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            self._flush = True
+            self._ready.notify()
+            try:
+                while self._queue or self._inflight:
+                    wait = None
+                    if deadline is not None:
+                        wait = deadline - time.time()
+                        if wait <= 0:
+                            return False
+                    self._taken.wait(wait)
+            finally:
+                self._flush = False
+
+        return True
+
+    def close(self, timeout=None):
+        """Send remaining metrics and stop the worker thread.
+
+        :type timeout: float
+        :param timeout: Maximum number of seconds to wait for the worker.
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._ready.notify()
+            self._taken.notify_all()
+
+        self._thread.join(timeout)
+        self.sender.close()
+        _open_senders.discard(self)
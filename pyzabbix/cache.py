@@ -0,0 +1,191 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright © 2014 Alexey Dubkov
+#
+# This file is part of py-zabbix.
+#
+# Py-zabbix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Py-zabbix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with py-zabbix. If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from .logger import NullHandler
+
+null_handler = NullHandler()
+logger = logging.getLogger(__name__)
+logger.addHandler(null_handler)
+
+# Method groups whose `get` results may include objects of the key group,
+# so they are invalidated together with it.
+RELATED_GROUPS = {
+    'host': ('hostgroup', 'template', 'hostinterface', 'item',
+             'application', 'trigger', 'graph', 'discoveryrule'),
+    'template': ('host', 'hostgroup', 'item', 'application', 'trigger',
+                 'graph', 'discoveryrule'),
+    'hostgroup': ('host', 'template'),
+    'hostinterface': ('host',),
+    'item': ('host', 'template', 'application', 'trigger', 'graph'),
+    'application': ('host', 'template', 'item'),
+    'trigger': ('host', 'template', 'item'),
+    'graph': ('host', 'template', 'item'),
+    'discoveryrule': ('host', 'template'),
+}
+
+
+class ZabbixAPICache(object):
+    """The :class:`ZabbixAPICache` keeps responses of read-only Zabbix API
+    methods for :class:`pyzabbix.api.ZabbixAPI`.
+
+    Only `*.get` methods and `apiinfo.version` are cached, keyed by method,
+    params and auth token, so one cache can be shared by sessions of
+    different users. Any other method called through the same
+    :class:`pyzabbix.api.ZabbixAPI` drops cached responses of its method
+    group and of the groups listed for it in :data:`RELATED_GROUPS`, eg
+    `host.update` drops `host.get`, `hostgroup.get`, `item.get` etc.
+
+    :type maxsize: int
+    :param maxsize: Maximum number of cached responses. Least recently used
+        are dropped first. Default: 1024
+
+    :type ttl: int
+    :param ttl: Number of seconds response is kept for. Default: 60
+
+    :type ttls: dict
+    :param ttls: Method name to `ttl` mapping, to override `ttl` per method.
+
+    >>> from pyzabbix import ZabbixAPI, ZabbixAPICache
+    >>> cache = ZabbixAPICache(ttl=30, ttls={'apiinfo.version': 3600})
+    >>> z = ZabbixAPI('https://zabbix.server', cache=cache)
+    >>> cache.hits, cache.misses
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, ttls=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __repr__(self):
+        """Represent detailed ZabbixAPICache view."""
+
+        return '<{0} size={1} hits={2} misses={3}>'.format(
+            self.__class__.__name__, len(self), self.hits, self.misses)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def cacheable(method):
+        """Check that response of `method` can be cached."""
+
+        return method.endswith('.get') or method == 'apiinfo.version'
+
+    @staticmethod
+    def key(method, params, auth=None):
+        """Build cache key from method, params and auth token.
+
+        :type auth: str
+        :param auth: Auth token of the request. Results depend on
+            permissions of the user, so they are never shared between
+            tokens. The key keeps only a hash of the token.
+
+        :rtype: str
+        :return: Key which is equal for equal params whatever the order of
+            dict keys.
+        """
+
+        key = method + json.dumps(params, sort_keys=True,
+                                  separators=(',', ':'))
+        if auth:
+            key = hashlib.sha256(auth.encode('utf-8')).hexdigest() + key
+        return key
+
+    def get(self, key):
+        """Get cached response.
+
+        :type key: str
+        :param key: Key built by :meth:`key`.
+
+        :return: Cached response or `None`.
+        """
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return None
+
+            # Re-insert to mark as recently used
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, method, value):
+        """Cache response.
+
+        :type key: str
+        :param key: Key built by :meth:`key`.
+
+        :type method: str
+        :param method: ZabbixAPI method, like: `host.get`.
+
+        :param value: Response to cache.
+        """
+
+        expires = time.time() + self.ttls.get(method, self.ttl)
+        group = method.split('.')[0]
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, group, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, method):
+        """Drop responses which could be changed by `method`.
+
+        :type method: str
+        :param method: ZabbixAPI method, like: `host.update`.
+        """
+
+        if self.cacheable(method):
+            return
+
+        group = method.split('.')[0]
+        groups = set(RELATED_GROUPS.get(group, ()))
+        groups.add(group)
+
+        with self._lock:
+            stale = [key for key, entry in self._entries.items()
+                     if entry[1] in groups]
+            for key in stale:
+                del self._entries[key]
+
+        if stale:
+            logger.debug('%s invalidated %d cached responses', method,
+                         len(stale))
+
+    def clear(self):
+        """Drop all cached responses."""
+
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,365 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright © 2014 Alexey Dubkov
+#
+# This file is part of py-zabbix.
+#
+# Py-zabbix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Py-zabbix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with py-zabbix. If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import logging
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+from .logger import NullHandler
+
+null_handler = NullHandler()
+logger = logging.getLogger(__name__)
+logger.addHandler(null_handler)
+
+
+class EndpointStats(object):
+    """The :class:`EndpointStats` contain statistics of one Zabbix endpoint.
+
+    :type address: tuple
+    :param address: Zabbix server or proxy `(host, port)`.
+    """
+
+    # Weight of the last exchange in :attr:`latency`
+    LATENCY_WEIGHT = 0.3
+
+    def __init__(self, address):
+        self.address = address
+        self.sent = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.latency = None
+        self.last_error = None
+        self.down_until = 0
+
+    def __repr__(self):
+        """Represent detailed EndpointStats view."""
+
+        return json.dumps({'address': '{0}:{1}'.format(*self.address),
+                           'sent': self.sent,
+                           'failed': self.failed,
+                           'latency': self.latency,
+                           'healthy': self.healthy,
+                           'last_error': repr(self.last_error)})
+
+    @property
+    def healthy(self):
+        """`False` while endpoint is backed off after a failure."""
+        return self.down_until <= time.time()
+
+
+class Dispatcher(object):
+    """The :class:`Dispatcher` chooses Zabbix endpoints to send a chunk to
+    and keeps :class:`EndpointStats` of them.
+
+    Base class sends a chunk to the first endpoint which accepts it, in
+    order of :meth:`order`. An endpoint which failed is skipped for
+    `backoff` seconds, doubled after every further failure up to
+    `max_backoff`. If all endpoints are backed off, they are still tried,
+    soonest to recover first.
+
+    :type backoff: float
+    :param backoff: Seconds to skip endpoint after first failure.
+        Default: 1
+
+    :type max_backoff: float
+    :param max_backoff: Maximum seconds to skip failing endpoint.
+        Default: 60
+    """
+
+    #: Send every chunk to every endpoint
+    broadcast = False
+
+    def __init__(self, backoff=1, max_backoff=60):
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Represent detailed Dispatcher view."""
+
+        return '<{0} endpoints={1}>'.format(self.__class__.__name__,
+                                            list(self.stats.values()))
+
+    def _stats(self, address):
+        """Get stats of endpoint, creating them for a new one.
+
+        Must be called with `self._lock` held.
+        """
+
+        stats = self.stats.get(address)
+        if stats is None:
+            stats = self.stats[address] = EndpointStats(address)
+        return stats
+
+    def order(self, endpoints):
+        """Order healthy endpoints by preference.
+
+        :type endpoints: list
+        :param endpoints: :class:`EndpointStats` of healthy endpoints in
+            configuration order.
+
+        :rtype: list
+        :return: :class:`EndpointStats` to try one by one.
+        """
+
+        return endpoints
+
+    def targets(self, addresses):
+        """Get endpoints to send the next chunk to.
+
+        :type addresses: list
+        :param addresses: Configured `(host, port)` of endpoints.
+
+        :rtype: list
+        :return: `(host, port)` of endpoints to try in turn.
+        """
+
+        now = time.time()
+        with self._lock:
+            endpoints = [self._stats(tuple(a)) for a in addresses]
+            if self.broadcast:
+                return [e.address for e in endpoints]
+
+            healthy = [e for e in endpoints if e.down_until <= now]
+            down = sorted((e for e in endpoints if e.down_until > now),
+                          key=lambda e: e.down_until)
+            return [e.address for e in self.order(healthy) + down]
+
+    def success(self, address, latency):
+        """Record that endpoint accepted a chunk.
+
+        :type address: tuple
+        :param address: `(host, port)` of endpoint.
+
+        :type latency: float
+        :param latency: Seconds the exchange took.
+        """
+
+        with self._lock:
+            stats = self._stats(tuple(address))
+            stats.sent += 1
+            stats.consecutive_failures = 0
+            stats.down_until = 0
+            if stats.latency is None:
+                stats.latency = latency
+            else:
+                stats.latency += stats.LATENCY_WEIGHT * (
+                    latency - stats.latency)
+
+    def failure(self, address, error):
+        """Record that endpoint failed and back it off.
+
+        :type address: tuple
+        :param address: `(host, port)` of endpoint.
+
+        :type error: :class:`Exception`
+        :param error: Error of the exchange.
+        """
+
+        with self._lock:
+            stats = self._stats(tuple(address))
+            stats.failed += 1
+            stats.consecutive_failures += 1
+            stats.last_error = error
+            if self.broadcast:
+                return
+            backoff = min(self.backoff * 2 ** (stats.consecutive_failures - 1),
+                          self.max_backoff)
+            stats.down_until = time.time() + backoff
+
+        logger.warning('Endpoint %s failed, skipping it for %.1f seconds: '
+                       '%r', address, backoff, error)
+
+    def delivery(self, addresses, accepted=None):
+        """Start delivery of one packet, see :class:`Delivery`.
+
+        :type addresses: list
+        :param addresses: Configured `(host, port)` of endpoints.
+
+        :type accepted: set
+        :param accepted: Endpoints which accepted the packet before, see
+            :class:`Delivery`.
+
+        :rtype: :class:`Delivery`
+        """
+
+        return Delivery(self, addresses, accepted)
+
+
+class Delivery(object):
+    """The :class:`Delivery` is one packet being sent by a
+    :class:`Dispatcher`, independent of how the packet is sent.
+
+    Iterating it gives `(host, port)` of endpoints to send the packet to,
+    until one accepts it, or until all accept it in broadcast mode. Every
+    exchange is reported by :meth:`success` or :meth:`failure`, then
+    :meth:`result` gives the response.
+
+    >>> delivery = dispatcher.delivery(addresses)
+    >>> for address in delivery:
+    ...     try:
+    ...         response = exchange(address, packet)
+    ...     except socket.error as err:
+    ...         delivery.failure(address, err)
+    ...         continue
+    ...     delivery.success(address, latency, response)
+    >>> delivery.result()
+
+    :type dispatcher: :class:`Dispatcher`
+    :param dispatcher: Dispatcher choosing endpoints.
+
+    :type addresses: list
+    :param addresses: Configured `(host, port)` of endpoints.
+
+    :type accepted: set
+    :param accepted: `(host, port)` of endpoints which accepted the packet
+        in broadcast mode, updated by :meth:`success`. Passing the same set
+        to the delivery of a retry skips them, so a retried broadcast does
+        not duplicate the packet on servers which have it already.
+    """
+
+    def __init__(self, dispatcher, addresses, accepted=None):
+        self.dispatcher = dispatcher
+        self.accepted = accepted if accepted is not None else set()
+        self.targets = [a for a in dispatcher.targets(addresses)
+                        if a not in self.accepted]
+        self.response = None
+        self.error = None
+        self._done = False
+
+    def __iter__(self):
+        for address in self.targets:
+            if self._done:
+                return
+            logger.debug('Sending data to %s', address)
+            yield address
+
+    def success(self, address, latency, response):
+        """Record reply of an endpoint.
+
+        :type address: tuple
+        :param address: `(host, port)` of endpoint.
+
+        :type latency: float
+        :param latency: Seconds the exchange took.
+
+        :type response: dict
+        :param response: Response of the endpoint, `False` if it was not
+            valid, which is a failure of the endpoint.
+
+        :raises socket.error: If Zabbix rejected the packet, or in
+            broadcast mode, if reply was not valid.
+        """
+
+        if response is False:
+            self.failure(address, socket.error(
+                'Invalid response from {0}:{1}'.format(*address)))
+            return
+
+        self.dispatcher.success(address, latency)
+        logger.debug('%s response: %s', address, response)
+
+        if response and response.get('response') != 'success':
+            logger.debug('Response error: %s}', response)
+            raise socket.error(response)
+
+        self.response = response
+        if self.dispatcher.broadcast:
+            self.accepted.add(address)
+        else:
+            self._done = True
+
+    def failure(self, address, error):
+        """Record network error of an endpoint.
+
+        :type address: tuple
+        :param address: `(host, port)` of endpoint.
+
+        :type error: :class:`socket.error`
+        :param error: Error of the exchange.
+
+        :raises socket.error: In broadcast mode, `error` itself.
+        """
+
+        self.dispatcher.failure(address, error)
+        if self.dispatcher.broadcast:
+            raise error
+        self.error = error
+
+    def result(self):
+        """Get response of the delivery.
+
+        :rtype: dict
+        :return: Response from Zabbix Server.
+
+        :raises socket.error: Error of the last endpoint if none accepted
+            the packet.
+        """
+
+        if not self._done and self.error is not None:
+            raise self.error
+        return self.response
+
+
+class Broadcast(Dispatcher):
+    """Send every chunk to every endpoint, stop at the first failure.
+    Endpoints are never backed off."""
+
+    broadcast = True
+
+
+class Failover(Dispatcher):
+    """Send to the first healthy endpoint in configuration order, next ones
+    are used only while it fails."""
+
+
+class RoundRobin(Dispatcher):
+    """Spread chunks evenly over healthy endpoints."""
+
+    def __init__(self, backoff=1, max_backoff=60):
+        super(RoundRobin, self).__init__(backoff, max_backoff)
+        self._next = 0
+
+    def order(self, endpoints):
+        if not endpoints:
+            return endpoints
+
+        start = self._next % len(endpoints)
+        self._next += 1
+        return endpoints[start:] + endpoints[:start]
+
+
+class LeastLatency(Dispatcher):
+    """Send to the healthy endpoint with the lowest average latency.
+    Endpoints without latency yet are tried first."""
+
+    def order(self, endpoints):
+        return sorted(endpoints, key=lambda e: e.latency or 0)
+
+
+DISPATCHERS = {
+    'broadcast': Broadcast,
+    'failover': Failover,
+    'round_robin': RoundRobin,
+    'least_latency': LeastLatency,
+}
@@ -0,0 +1,203 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright © 2014 Alexey Dubkov
+#
+# This file is part of py-zabbix.
+#
+# Py-zabbix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Py-zabbix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with py-zabbix. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import select
+import socket
+import threading
+import time
+from collections import deque
+
+from .logger import NullHandler
+
+null_handler = NullHandler()
+logger = logging.getLogger(__name__)
+logger.addHandler(null_handler)
+
+
+class ZabbixConnectionPool(object):
+    """The :class:`ZabbixConnectionPool` keeps open connections to Zabbix
+    trappers, so they can be reused between chunks.
+
+    Connections are kept per `(host, port)` pair. Before an idle connection
+    is handed out it is health checked: a socket which became readable while
+    it was idle was either closed by the peer or holds unexpected data, so it
+    is dropped and a new one is opened instead.
+
+    .. note:: Zabbix server and proxy close a trapper connection after they
+        reply, so with them every chunk still opens a new connection. The
+        pool pays off in front of endpoints which keep connections open
+        (relays, load balancers, TLS terminators).
+
+    :type connect: function
+    :param connect: Function which takes `(host, port)` tuple and returns
+        connected socket.
+
+    :type maxsize: int
+    :param maxsize: Maximum number of connections to one endpoint which can
+        be in use at the same time. Default: 4
+
+    :type idle_timeout: int
+    :param idle_timeout: Number of seconds after which an idle connection is
+        closed. Default: 60
+
+    >>> from pyzabbix import ZabbixSender
+    >>> zbx = ZabbixSender('127.0.0.1', use_pool=True)
+    """
+
+    def __init__(self, connect, maxsize=4, idle_timeout=60):
+        self.connect = connect
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._slots = {}
+
+    def __repr__(self):
+        """Represent detailed ZabbixConnectionPool view."""
+
+        with self._lock:
+            idle = sum(len(conns) for conns in self._idle.values())
+
+        return '<{0} maxsize={1} idle={2}>'.format(
+            self.__class__.__name__, self.maxsize, idle)
+
+    def _slot(self, host_addr):
+        with self._lock:
+            slot = self._slots.get(host_addr)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.maxsize)
+                self._slots[host_addr] = slot
+        return slot
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except socket.error:
+            pass
+
+    @staticmethod
+    def _is_alive(connection):
+        """Check that idle connection was not closed by the peer.
+
+        Idle connection must have nothing to read, so readable socket means
+        EOF, reset or garbage left from a previous exchange.
+        """
+
+        try:
+            readable, _, _ = select.select([connection], [], [], 0)
+        except (socket.error, ValueError, select.error):
+            return False
+
+        return not readable
+
+    def _evict(self, now):
+        """Close connections which were idle longer than `idle_timeout`.
+
+        Must be called with `self._lock` held.
+        """
+
+        expired = []
+        for conns in self._idle.values():
+            while conns and now - conns[0][1] > self.idle_timeout:
+                expired.append(conns.popleft()[0])
+        return expired
+
+    def acquire(self, host_addr):
+        """Get connection to `host_addr`.
+
+        Blocks while `maxsize` connections to this endpoint are in use.
+
+        :type host_addr: tuple
+        :param host_addr: Zabbix server `(host, port)`.
+
+        :rtype: tuple
+        :return: Connection and flag which is `True` if connection was
+            reused from the pool.
+        """
+
+        self._slot(host_addr).acquire()
+
+        try:
+            now = time.time()
+            with self._lock:
+                stale = self._evict(now)
+                conns = self._idle.get(host_addr)
+                while conns:
+                    # Most recently used connection is most likely alive
+                    connection = conns.pop()[0]
+                    if self._is_alive(connection):
+                        break
+                    stale.append(connection)
+                else:
+                    connection = None
+
+            for conn in stale:
+                self._close(conn)
+
+            if connection is not None:
+                logger.debug('Reuse connection to %s', host_addr)
+                return connection, True
+
+            logger.debug('Open new connection to %s', host_addr)
+            return self.connect(host_addr), False
+        except Exception:
+            self._slot(host_addr).release()
+            raise
+
+    def release(self, host_addr, connection):
+        """Return healthy connection to the pool.
+
+        :type host_addr: tuple
+        :param host_addr: Zabbix server `(host, port)`.
+
+        :type connection: :class:`socket._socketobject`
+        :param connection: Connection received from :meth:`acquire`.
+        """
+
+        with self._lock:
+            self._idle.setdefault(host_addr, deque()).append(
+                (connection, time.time()))
+        self._slot(host_addr).release()
+
+    def discard(self, host_addr, connection):
+        """Close broken connection and free its slot.
+
+        :type host_addr: tuple
+        :param host_addr: Zabbix server `(host, port)`.
+
+        :type connection: :class:`socket._socketobject`
+        :param connection: Connection received from :meth:`acquire`.
+        """
+
+        self._close(connection)
+        self._slot(host_addr).release()
+
+    def close(self):
+        """Close all idle connections."""
+
+        with self._lock:
+            idle = self._idle
+            self._idle = {}
+
+        for conns in idle.values():
+            for connection, _ in conns:
+                self._close(connection)
@@ -0,0 +1,272 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright © 2014 Alexey Dubkov
+#
+# This file is part of py-zabbix.
+#
+# Py-zabbix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Py-zabbix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with py-zabbix. If not, see <http://www.gnu.org/licenses/>.
+
+"""Framing of the `zabbix protocol
+<https://www.zabbix.com/documentation/current/manual/appendix/protocols/header_datalen>`_.
+
+Packet is a header followed by data. Header is `ZBXD`, one byte of flags,
+then data length and reserved field, 4 bytes each, or 8 bytes each with
+:data:`FLAG_LARGE`. With :data:`FLAG_COMPRESSED` data is compressed with
+zlib and reserved field holds the uncompressed length.
+"""
+
+import errno
+import logging
+import socket
+import struct
+import zlib
+
+from .logger import NullHandler
+
+null_handler = NullHandler()
+logger = logging.getLogger(__name__)
+logger.addHandler(null_handler)
+
+FLAG_PROTOCOL = 0x01
+FLAG_COMPRESSED = 0x02
+FLAG_LARGE = 0x04
+
+HEADER_SIZE = 13
+LARGE_HEADER_SIZE = 21
+
+# Zabbix server does not accept more than 1 GB from one connection
+MAX_PACKET_SIZE = 1 << 30
+
+# Errors of a connection which the peer had closed before it was used
+_CLOSED_ERRNOS = (errno.ECONNRESET, errno.EPIPE, errno.ECONNABORTED)
+
+_LENGTH = struct.Struct('<II')
+_LARGE_LENGTH = struct.Struct('<QQ')
+
+
+class ConnectionClosed(socket.error):
+    """Peer closed connection before it sent any byte of a reply."""
+
+
+def is_closed(error):
+    """Check that socket error means the peer had closed the connection,
+    eg reset or broken pipe, rather than a timeout."""
+
+    return (isinstance(error, ConnectionClosed) or
+            getattr(error, 'errno', None) in _CLOSED_ERRNOS)
+
+
+def pack(data, compression_level=None, max_size=MAX_PACKET_SIZE):
+    """Create a packet from data.
+
+    :type data: bytes
+    :param data: Data to send.
+
+    :type compression_level: int
+    :param compression_level: zlib compression level, data is not
+        compressed if it is `None`.
+
+    :type max_size: int
+    :param max_size: Maximum length of data, compressed or not.
+
+    :rtype: bytes
+    :return: Packet with header.
+    """
+
+    if len(data) > max_size:
+        raise ValueError('Packet of {0} bytes exceeds maximum size of {1} '
+                         'bytes'.format(len(data), max_size))
+
+    flags = FLAG_PROTOCOL
+    reserved = 0
+    if compression_level is not None:
+        flags |= FLAG_COMPRESSED
+        reserved = len(data)
+        data = zlib.compress(data, compression_level)
+
+    if max(len(data), reserved) > 0xffffffff:
+        flags |= FLAG_LARGE
+        lengths = _LARGE_LENGTH.pack(len(data), reserved)
+    else:
+        lengths = _LENGTH.pack(len(data), reserved)
+
+    return b'ZBXD' + struct.pack('B', flags) + lengths + data
+
+
+def header_size(prefix):
+    """Get header size from its first 5 bytes.
+
+    :type prefix: bytes
+    :param prefix: `ZBXD` and flags.
+
+    :rtype: int
+    :return: Header size or None if it is not a zabbix header.
+    """
+
+    if len(prefix) < 5 or prefix[:4] != b'ZBXD':
+        return None
+
+    flags = bytearray(prefix[4:5])[0]
+    if not flags & FLAG_PROTOCOL or flags & ~(
+            FLAG_PROTOCOL | FLAG_COMPRESSED | FLAG_LARGE):
+        return None
+
+    return LARGE_HEADER_SIZE if flags & FLAG_LARGE else HEADER_SIZE
+
+
+def unpack_header(header, max_size=MAX_PACKET_SIZE):
+    """Parse packet header.
+
+    :type header: bytes
+    :param header: Full header, see :func:`header_size`.
+
+    :type max_size: int
+    :param max_size: Maximum length of data, compressed or not.
+
+    :rtype: tuple
+    :return: Flags, data length and uncompressed data length, which is
+        `None` if data is not compressed. `None` if header is not valid.
+    """
+
+    size = header_size(header)
+    if size is None or len(header) != size:
+        return None
+
+    flags = bytearray(header[4:5])[0]
+    if size == LARGE_HEADER_SIZE:
+        data_len, reserved = _LARGE_LENGTH.unpack(header[5:])
+    else:
+        data_len, reserved = _LENGTH.unpack(header[5:])
+
+    if not flags & FLAG_COMPRESSED:
+        reserved = None
+
+    size = max(data_len, reserved or 0)
+    if size > max_size:
+        raise socket.error('Packet of {0} bytes exceeds maximum size of {1} '
+                           'bytes'.format(size, max_size))
+
+    return flags, data_len, reserved
+
+
+def unpack_data(data, uncompressed_len=None):
+    """Decompress packet data if needed.
+
+    :type data: bytes
+    :param data: Data as read from the socket.
+
+    :type uncompressed_len: int
+    :param uncompressed_len: Length from the header, or `None` if data is
+        not compressed.
+
+    :rtype: bytes
+    :return: Data.
+    """
+
+    if uncompressed_len is None:
+        return data
+
+    data = zlib.decompress(data)
+    if len(data) != uncompressed_len:
+        raise socket.error('Packet is {0} bytes, expected {1}'.format(
+            len(data), uncompressed_len))
+
+    return data
+
+
+def recv_exactly(sock, size):
+    """Read exactly `size` bytes from socket.
+
+    Bytes are read straight into one preallocated buffer, so large packets
+    are not copied on every read, only once when they are complete.
+
+    :type sock: :class:`socket.socket`
+    :param sock: Socket to read.
+
+    :type size: int
+    :param size: Number of bytes to read.
+
+    :rtype: bytes
+    :return: Read bytes, shorter than `size` if connection was closed.
+    """
+
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if not count:
+            return view[:received].tobytes()
+        received += count
+
+    # zlib and json of Python 2 do not take bytearray
+    return bytes(buf)
+
+
+def read_header(sock, max_size=MAX_PACKET_SIZE):
+    """Read and parse packet header from socket.
+
+    :rtype: tuple
+    :return: See :func:`unpack_header`.
+
+    :raises ConnectionClosed: If connection was closed or reset before the
+        first byte of header.
+    """
+
+    try:
+        header = recv_exactly(sock, HEADER_SIZE)
+    except socket.error as err:
+        if not is_closed(err):
+            raise
+        raise ConnectionClosed('Connection reset before reply: {0}'.format(
+            err))
+    if not header:
+        raise ConnectionClosed('Connection closed before reply')
+
+    size = header_size(header)
+    if size is not None and size > len(header) == HEADER_SIZE:
+        header += recv_exactly(sock, size - HEADER_SIZE)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('Response header: %s', bytes(header))
+
+    return unpack_header(bytes(header), max_size)
+
+
+def read_packet(sock, max_size=MAX_PACKET_SIZE):
+    """Read one packet from socket.
+
+    :type sock: :class:`socket.socket`
+    :param sock: Socket to read.
+
+    :type max_size: int
+    :param max_size: Maximum length of data, compressed or not.
+
+    :rtype: bytes
+    :return: Data of packet or `None` if header is not valid.
+    """
+
+    header = read_header(sock, max_size)
+    if header is None:
+        logger.debug('Zabbix return not valid response.')
+        return None
+
+    _, data_len, uncompressed_len = header
+    data = recv_exactly(sock, data_len)
+    if len(data) != data_len:
+        raise socket.error('Connection closed after {0} of {1} bytes'.format(
+            len(data), data_len))
+
+    return unpack_data(data, uncompressed_len)
@@ -0,0 +1,352 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright © 2014 Alexey Dubkov
+#
+# This file is part of py-zabbix.
+#
+# Py-zabbix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Py-zabbix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with py-zabbix. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
+
+from .logger import NullHandler
+from .sender import (MetricBatch, ZabbixResponse, ZabbixSender,
+                     ZabbixSenderException, string_types)
+
+null_handler = NullHandler()
+logger = logging.getLogger(__name__)
+logger.addHandler(null_handler)
+
+
+def _endpoint(value, port=10051):
+    """Normalize endpoint to `(host, port)`.
+
+    :type value: str or tuple
+    :param value: `'host'`, `'host:port'` or `(host, port)`.
+    """
+
+    if isinstance(value, (tuple, list)):
+        return value[0], int(value[1])
+
+    host, _, endpoint_port = value.rpartition(':')
+    if not host or not endpoint_port.isdigit():
+        return value, port
+    return host, int(endpoint_port)
+
+
+def routes_from_api(zapi, proxies=None, port=10051):
+    """Build host to endpoint map of hosts monitored by proxies.
+
+    Every proxy is reached by `proxies` if it has its name, by the address
+    of its interface for passive proxies, or by its name for active ones,
+    which Zabbix has no address for. Hosts monitored by Zabbix server
+    directly are not in the map.
+
+    :type zapi: :class:`pyzabbix.api.ZabbixAPI`
+    :param zapi: Logged in Zabbix API.
+
+    :type proxies: dict
+    :param proxies: Proxy name to endpoint mapping, `'host'`,
+        `'host:port'` or `(host, port)`.
+
+    :type port: int
+    :param port: Port of proxies without one. Default: 10051
+
+    :rtype: dict
+    :return: Host name to `(host, port)` mapping.
+    """
+
+    proxies = dict((name, _endpoint(endpoint, port))
+                   for name, endpoint in (proxies or {}).items())
+    version = tuple(int(v) for v in zapi.api_version().split('.')[:2])
+
+    endpoints = {}
+    if version >= (7, 0):
+        for proxy in zapi.proxy.get(output=['proxyid', 'name', 'address',
+                                            'port', 'operating_mode']):
+            name = proxy['name']
+            if name in proxies:
+                endpoints[proxy['proxyid']] = proxies[name]
+            elif proxy.get('operating_mode') == '1' and proxy.get('address'):
+                endpoints[proxy['proxyid']] = (proxy['address'],
+                                               int(proxy['port'] or port))
+            else:
+                endpoints[proxy['proxyid']] = (name, port)
+
+        hosts = zapi.host.get(output=['host', 'monitored_by', 'proxyid',
+                                      'assigned_proxyid'])
+        # Hosts of proxy groups are monitored by the assigned proxy
+        proxy_ids = ((h['host'], h.get('assigned_proxyid')
+                      if h.get('monitored_by') == '2' else h.get('proxyid'))
+                     for h in hosts)
+    else:
+        for proxy in zapi.proxy.get(output=['proxyid', 'host', 'status'],
+                                    selectInterface='extend'):
+            name = proxy['host']
+            interface = proxy.get('interface') or {}
+            if name in proxies:
+                endpoints[proxy['proxyid']] = proxies[name]
+            elif interface:
+                address = interface['ip'] if interface.get('useip') == '1' \
+                    else interface['dns']
+                endpoints[proxy['proxyid']] = (address,
+                                               int(interface['port'] or port))
+            else:
+                endpoints[proxy['proxyid']] = (name, port)
+
+        hosts = zapi.host.get(output=['host', 'proxy_hostid'])
+        proxy_ids = ((h['host'], h.get('proxy_hostid')) for h in hosts)
+
+    routes = {}
+    for host, proxy_id in proxy_ids:
+        if proxy_id in endpoints:
+            routes[host] = endpoints[proxy_id]
+    return routes
+
+
+class RoutingZabbixSender(object):
+    """The :class:`RoutingZabbixSender` send metrics of every host to the
+    Zabbix proxy which monitors the host.
+
+    Metrics are grouped by endpoint of their host, the groups are sent
+    at the same time, each by :class:`pyzabbix.sender.ZabbixSender` of its
+    endpoint, and their responses are merged. Errors of endpoints are in
+    :attr:`ZabbixResponse.errors` of merged response as
+    `((host, port), error)`.
+
+    :type routes: dict or function
+    :param routes: Host name to endpoint mapping, or function which takes
+        host name and returns endpoint or `None`. Endpoint is `'host'`,
+        `'host:port'` or `(host, port)`. It can be reloaded from Zabbix API
+        by :meth:`refresh`.
+
+    :type default: str or tuple
+    :param default: Endpoint of hosts which are not routed, usually Zabbix
+        server. Default: `None`, such metrics raise `ValueError`.
+
+    :type workers: int
+    :param workers: Maximum number of endpoints sent to at the same time.
+        Default: 8
+
+    :type port: int
+    :param port: Port of endpoints without one. Default: 10051
+
+    Other keyword arguments are passed to
+    :class:`pyzabbix.sender.ZabbixSender` of every endpoint, like
+    `chunk_size`, `compression` or `retries`.
+
+    >>> from pyzabbix import RoutingZabbixSender, ZabbixAPI
+    >>> zbx = RoutingZabbixSender(default='zabbix.example.com')
+    >>> zbx.refresh(ZabbixAPI('http://zabbix.example.com', user='Admin',
+    ...                       password='zabbix'))
+    >>> zbx.send(metrics)
+    """
+
+    def __init__(self, routes=None, default=None, workers=8, port=10051,
+                 **sender_args):
+        self.routes = routes if routes is not None else {}
+        self.default = default
+        self.workers = workers
+        self.port = port
+        self.sender_args = sender_args
+        self.senders = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        """Represent detailed RoutingZabbixSender view."""
+
+        routes = 'function' if callable(self.routes) else len(self.routes)
+        return '<{0} routes={1} senders={2}>'.format(
+            self.__class__.__name__, routes, len(self.senders))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def refresh(self, zapi, proxies=None):
+        """Reload routes from Zabbix API, see :func:`routes_from_api`.
+
+        Senders of endpoints which are not used anymore are closed.
+
+        :type zapi: :class:`pyzabbix.api.ZabbixAPI`
+        :param zapi: Logged in Zabbix API.
+
+        :type proxies: dict
+        :param proxies: Proxy name to endpoint mapping.
+
+        :rtype: dict
+        :return: New routes.
+        """
+
+        routes = routes_from_api(zapi, proxies, self.port)
+        logger.info('Loaded routes of %d hosts over %d proxies',
+                    len(routes), len(set(routes.values())))
+
+        used = set(routes.values())
+        if self.default is not None:
+            used.add(_endpoint(self.default, self.port))
+        with self._lock:
+            self.routes = routes
+            unused = [e for e in self.senders if e not in used]
+            senders = [self.senders.pop(e) for e in unused]
+        for sender in senders:
+            sender.close()
+
+        return routes
+
+    def route(self, host):
+        """Get endpoint of a host.
+
+        :type host: str
+        :param host: Host name.
+
+        :rtype: tuple
+        :return: `(host, port)` or `None` if host is not routed.
+        """
+
+        routes = self.routes
+        if callable(routes):
+            endpoint = routes(host)
+        else:
+            endpoint = routes.get(host)
+        if endpoint is None:
+            endpoint = self.default
+        if endpoint is None:
+            return None
+        return _endpoint(endpoint, self.port)
+
+    def _group(self, metrics):
+        """Group metrics by endpoint of their host.
+
+        :rtype: dict
+        :return: `(host, port)` to list of metrics mapping.
+        """
+
+        if isinstance(metrics, MetricBatch) and \
+                isinstance(metrics.hosts, string_types):
+            # Batch of one host is sent as is, without splitting
+            endpoint = self.route(metrics.hosts)
+            if endpoint is None:
+                raise ValueError('No route to Zabbix for hosts: {0}'.format(
+                    metrics.hosts))
+            return {endpoint: metrics}
+
+        groups = {}
+        endpoints = {}
+        unrouted = set()
+        for metric in metrics:
+            host = metric.host
+            try:
+                endpoint = endpoints[host]
+            except KeyError:
+                endpoint = endpoints[host] = self.route(host)
+            if endpoint is None:
+                unrouted.add(host)
+                continue
+            group = groups.get(endpoint)
+            if group is None:
+                group = groups[endpoint] = []
+            group.append(metric)
+
+        if unrouted:
+            raise ValueError('No route to Zabbix for hosts: {0}'.format(
+                ', '.join(sorted(unrouted))))
+
+        return groups
+
+    def _sender(self, endpoint):
+        """Get sender of endpoint, creating it for a new one."""
+
+        with self._lock:
+            sender = self.senders.get(endpoint)
+            if sender is None:
+                sender = self.senders[endpoint] = ZabbixSender(
+                    endpoint[0], endpoint[1], **self.sender_args)
+            return sender
+
+    def _send_group(self, endpoint, metrics):
+        """Send metrics of one endpoint and return its error instead of
+        raising it.
+
+        :rtype: tuple
+        :return: Response and error.
+        """
+
+        try:
+            return self._sender(endpoint).send(metrics), None
+        except ZabbixSenderException as err:
+            # Some chunks were delivered, their counters are kept
+            return err.response, err
+        except Exception as err:
+            return None, err
+
+    def send(self, metrics):
+        """Send the metrics to Zabbix proxies of their hosts.
+
+        Metrics of hosts without route raise `ValueError` before anything
+        is sent.
+
+        :type metrics: iterable
+        :param metrics: :class:`pyzabbix.sender.ZabbixMetric` of any hosts
+            or :class:`pyzabbix.sender.MetricBatch` to send to Zabbix.
+
+        :rtype: :class:`pyzabbix.sender.ZabbixResponse`
+        :return: Merged response of all endpoints.
+        """
+
+        groups = self._group(metrics)
+
+        if len(groups) <= 1 or self.workers <= 1:
+            replies = [self._send_group(e, m) for e, m in groups.items()]
+        else:
+            if self._pool is None:
+                self._pool = ThreadPool(self.workers)
+            replies = self._pool.map(lambda group: self._send_group(*group),
+                                     list(groups.items()))
+
+        result = ZabbixResponse()
+        for endpoint, (response, error) in zip(groups, replies):
+            unsent = 0
+            if response is not None:
+                # Errors of chunks are reported as error of the endpoint
+                result.merge(response, errors=False)
+            else:
+                unsent = len(groups[endpoint])
+            if error is not None:
+                logger.warning('Sending to %s:%d failed: %r', endpoint[0],
+                               endpoint[1], error)
+                result.add_error(endpoint, error, unsent)
+
+        if result.errors:
+            raise ZabbixSenderException(result)
+
+        return result
+
+    def close(self):
+        """Close senders of all endpoints and stop worker threads."""
+
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+        with self._lock:
+            senders = list(self.senders.values())
+            self.senders = {}
+        for sender in senders:
+            sender.close()
@@ -21,9 +21,14 @@ from decimal import Decimal
 import inspect
 import json
 import logging
+import random
 import socket
-import struct
 import re
+import time
+from collections import deque
+from itertools import islice, repeat
+from json.encoder import encode_basestring
+from multiprocessing.pool import ThreadPool
 
 # For python 2 and 3 compatibility
 try:
@@ -33,7 +38,30 @@ except ImportError:
     from io import StringIO
     import configparser
 
+try:
+    from sys import intern
+except ImportError:
+    pass
+
+try:
+    string_types = basestring
+    _NUMBERS = (int, long, float)
+except NameError:
+    string_types = str
+    _NUMBERS = (int, float)
+
+try:
+    from time import time_ns
+except ImportError:
+    def time_ns():
+        return int(time.time() * 1e9)
+
 from .logger import NullHandler
+from .adaptive import AdaptiveChunkSize
+from .dispatch import DISPATCHERS, Dispatcher
+from .pool import ZabbixConnectionPool
+from .spool import ZabbixSpool
+from . import protocol
 
 null_handler = NullHandler()
 logger = logging.getLogger(__name__)
@@ -49,6 +77,12 @@ class ZabbixResponse(object):
         self._total = 0
         self._time = 0
         self._chunk = 0
+        self._spooled = 0
+        self._spooled_values = 0
+        self._unsent = 0
+        self._merged = 0
+        self._errors = []
+        self._rejected = []
         pattern = (r'[Pp]rocessed:? (\d*);? [Ff]ailed:? (\d*);? '
                    r'[Tt]otal:? (\d*);? [Ss]econds spent:? (\d*\.\d*)')
         self._regex = re.compile(pattern)
@@ -73,6 +107,75 @@ class ZabbixResponse(object):
         self._time += Decimal(res.group(4))
         self._chunk += 1
 
+    def merge(self, other, errors=True):
+        """Add counters, errors and rejected metrics of another response.
+
+        :type other: :class:`ZabbixResponse`
+        :param other: Response to add to this one.
+
+        :type errors: bool
+        :param errors: Add errors of `other` too. Default: `True`
+        """
+
+        self._processed += other._processed
+        self._failed += other._failed
+        self._total += other._total
+        self._time += other._time
+        self._chunk += other._chunk
+        self._spooled += other._spooled
+        self._spooled_values += other._spooled_values
+        self._unsent += other._unsent
+        self._merged += other._merged
+        if errors:
+            self._errors.extend(other._errors)
+        self._rejected.extend(other._rejected)
+
+    def add_error(self, chunk, error, size=0):
+        """Remember that chunk was not delivered.
+
+        :type chunk: int
+        :param chunk: Index of the chunk in the sent metrics.
+
+        :type error: :class:`Exception`
+        :param error: Error raised while sending the chunk.
+
+        :type size: int
+        :param size: Number of values in the chunk.
+        """
+
+        self._errors.append((chunk, error))
+        self._unsent += size
+
+    def add_spooled(self, size=0):
+        """Remember that chunk was not delivered and was spooled.
+
+        :type size: int
+        :param size: Number of values in the chunk.
+        """
+
+        self._spooled += 1
+        self._spooled_values += size
+
+    def add_merged(self, count):
+        """Remember that values were merged into others before sending.
+
+        :type count: int
+        :param count: Number of values which were not sent by themselves.
+        """
+
+        self._merged += count
+
+    def add_rejected(self, metrics):
+        """Remember metrics which Zabbix failed to process.
+
+        :type metrics: iterable
+        :param metrics: :class:`ZabbixMetric` which were rejected.
+        """
+
+        self._rejected.extend(
+            (getattr(m, 'host', None), getattr(m, 'key', None))
+            for m in metrics)
+
     @property
     def processed(self):
         return self._processed
@@ -93,6 +196,84 @@ class ZabbixResponse(object):
     def chunk(self):
         return self._chunk
 
+    @property
+    def spooled(self):
+        """Number of chunks which were spooled to send them later."""
+        return self._spooled
+
+    @property
+    def spooled_values(self):
+        """Number of values in chunks which were spooled."""
+        return self._spooled_values
+
+    @property
+    def unsent(self):
+        """Number of values in chunks which were not sent, see
+        :attr:`errors`."""
+        return self._unsent
+
+    @property
+    def merged(self):
+        """Number of values merged into others by coalescing of
+        :class:`ZabbixSender`."""
+        return self._merged
+
+    @property
+    def rejected(self):
+        """List of `(host, key)` of metrics which Zabbix failed to process,
+        found by diagnose mode of :class:`ZabbixSender`."""
+        return self._rejected
+
+    @property
+    def errors(self):
+        """List of `(chunk index, error)` for chunks which were not sent."""
+        return self._errors
+
+
+class ZabbixSenderException(socket.error):
+    """Some chunks could not be sent to Zabbix.
+
+    Subclass of :class:`socket.error`, so it is caught by the same handlers
+    as errors of the serial mode.
+
+    :type response: :class:`ZabbixResponse`
+    :param response: Merged response of the delivered chunks.
+        :attr:`ZabbixResponse.errors` lists the failed ones.
+    """
+
+    def __init__(self, response):
+        errors = ', '.join('chunk {0}: {1!r}'.format(chunk, err)
+                           for chunk, err in response.errors)
+        super(ZabbixSenderException, self).__init__(
+            '{0} chunk(s) failed: {1}'.format(len(response.errors), errors))
+        self.response = response
+
+
+def _ns(clock, ns=None):
+    """Get nanoseconds of timestamp.
+
+    :type clock: int or float
+    :param clock: Unix timestamp.
+
+    :type ns: int
+    :param ns: Nanoseconds, if given explicitly.
+
+    :rtype: int
+    :return: `ns`, fractional part of float `clock` in nanoseconds, or
+        None.
+    """
+
+    if ns is None:
+        if not isinstance(clock, float):
+            return None
+        ns = min(int(round((clock % 1) * 1e9)), 999999999)
+
+    ns = int(ns)
+    if not 0 <= ns <= 999999999:
+        raise ValueError('Ns must be from 0 to 999999999')
+
+    return ns
+
 
 class ZabbixMetric(object):
     """The :class:`ZabbixMetric` contain one metric for zabbix server.
@@ -106,30 +287,349 @@ class ZabbixMetric(object):
     :type value: str
     :param value: Metric value.
 
-    :type clock: int
+    :type clock: int or float
     :param clock: Unix timestamp. Current time will used if not specified.
+        Fractional part of float timestamp is kept as `ns`.
+
+    :type ns: int
+    :param ns: Nanoseconds of `clock`, from 0 to 999999999. Ignored if
+        `clock` is not specified.
 
     >>> from pyzabbix import ZabbixMetric
     >>> ZabbixMetric('localhost', 'cpu[usage]', 20)
+    >>> ZabbixMetric('localhost', 'cpu[usage]', 20, 1457358608, 525000000)
     """
 
-    def __init__(self, host, key, value, clock=None):
+    __slots__ = ('host', 'key', 'value', 'clock', 'ns')
+
+    def __init__(self, host, key, value, clock=None, ns=None):
         self.host = str(host)
         self.key = str(key)
         self.value = str(value)
+        self.clock = None
+        self.ns = None
         if clock:
             if isinstance(clock, (float, int)):
                 self.clock = int(clock)
+                self.ns = _ns(clock, ns)
             else:
                 raise ValueError('Clock must be time in unixtime format')
 
+    @property
+    def __dict__(self):
+        """Metric fields as dict.
+
+        Metrics have `__slots__`, this keeps `vars(metric)` and
+        `metric.__dict__` working. `clock` and `ns` are omitted if they are
+        not set.
+        """
+
+        result = {'host': self.host, 'key': self.key, 'value': self.value}
+        if self.clock is not None:
+            result['clock'] = self.clock
+        if self.ns is not None:
+            result['ns'] = self.ns
+        return result
+
+    def __getstate__(self):
+        # Objects with `__slots__` are not picklable by protocols 0 and 1
+        # without it
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
     def __repr__(self):
         """Represent detailed ZabbixMetric view."""
 
-        result = json.dumps(self.__dict__, ensure_ascii=False)
-        logger.debug('%s: %s', self.__class__.__name__, result)
+        return json.dumps(self.__dict__, ensure_ascii=False)
 
-        return result
+
+class MetricBatch(object):
+    """The :class:`MetricBatch` contain many metrics stored as columns.
+
+    It is cheaper than a list of :class:`ZabbixMetric` when metrics come as
+    parallel arrays, eg many keys of one host. Slicing returns a view over
+    the same columns, so :class:`ZabbixSender` splits it into chunks without
+    copying.
+
+    :type host: str or list
+    :param host: Hostname shared by all metrics or list of hostnames.
+
+    :type keys: list
+    :param keys: Keys of metrics.
+
+    :type values: list
+    :param values: Metric values. Any sequence, eg NumPy array.
+
+    :type clock: int, float or list
+    :param clock: Unix timestamp shared by all metrics or list of them.
+        Current time will used if not specified. Fractional part of float
+        timestamps is kept as `ns`.
+
+    :type ns: int or list
+    :param ns: Nanoseconds of `clock` shared by all metrics or list of
+        them. Ignored if `clock` is not specified.
+
+    >>> from pyzabbix import MetricBatch
+    >>> MetricBatch('localhost', ['cpu[user]', 'cpu[system]'], [20, 5])
+    """
+
+    __slots__ = ('hosts', 'keys', 'values', 'clocks', 'ns', '_start',
+                 '_stop')
+
+    def __init__(self, host, keys, values, clock=None, ns=None):
+        if len(keys) != len(values):
+            raise ValueError('Keys and values must have the same length')
+
+        if isinstance(host, string_types):
+            # Python 2 interns only byte strings
+            self.hosts = intern(host) if isinstance(host, str) else host
+        else:
+            if len(host) != len(keys):
+                raise ValueError('Hosts and keys must have the same length')
+            self.hosts = [intern(str(h)) for h in host]
+
+        self.keys = [intern(str(k)) for k in keys]
+        self.values = values
+
+        if clock is None or isinstance(clock, (float, int)):
+            self.clocks = int(clock) if clock else None
+            if ns is None and self.clocks is not None:
+                ns = _ns(clock)
+        else:
+            if len(clock) != len(keys):
+                raise ValueError('Clocks and keys must have the same length')
+            self.clocks = [int(c) for c in clock]
+            if ns is None and any(isinstance(c, float) for c in clock):
+                ns = [_ns(c) or 0 for c in clock]
+
+        self.ns = None
+        if self.clocks is not None and ns is not None:
+            if isinstance(ns, (float, int)):
+                self.ns = _ns(0, ns)
+            elif len(ns) != len(keys):
+                raise ValueError('Ns and keys must have the same length')
+            else:
+                self.ns = [_ns(0, n) for n in ns]
+
+        self._start = 0
+        self._stop = len(keys)
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getstate__(self):
+        # View is pickled with whole columns it shares
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __getitem__(self, index):
+        """Get :class:`ZabbixMetric` by index or view of metrics by slice."""
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError('MetricBatch slice step must be 1')
+
+            view = MetricBatch.__new__(MetricBatch)
+            view.hosts = self.hosts
+            view.keys = self.keys
+            view.values = self.values
+            view.clocks = self.clocks
+            view.ns = self.ns
+            view._start = self._start + start
+            view._stop = self._start + max(start, stop)
+            return view
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('MetricBatch index out of range')
+
+        i = self._start + index
+        hosts = self.hosts
+        host = hosts if isinstance(hosts, string_types) else hosts[i]
+        clock, ns = self.clocks, self.ns
+        if isinstance(clock, list):
+            clock = clock[i]
+        if isinstance(ns, list):
+            ns = ns[i]
+        return ZabbixMetric(host, self.keys[i], self.values[i], clock, ns)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self):
+        """Represent detailed MetricBatch view."""
+
+        return '[{0}]'.format(', '.join(repr(m) for m in self))
+
+    def encode(self):
+        """Encode metrics as JSON objects separated by commas.
+
+        Hostname, clock and ns shared by all metrics are escaped only once.
+
+        :rtype: bytes
+        :return: JSON of metrics for `data` of zabbix request.
+        """
+
+        escape = encode_basestring
+        start, stop = self._start, self._stop
+        if start >= stop:
+            return b''
+
+        # Numbers need no escaping, str() of them is plain ASCII
+        rows = [escape(k) + ',"value":' +
+                ('"%s"' % v if type(v) in _NUMBERS else escape(str(v)))
+                for k, v in zip(self.keys[start:stop],
+                                self.values[start:stop])]
+
+        hosts = self.hosts
+        if isinstance(hosts, string_types):
+            head = '{"host":' + escape(hosts) + ',"key":'
+        else:
+            head = ['{"host":' + escape(h) + ',"key":'
+                    for h in hosts[start:stop]]
+
+        clocks, ns = self.clocks, self.ns
+        if clocks is None:
+            tail = '}'
+        elif isinstance(clocks, list) or isinstance(ns, list):
+            clocks = clocks[start:stop] if isinstance(clocks, list) \
+                else repeat(clocks)
+            if ns is None:
+                tail = [',"clock":%d}' % c for c, _ in zip(clocks, rows)]
+            else:
+                ns = ns[start:stop] if isinstance(ns, list) else repeat(ns)
+                tail = [',"clock":%d,"ns":%d}' % (c, n)
+                        for c, n, _ in zip(clocks, ns, rows)]
+        elif ns is None:
+            tail = ',"clock":%d}' % clocks
+        else:
+            tail = ',"clock":%d,"ns":%d}' % (clocks, ns)
+
+        if isinstance(head, list) or isinstance(tail, list):
+            if not isinstance(head, list):
+                head = repeat(head)
+            if not isinstance(tail, list):
+                tail = repeat(tail)
+            data = ','.join([h + r + t for h, r, t in zip(head, rows, tail)])
+        else:
+            # Shared parts are written once, as the separator of rows
+            data = head + (tail + ',' + head).join(rows) + tail
+
+        return data.encode('utf-8')
+
+
+#: Policies of :func:`coalesce`
+COALESCE_POLICIES = ('keep_all', 'last', 'min', 'max', 'sum', 'avg')
+
+
+def _number(value):
+    """Parse metric value as int or float, raise `ValueError` if it is not
+    a number."""
+
+    if value.lstrip('-').isdigit():
+        return int(value)
+    return float(value)
+
+
+def _aggregate(metrics, policy):
+    """Merge values of one `(host, key)` by `policy`.
+
+    Value of the result is the aggregate, the rest is of the last metric.
+    If any value is not a number, the last metric is kept as it is.
+    """
+
+    last = metrics[-1]
+    try:
+        values = [_number(m.value) for m in metrics]
+    except ValueError:
+        logger.warning('Cannot %s non-numeric values of %s %s, keeping the '
+                       'last one', policy, last.host, last.key)
+        return last
+
+    if policy == 'min':
+        value = min(values)
+    elif policy == 'max':
+        value = max(values)
+    else:
+        value = sum(values)
+        if policy == 'avg':
+            value = value / float(len(values))
+            if all(isinstance(v, int) for v in values) and \
+                    value.is_integer():
+                value = int(value)
+
+    return ZabbixMetric(last.host, last.key, value, last.clock, last.ns)
+
+
+def coalesce(metrics, policy='last'):
+    """Merge metrics of the same `(host, key)` into one.
+
+    Metrics are indexed by `(host, key)` in a dict, so it takes one pass
+    over them. Merged metric takes place of the first one of its
+    `(host, key)`, so order of the others is kept.
+
+    :type metrics: iterable
+    :param metrics: :class:`ZabbixMetric` or :class:`MetricBatch`.
+
+    :type policy: str
+    :param policy: How values are merged:
+        `'last'` - the last metric wins,
+        `'min'`, `'max'`, `'sum'`, `'avg'` - value is aggregate of numeric
+        values, `clock` is of the last metric,
+        `'keep_all'` - metrics are not merged.
+
+    :rtype: tuple
+    :return: Metrics and number of values merged into others. If nothing
+        was merged, `metrics` are returned as they are.
+
+    >>> coalesce([ZabbixMetric('host', 'key', 1),
+    ...           ZabbixMetric('host', 'key', 2)], 'sum')
+    ([{"host": "host", "key": "key", "value": "3"}], 1)
+    """
+
+    if policy not in COALESCE_POLICIES:
+        raise ValueError('Coalesce policy must be one of: {0}'.format(
+            ', '.join(COALESCE_POLICIES)))
+    if policy == 'keep_all':
+        return metrics, 0
+
+    if not isinstance(metrics, (list, tuple, MetricBatch)):
+        metrics = list(metrics)
+
+    index = {}
+    result = []
+    duplicates = {}
+    for metric in metrics:
+        key = (metric.host, metric.key)
+        position = index.get(key)
+        if position is None:
+            index[key] = len(result)
+            result.append(metric)
+        elif policy == 'last':
+            result[position] = metric
+        else:
+            group = duplicates.get(position)
+            if group is None:
+                group = duplicates[position] = [result[position]]
+            group.append(metric)
+
+    merged = len(metrics) - len(result)
+    if not merged:
+        return metrics, 0
+
+    for position, group in duplicates.items():
+        result[position] = _aggregate(group, policy)
+
+    return result, merged
 
 
 class ZabbixSender(object):
@@ -150,7 +650,8 @@ class ZabbixSender(object):
          /etc/zabbix/zabbix_agentd.conf
 
     :type chunk_size: int
-    :param chunk_size: Number of metrics send to the server at one time
+    :param chunk_size: Number of metrics send to the server at one time,
+         initial one with `adaptive_chunk_size`
 
     :type socket_wrapper: function
     :param socket_wrapper: to provide a socket wrapper function to be used to
@@ -168,6 +669,122 @@ class ZabbixSender(object):
     :type timeout: int
     :param timeout: Number of seconds before call to Zabbix server times out
          Default: 10
+
+    :type use_pool: bool
+    :param use_pool: Keep connections open and reuse them between chunks
+         with :class:`pyzabbix.pool.ZabbixConnectionPool`. Default: `False`
+
+    :type pool_size: int
+    :param pool_size: Maximum number of pooled connections to one server.
+         Default: 4
+
+    :type pool_idle_timeout: int
+    :param pool_idle_timeout: Number of seconds after which an idle pooled
+         connection is closed. Default: 60
+
+    :type workers: int
+    :param workers: Number of chunks sent at the same time, each over its
+         own connection. If it is greater than 1, a failed chunk does not
+         stop the others and :class:`ZabbixSenderException` is raised after
+         all chunks are done. Default: 1
+
+    :type compression: bool
+    :param compression: Compress packets with zlib, supported by Zabbix
+         4.0 and later. Compressed replies are decoded in any case.
+         Default: `False`
+
+    :type compression_level: int
+    :param compression_level: zlib compression level, from 1 (fastest) to
+         9 (smallest). Default: 6
+
+    :type max_packet_size: int
+    :param max_packet_size: Maximum size in bytes of a request or a reply.
+         Packets over 4 GB are sent with the large packet header, but Zabbix
+         server accepts them only when its own limit allows.
+         Default: 1 GB, the limit of Zabbix server
+
+    :type request_clock: bool
+    :param request_clock: Stamp every chunk with `clock` and `ns` of the
+         time it is sent. Zabbix server then uses them to align `clock` of
+         metrics with its own time, and as time of metrics without `clock`.
+         Default: `False`
+
+    :type dispatch: str or :class:`pyzabbix.dispatch.Dispatcher`
+    :param dispatch: How chunks are spread over servers of `use_config`:
+         `'broadcast'` - every chunk is sent to every server,
+         `'failover'` - to the first healthy server,
+         `'round_robin'` - to healthy servers in turn,
+         `'least_latency'` - to the healthy server which replies fastest.
+         A failed server is skipped with growing backoff and the chunk is
+         sent to the next one, except for `'broadcast'`.
+         Per server statistics are in :attr:`stats`.
+         Default: `'broadcast'`
+
+    :type retries: int
+    :param retries: Number of times a chunk is sent again after network
+         error. Chunks which Zabbix replied to, but rejected, are not
+         retried. In `'broadcast'` mode a chunk is sent again only to
+         servers which did not accept it yet. Default: 0
+
+    :type retry_backoff: float
+    :param retry_backoff: Seconds to wait before the first retry, doubled
+         for every next one. The actual delay is random between zero and
+         that value, so many senders do not retry at the same moment.
+         Default: 0.5
+
+    :type retry_max_backoff: float
+    :param retry_max_backoff: Maximum seconds to wait between retries.
+         Default: 30
+
+    :type spool: :class:`pyzabbix.spool.ZabbixSpool` or str
+    :param spool: Spool, or path to spool file, to keep chunks which were
+         not delivered after all retries. Such chunks are counted in
+         :attr:`ZabbixResponse.spooled` instead of raising an error.
+         Spooled chunks are sent before new ones on every :meth:`send`, or
+         by :meth:`replay_spool`. While spool is not empty, new chunks are
+         appended to it to keep the order. Default: `None`
+
+    :type diagnose: bool
+    :param diagnose: Find metrics which Zabbix failed to process, eg
+         because their item does not exist, and list them in
+         :attr:`ZabbixResponse.rejected`. Zabbix reports only the number of
+         failed values, so a chunk with failures is bisected: its first
+         half is sent again and the number of failures in the second half
+         is deduced from the reply. Resent values which Zabbix accepts are
+         stored twice, so use it to debug, not in normal operation.
+         Default: `False`
+
+    :type diagnose_max_sends: int
+    :param diagnose_max_sends: Maximum number of extra sends per
+         :meth:`send` call in diagnose mode. Failures which are not found
+         within it are counted in :attr:`ZabbixResponse.failed` only.
+         Default: 16
+
+    :type coalesce: str
+    :param coalesce: Merge metrics of the same `(host, key)` of one
+         :meth:`send` call before they are split into chunks, by policy of
+         :func:`coalesce`: `'last'`, `'min'`, `'max'`, `'sum'`, `'avg'` or
+         `'keep_all'`. Number of merged values is in
+         :attr:`ZabbixResponse.merged`. Generators are read as a whole to
+         find duplicates. Default: `'keep_all'`
+
+    :type adaptive_chunk_size: bool
+    :param adaptive_chunk_size: Tune chunk size while sending by
+         :class:`pyzabbix.adaptive.AdaptiveChunkSize`: grow chunks while
+         they are delivered fast, shrink them when they are slow, Zabbix
+         reports it is loaded or sending fails. Changes of chunk size are
+         in :attr:`chunk_size_history`. Default: `False`
+
+    :type min_chunk_size: int
+    :param min_chunk_size: Minimum adaptive chunk size. Default: 10
+
+    :type max_chunk_size: int
+    :param max_chunk_size: Maximum adaptive chunk size. Default: 10000
+
+    :type chunk_target_time: float
+    :param chunk_target_time: Seconds an adaptive chunk should take from
+         sending to the reply at most. Default: 0.5
+
     >>> from pyzabbix import ZabbixMetric, ZabbixSender
     >>> metrics = []
     >>> m = ZabbixMetric('localhost', 'cpu[usage]', 20)
@@ -182,10 +799,63 @@ class ZabbixSender(object):
                  use_config=None,
                  chunk_size=250,
                  socket_wrapper=None,
-                 timeout=10):
+                 timeout=10,
+                 use_pool=False,
+                 pool_size=4,
+                 pool_idle_timeout=60,
+                 workers=1,
+                 compression=False,
+                 compression_level=6,
+                 max_packet_size=protocol.MAX_PACKET_SIZE,
+                 request_clock=False,
+                 dispatch='broadcast',
+                 retries=0,
+                 retry_backoff=0.5,
+                 retry_max_backoff=30,
+                 spool=None,
+                 diagnose=False,
+                 diagnose_max_sends=16,
+                 coalesce='keep_all',
+                 adaptive_chunk_size=False,
+                 min_chunk_size=10,
+                 max_chunk_size=10000,
+                 chunk_target_time=0.5):
 
         self.chunk_size = chunk_size
         self.timeout = timeout
+        self.workers = workers
+        self.compression = compression
+        self.compression_level = compression_level
+        self.max_packet_size = max_packet_size
+        self.request_clock = request_clock
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.retry_max_backoff = retry_max_backoff
+        if isinstance(spool, string_types):
+            spool = ZabbixSpool(spool)
+        self.spool = spool
+        self.diagnose = diagnose
+        self.diagnose_max_sends = diagnose_max_sends
+        if coalesce not in COALESCE_POLICIES:
+            raise ValueError('Coalesce policy must be one of: {0}'.format(
+                ', '.join(COALESCE_POLICIES)))
+        self.coalesce = coalesce
+        self.adaptive_chunk_size = adaptive_chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.chunk_target_time = chunk_target_time
+        self._chunk_sizer = None
+        if adaptive_chunk_size:
+            # Check bounds early
+            self.chunk_sizer
+        self.dispatch = dispatch
+        self._dispatcher = None
+        if isinstance(dispatch, Dispatcher):
+            self._dispatcher = dispatch
+        elif dispatch not in DISPATCHERS:
+            raise ValueError('Dispatch must be one of: {0}'.format(
+                ', '.join(sorted(DISPATCHERS))))
+        self._workers_pool = None
 
         self.socket_wrapper = socket_wrapper
         if use_config:
@@ -193,10 +863,16 @@ class ZabbixSender(object):
         else:
             self.zabbix_uri = [(zabbix_server, zabbix_port)]
 
+        self.pool = None
+        if use_pool:
+            self.pool = ZabbixConnectionPool(self._connect,
+                                             maxsize=pool_size,
+                                             idle_timeout=pool_idle_timeout)
+
     def __repr__(self):
         """Represent detailed ZabbixSender view."""
 
-        result = json.dumps(self.__dict__, ensure_ascii=False)
+        result = json.dumps(self.__dict__, ensure_ascii=False, default=repr)
         logger.debug('%s: %s', self.__class__.__name__, result)
 
         return result
@@ -229,7 +905,7 @@ class ZabbixSender(object):
             # python2
             args = inspect.getargspec(
                 configparser.RawConfigParser.__init__).args
-        except ValueError:
+        except (AttributeError, ValueError):
             # python3
             args = inspect.getfullargspec(
                 configparser.RawConfigParser.__init__).kwonlyargs
@@ -310,15 +986,88 @@ class ZabbixSender(object):
         """
 
         msg = ','.join(messages)
-        request = '{{"request":"sender data","data":[{msg}]}}'.format(msg=msg)
-        request = request.encode("utf-8")
+        request = '{{"request":"sender data","data":[{msg}'.format(msg=msg)
+        request = request.encode("utf-8") + self._request_end()
+        logger.debug('Request: %s', request)
+
+        return request
+
+    def _encode_request(self, metrics, stamp=True):
+        """Encode zabbix request for a chunk of metrics.
+
+        Does the same as :meth:`_create_messages` followed by
+        :meth:`_create_request`, but writes JSON of every metric straight
+        into one buffer instead of calling `json.dumps` per metric. Metrics
+        of other types than :class:`ZabbixMetric` are serialized with
+        `str()`.
+
+        :type metrics: list or :class:`MetricBatch`
+        :param metrics: List of :class:`zabbix.sender.ZabbixMetric`.
+
+        :type stamp: bool
+        :param stamp: Add request `clock` and `ns` if `self.request_clock`
+            is set.
+
+        :rtype: bytes
+        :return: Formatted zabbix request
+        """
+
+        if isinstance(metrics, MetricBatch):
+            request = b''.join((b'{"request":"sender data","data":[',
+                                metrics.encode(), self._request_end(stamp)))
+            logger.debug('Request: %s', request)
+            return request
+
+        escape = encode_basestring
+        request = bytearray(b'{"request":"sender data","data":[')
+
+        for m in metrics:
+            if type(m) is not ZabbixMetric:
+                item = str(m) + ','
+            elif m.clock is None:
+                item = '{"host":%s,"key":%s,"value":%s},' % (
+                    escape(m.host), escape(m.key), escape(m.value))
+            elif m.ns is None:
+                item = '{"host":%s,"key":%s,"value":%s,"clock":%d},' % (
+                    escape(m.host), escape(m.key), escape(m.value), m.clock)
+            else:
+                item = ('{"host":%s,"key":%s,"value":%s,"clock":%d,'
+                        '"ns":%d},') % (escape(m.host), escape(m.key),
+                                        escape(m.value), m.clock, m.ns)
+            request += item.encode('utf-8')
+
+        # Replace trailing comma
+        if request[-1:] == b',':
+            del request[-1:]
+        request += self._request_end(stamp)
+
+        request = bytes(request)
         logger.debug('Request: %s', request)
 
         return request
 
+    def _request_end(self, stamp=True):
+        """Close `data` list and request, adding `clock` and `ns` of the
+        request if `self.request_clock` and `stamp` are set.
+
+        Time is taken once per request, not per metric.
+
+        :rtype: bytes
+        :return: End of zabbix request
+        """
+
+        if not (stamp and self.request_clock):
+            return b']}'
+
+        clock, ns = divmod(time_ns(), 1000000000)
+        return ('],"clock":%d,"ns":%d}' % (clock, ns)).encode('utf-8')
+
     def _create_packet(self, request):
         """Create a formatted packet from a request.
 
+        With `self.compression` the request is compressed and the header
+        carries flag `0x02` and the length of uncompressed request.
+
         :type request: str
         :param request: Formatted zabbix request
 
@@ -326,20 +1075,54 @@ class ZabbixSender(object):
         :return: Data packet for zabbix
         """
 
-        data_len = struct.pack('<Q', len(request))
-        packet = b'ZBXD\x01' + data_len + request
+        level = self.compression_level if self.compression else None
+        packet = protocol.pack(request, level, self.max_packet_size)
 
-        def ord23(x):
-            if not isinstance(x, int):
-                return ord(x)
-            else:
-                return x
+        if logger.isEnabledFor(logging.DEBUG):
+            def ord23(x):
+                if not isinstance(x, int):
+                    return ord(x)
+                else:
+                    return x
 
-        logger.debug('Packet [str]: %s', packet)
-        logger.debug('Packet [hex]: %s',
-                     ':'.join(hex(ord23(x))[2:] for x in packet))
+            logger.debug('Packet [str]: %s', packet)
+            logger.debug('Packet [hex]: %s',
+                         ':'.join(hex(ord23(x))[2:] for x in packet))
         return packet
 
+    def _read_response(self, connection):
+        """Read and parse one response from zabbix server.
+
+        Unlike :meth:`_get_response` it leaves the connection open.
+
+        :type connection: :class:`socket._socketobject`
+        :param connection: Socket to read.
+
+        :rtype: dict
+        :return: Response from zabbix server or False in case of error.
+        """
+
+        response_body = protocol.read_packet(connection, self.max_packet_size)
+        if response_body is None:
+            return False
+
+        return self._decode_response(response_body)
+
+    def _decode_response(self, response_body):
+        """Decode JSON of response body.
+
+        :type response_body: bytes
+        :param response_body: Data of response packet.
+
+        :rtype: dict
+        :return: Response from zabbix server.
+        """
+
+        result = json.loads(response_body.decode("utf-8"))
+        logger.debug('Data received: %s', result)
+
+        return result
+
     def _get_response(self, connection):
         """Get response from zabbix server, reads from self.socket.
 
@@ -350,95 +1133,532 @@ class ZabbixSender(object):
         :return: Response from zabbix server or False in case of error.
         """
 
-        response_header = self._receive(connection, 13)
-        logger.debug('Response header: %s', response_header)
+        try:
+            return self._read_response(connection)
+        finally:
+            try:
+                connection.close()
+            except socket.error:
+                pass
+
+    def _connect(self, host_addr):
+        """Open connection to zabbix server.
 
-        if (not response_header.startswith(b'ZBXD\x01') or
-                len(response_header) != 13):
-            logger.debug('Zabbix return not valid response.')
-            result = False
+        :type host_addr: tuple
+        :param host_addr: Zabbix server `(host, port)`.
+
+        :rtype: :class:`socket._socketobject`
+        :return: Connected socket.
+        """
+
+        try:
+            # IPv4
+            connection_ = socket.socket(socket.AF_INET)
+        except socket.error:
+            # IPv6
+            try:
+                connection_ = socket.socket(socket.AF_INET6)
+            except socket.error:
+                raise Exception("Error creating socket for {host_addr}".format(host_addr=host_addr))
+        if self.socket_wrapper:
+            connection = self.socket_wrapper(connection_)
         else:
-            response_len = struct.unpack('<Q', response_header[5:])[0]
-            response_body = connection.recv(response_len)
-            result = json.loads(response_body.decode("utf-8"))
-            logger.debug('Data received: %s', result)
+            connection = connection_
+
+        connection.settimeout(self.timeout)
 
         try:
+            # server and port must be tuple
+            connection.connect(host_addr)
+        except socket.timeout:
+            logger.error('Sending failed: Connection to %s timed out after'
+                         '%d seconds', host_addr, self.timeout)
             connection.close()
-        except socket.error:
-            pass
+            raise socket.timeout
+        except socket.error as err:
+            logger.warning('Sending failed: %s', getattr(err, 'msg', str(err)))
+            connection.close()
+            raise err
 
-        return result
+        return connection
+
+    def _send_packet(self, host_addr, packet):
+        """Send packet over a new connection and read the response.
+
+        :type host_addr: tuple
+        :param host_addr: Zabbix server `(host, port)`.
+
+        :type packet: bytes
+        :param packet: Data packet for zabbix.
+
+        :rtype: dict
+        :return: Response from zabbix server or False in case of error.
+        """
+
+        connection = self._connect(host_addr)
+
+        try:
+            connection.sendall(packet)
+        except socket.timeout:
+            logger.error('Sending failed: Connection to %s timed out after'
+                         '%d seconds', host_addr, self.timeout)
+            connection.close()
+            raise socket.timeout
+        except socket.error as err:
+            # In case of error we should close connection, otherwise
+            # we will close it after data will be received.
+            logger.warning('Sending failed: %s', getattr(err, 'msg', str(err)))
+            connection.close()
+            raise err
+
+        return self._get_response(connection)
+
+    def _pool_send_packet(self, host_addr, packet):
+        """Send packet over a pooled connection and read the response.
+
+        Reused connection could be closed by the server in the meantime, so
+        if sending fails or the connection is closed before any byte of
+        the reply, the packet is sent once more over a new connection.
+        After a timeout or a broken reply it is not, the server could have
+        stored the values already.
+
+        :type host_addr: tuple
+        :param host_addr: Zabbix server `(host, port)`.
+
+        :type packet: bytes
+        :param packet: Data packet for zabbix.
+
+        :rtype: dict
+        :return: Response from zabbix server or False in case of error.
+        """
+
+        while True:
+            connection, reused = self.pool.acquire(host_addr)
+
+            try:
+                connection.sendall(packet)
+                response = self._read_response(connection)
+            except Exception as err:
+                # Slot must be freed whatever went wrong
+                self.pool.discard(host_addr, connection)
+                if reused and isinstance(err, socket.error) and \
+                        protocol.is_closed(err):
+                    logger.debug('Pooled connection to %s failed: %s',
+                                 host_addr, err)
+                    continue
+                if isinstance(err, socket.error):
+                    logger.warning('Sending failed: %s',
+                                   getattr(err, 'msg', str(err)))
+                raise
+
+            if response is False:
+                self.pool.discard(host_addr, connection)
+            else:
+                self.pool.release(host_addr, connection)
+
+            return response
+
+    def close(self):
+        """Close pooled connections and stop worker threads."""
+
+        if self._workers_pool is not None:
+            self._workers_pool.close()
+            self._workers_pool.join()
+            self._workers_pool = None
+
+        if self.pool is not None:
+            self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def dispatcher(self):
+        """Dispatcher of chunks, created on first use.
+
+        :rtype: :class:`pyzabbix.dispatch.Dispatcher`
+        """
+        if self._dispatcher is None:
+            self._dispatcher = DISPATCHERS[self.dispatch]()
+        return self._dispatcher
+
+    @property
+    def chunk_sizer(self):
+        """Tuner of chunk size in adaptive mode, created on first use.
+
+        :rtype: :class:`pyzabbix.adaptive.AdaptiveChunkSize`
+        :return: Tuner or `None` if chunk size is fixed.
+        """
+        if self.adaptive_chunk_size and self._chunk_sizer is None:
+            self._chunk_sizer = AdaptiveChunkSize(
+                self.chunk_size, self.min_chunk_size, self.max_chunk_size,
+                self.chunk_target_time)
+        return self._chunk_sizer
+
+    @property
+    def chunk_size_history(self):
+        """Changes of chunk size in adaptive mode.
+
+        :rtype: list
+        :return: `(timestamp, chunk size, reason)` of the last 100 changes,
+            oldest first. Reason is one of `'initial'`, `'idle'`, `'slow'`,
+            `'loaded'`, `'timeout'` and `'failure'`.
+        """
+        if self.chunk_sizer is None:
+            return []
+        return list(self.chunk_sizer.history)
+
+    @property
+    def stats(self):
+        """Statistics of servers.
+
+        :rtype: dict
+        :return: `(host, port)` to
+            :class:`pyzabbix.dispatch.EndpointStats` mapping.
+        """
+        return dict(self.dispatcher.stats)
 
-    def _chunk_send(self, metrics):
+    def _chunk_send(self, metrics, accepted=None):
         """Send the one chunk metrics to zabbix server.
 
         :type metrics: list
         :param metrics: List of :class:`zabbix.sender.ZabbixMetric` to send
             to Zabbix
 
+        :type accepted: set
+        :param accepted: Servers which accepted the chunk before, see
+            :class:`pyzabbix.dispatch.Delivery`.
+
         :rtype: str
         :return: Response from Zabbix Server
         """
-        messages = self._create_messages(metrics)
-        request = self._create_request(messages)
+        request = self._encode_request(metrics)
         packet = self._create_packet(request)
 
-        for host_addr in self.zabbix_uri:
-            logger.debug('Sending data to %s', host_addr)
+        return self._dispatch_packet(packet, accepted)
 
-            try:
-                # IPv4
-                connection_ = socket.socket(socket.AF_INET)
-            except socket.error:
-                # IPv6
-                try:
-                    connection_ = socket.socket(socket.AF_INET6)
-                except socket.error:
-                    raise Exception("Error creating socket for {host_addr}".format(host_addr=host_addr))
-            if self.socket_wrapper:
-                connection = self.socket_wrapper(connection_)
-            else:
-                connection = connection_
+    def _dispatch_packet(self, packet, accepted=None):
+        """Send packet to zabbix servers chosen by `self.dispatcher`.
+
+        :type packet: bytes
+        :param packet: Data packet for zabbix.
 
-            connection.settimeout(self.timeout)
+        :type accepted: set
+        :param accepted: Servers which accepted the packet before, they are
+            skipped in broadcast mode.
 
+        :rtype: dict
+        :return: Response from Zabbix Server
+        """
+        delivery = self.dispatcher.delivery(self.zabbix_uri, accepted)
+        for host_addr in delivery:
+            start = time.time()
             try:
-                # server and port must be tuple
-                connection.connect(host_addr)
-                connection.sendall(packet)
-            except socket.timeout:
-                logger.error('Sending failed: Connection to %s timed out after'
-                             '%d seconds', host_addr, self.timeout)
-                connection.close()
-                raise socket.timeout
+                if self.pool is not None:
+                    response = self._pool_send_packet(host_addr, packet)
+                else:
+                    response = self._send_packet(host_addr, packet)
             except socket.error as err:
-                # In case of error we should close connection, otherwise
-                # we will close it after data will be received.
-                logger.warning('Sending failed: %s', getattr(err, 'msg', str(err)))
-                connection.close()
-                raise err
+                delivery.failure(host_addr, err)
+                continue
+            delivery.success(host_addr, time.time() - start, response)
 
-            response = self._get_response(connection)
-            logger.debug('%s response: %s', host_addr, response)
+        return delivery.result()
 
-            if response and response.get('response') != 'success':
-                logger.debug('Response error: %s}', response)
-                raise socket.error(response)
+    @staticmethod
+    def _rejected(error):
+        """Check that error is a reply of zabbix server which rejected the
+        chunk, rather than a network error."""
 
-        return response
+        return bool(error.args) and isinstance(error.args[0], dict)
 
-    def send(self, metrics):
-        """Send the metrics to zabbix server.
+    def _deliver(self, metrics):
+        """Send the one chunk, retrying on network errors and spooling it
+        if all retries failed.
 
         :type metrics: list
         :param metrics: List of :class:`zabbix.sender.ZabbixMetric` to send
             to Zabbix
 
+        :rtype: dict
+        :return: Response from Zabbix Server or `None` if chunk was
+            spooled.
+        """
+        if self.spool is not None and self.spool.pending:
+            # Chunks wait behind spooled ones to keep the order
+            return self._spool_chunk(metrics)
+
+        sizer = self.chunk_sizer
+        attempt = 0
+        # Retry of broadcast skips servers which have the chunk already
+        accepted = set()
+        while True:
+            start = time.time()
+            try:
+                response = self._chunk_send(metrics, accepted)
+            except socket.error as err:
+                if self._rejected(err):
+                    raise
+                if sizer is not None:
+                    sizer.failure(err)
+                if attempt >= self.retries:
+                    if self.spool is None:
+                        raise
+                    logger.warning('Chunk failed after %d retries, '
+                                   'spooling it: %r', attempt, err)
+                    return self._spool_chunk(metrics, err)
+                error = err
+            else:
+                if sizer is not None:
+                    sizer.success(len(metrics), time.time() - start,
+                                  self._server_time(response))
+                return response
+
+            delay = random.uniform(0, min(self.retry_backoff * 2 ** attempt,
+                                          self.retry_max_backoff))
+            logger.info('Chunk failed, retrying in %.2f seconds: %r', delay,
+                        error)
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _server_time(response):
+        """Get seconds Zabbix spent on a chunk from its response.
+
+        :rtype: float
+        :return: Seconds or `None` if response does not tell.
+        """
+        reply = ZabbixResponse()
+        try:
+            reply.parse(response)
+        except (AttributeError, TypeError):
+            return None
+        return float(reply.time)
+
+    def _spool_chunk(self, metrics, error=None):
+        """Append the one chunk to `self.spool`.
+
+        Chunk is encoded without request `clock`, Zabbix server would shift
+        metrics by time they spent in spool otherwise.
+
+        :type error: :class:`Exception`
+        :param error: Error to raise if spool is full.
+        """
+        packet = self._create_packet(self._encode_request(metrics, False))
+        if not self.spool.append(packet):
+            raise error or socket.error('Spool is full')
+
+        return None
+
+    def replay_spool(self):
+        """Send chunks kept in spool, in order they were spooled.
+
+        Replay stops at the first chunk which could not be delivered, it is
+        sent first next time. Chunks which Zabbix rejected are dropped.
+
+        :rtype: :class:`pyzabbix.sender.ZabbixResponse`
+        :return: Parsed response of replayed chunks
+        """
+        result = ZabbixResponse()
+        if self.spool is None or not self.spool.pending:
+            return result
+
+        def send(packet):
+            try:
+                result.parse(self._dispatch_packet(packet))
+            except socket.error as err:
+                if not self._rejected(err):
+                    raise
+                logger.error('Dropping spooled chunk rejected by Zabbix: %s',
+                             err)
+
+        try:
+            count = self.spool.replay(send)
+        except socket.error as err:
+            logger.warning('Replay of spool stopped: %r', err)
+        else:
+            logger.info('Replayed %d chunks from spool', count)
+
+        return result
+
+    def _diagnose(self, result, metrics, response, budget):
+        """Find metrics of chunk which Zabbix failed to process.
+
+        :type result: :class:`ZabbixResponse`
+        :param result: Response to add rejected metrics to.
+
+        :type metrics: list
+        :param metrics: Chunk of :class:`zabbix.sender.ZabbixMetric`.
+
+        :type response: dict
+        :param response: Response of Zabbix to the chunk.
+
+        :type budget: list
+        :param budget: One-item list with number of extra sends left, it is
+            shared by all chunks of one :meth:`send`.
+        """
+        reply = ZabbixResponse()
+        reply.parse(response)
+
+        suspects = [(metrics, reply.failed)]
+        while suspects:
+            part, failed = suspects.pop()
+            if not failed:
+                continue
+            if failed >= len(part):
+                result.add_rejected(part)
+                continue
+            if budget[0] <= 0:
+                logger.warning('Diagnose mode ran out of sends, %d failed '
+                               'metrics are not found', failed)
+                continue
+
+            budget[0] -= 1
+            half = len(part) // 2
+            reply = ZabbixResponse()
+            reply.parse(self._chunk_send(part[:half]))
+            # Failures are deduced, clamped in case Zabbix changed its mind
+            rest = max(0, min(failed - reply.failed, len(part) - half))
+            suspects.append((part[half:], rest))
+            suspects.append((part[:half], reply.failed))
+
+    def _safe_chunk_send(self, metrics):
+        """Send the one chunk and return its error instead of raising it.
+
+        :rtype: tuple
+        :return: Response from Zabbix Server and error
+        """
+        try:
+            return self._deliver(metrics), None
+        except Exception as err:
+            return None, err
+
+    def _chunks(self, metrics):
+        """Split metrics into chunks of `self.chunk_size`, or of size chosen
+        by `self.chunk_sizer` for every chunk in adaptive mode.
+
+        Lists and :class:`MetricBatch` are sliced. Any other iterable is
+        consumed lazily, one chunk at a time, so generators are never
+        materialized as a whole.
+
+        :type metrics: iterable
+        :param metrics: :class:`zabbix.sender.ZabbixMetric` to split.
+
+        :rtype: generator
+        :return: Chunks of metrics.
+        """
+        sizer = self.chunk_sizer
+        if isinstance(metrics, (list, tuple, MetricBatch)):
+            if sizer is None:
+                for m in range(0, len(metrics), self.chunk_size):
+                    yield metrics[m:m + self.chunk_size]
+                return
+
+            m = 0
+            while m < len(metrics):
+                size = sizer.size
+                yield metrics[m:m + size]
+                m += size
+            return
+
+        metrics = iter(metrics)
+        while True:
+            chunk = list(islice(metrics, sizer.size if sizer is not None
+                                else self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def _collect(self, result, chunk, response, budget):
+        """Parse response to chunk and diagnose it in diagnose mode."""
+        failed = result.failed
+        result.parse(response)
+        if self.diagnose and result.failed > failed:
+            try:
+                self._diagnose(result, chunk, response, budget)
+            except socket.error as err:
+                logger.warning('Diagnose of failed chunk stopped: %r', err)
+
+    def _parallel_send(self, metrics, result):
+        """Send chunks of metrics over `self.workers` connections at once.
+
+        No more than two chunks per worker are built ahead of sending.
+
+        :type metrics: iterable
+        :param metrics: :class:`zabbix.sender.ZabbixMetric` to send to
+            Zabbix
+
+        :type result: :class:`pyzabbix.sender.ZabbixResponse`
+        :param result: Response to add responses of chunks to.
+
         :rtype: :class:`pyzabbix.sender.ZabbixResponse`
         :return: Parsed response from Zabbix Server
         """
+        if self._workers_pool is None:
+            self._workers_pool = ThreadPool(self.workers)
+
+        budget = [self.diagnose_max_sends]
+
+        def collect(index, chunk, reply):
+            response, error = reply.get()
+            if error is not None:
+                logger.warning('Chunk %d failed: %r', index, error)
+                result.add_error(index, error, len(chunk))
+            elif response is None:
+                result.add_spooled(len(chunk))
+            else:
+                self._collect(result, chunk, response, budget)
+
+        pending = deque()
+        for index, chunk in enumerate(self._chunks(metrics)):
+            pending.append((index, chunk, self._workers_pool.apply_async(
+                self._safe_chunk_send, (chunk,))))
+            if len(pending) >= self.workers * 2:
+                collect(*pending.popleft())
+
+        while pending:
+            collect(*pending.popleft())
+
+        if result.errors:
+            raise ZabbixSenderException(result)
+
+        return result
+
+    def send(self, metrics):
+        """Send the metrics to zabbix server.
+
+        Metrics are sent by chunks as they are read, so a generator could be
+        passed to send any number of metrics in constant memory.
+
+        :type metrics: iterable
+        :param metrics: List, generator or any other iterable of
+            :class:`zabbix.sender.ZabbixMetric`, or :class:`MetricBatch` to
+            send to Zabbix
+
+        :rtype: :class:`pyzabbix.sender.ZabbixResponse`
+        :return: Parsed response from Zabbix Server, including chunks
+            replayed from spool
+        """
         result = ZabbixResponse()
-        for m in range(0, len(metrics), self.chunk_size):
-            result.parse(self._chunk_send(metrics[m:m + self.chunk_size]))
+        if self.spool is not None:
+            result.merge(self.replay_spool())
+
+        metrics, merged = coalesce(metrics, self.coalesce)
+        result.add_merged(merged)
+
+        if self.workers > 1:
+            # Workers must share one dispatcher
+            self.dispatcher
+            return self._parallel_send(metrics, result)
+
+        budget = [self.diagnose_max_sends]
+        for chunk in self._chunks(metrics):
+            response = self._deliver(chunk)
+            if response is None:
+                result.add_spooled(len(chunk))
+            else:
+                self._collect(result, chunk, response, budget)
         return result
@@ -0,0 +1,257 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright © 2014 Alexey Dubkov
+#
+# This file is part of py-zabbix.
+#
+# Py-zabbix is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Py-zabbix is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with py-zabbix. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import mmap
+import os
+import socket
+import threading
+
+from .logger import NullHandler
+from . import protocol
+
+null_handler = NullHandler()
+logger = logging.getLogger(__name__)
+logger.addHandler(null_handler)
+
+
+def _replace(src, dst):
+    """Atomically rename `src` to `dst`, overwriting it."""
+
+    try:
+        os.replace(src, dst)
+    except AttributeError:
+        # python2, atomic on POSIX
+        os.rename(src, dst)
+
+
+class ZabbixSpool(object):
+    """The :class:`ZabbixSpool` keeps packets which could not be delivered
+    to Zabbix on disk, to send them later in the same order.
+
+    Packets are appended to the file `path` as they are framed by the zabbix
+    protocol, so the file is read by walking packet headers over `mmap`.
+    Offset of the first packet which is not delivered yet is kept in
+    `path.offset`, so replay goes on after restart of the process. A packet
+    is delivered at least once: if process stops between sending a packet
+    and saving the offset, the packet is sent again.
+
+    Delivered packets are dropped from the file when it is replayed to the
+    end or when it runs out of space. If there is still no space for a new
+    packet, the new packet is dropped.
+
+    :type path: str
+    :param path: Path to spool file.
+
+    :type max_size: int
+    :param max_size: Maximum size of spool file in bytes. Default: 64 MB
+
+    >>> from pyzabbix import ZabbixSender, ZabbixSpool
+    >>> zbx = ZabbixSender(retries=3, spool=ZabbixSpool('/var/spool/zbx'))
+    """
+
+    def __init__(self, path, max_size=64 << 20):
+        self.path = path
+        self.max_size = max_size
+        self.dropped = 0
+
+        self._offset_path = path + '.offset'
+        self._lock = threading.RLock()
+        self._file = open(path, 'ab+')
+        self._offset = self._load_offset()
+        self._recover()
+
+    def __repr__(self):
+        """Represent detailed ZabbixSpool view."""
+
+        return '<{0} path={1!r} pending={2} dropped={3}>'.format(
+            self.__class__.__name__, self.path, self.pending, self.dropped)
+
+    def __len__(self):
+        """Number of packets which are not delivered yet."""
+
+        with self._lock:
+            return sum(1 for _ in self._packets())
+
+    @property
+    def size(self):
+        """Size of spool file in bytes."""
+
+        self._file.seek(0, os.SEEK_END)
+        return self._file.tell()
+
+    @property
+    def pending(self):
+        """Number of bytes which are not delivered yet."""
+
+        with self._lock:
+            return self.size - self._offset
+
+    def _load_offset(self):
+        try:
+            with open(self._offset_path) as f:
+                offset = int(f.read().strip() or 0)
+        except (IOError, OSError, ValueError):
+            offset = 0
+
+        return min(offset, self.size)
+
+    def _save_offset(self):
+        tmp_path = self._offset_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(self._offset))
+        _replace(tmp_path, self._offset_path)
+
+    def _recover(self):
+        """Drop partly written packet from the end of the file, left by
+        process which stopped while appending it."""
+
+        end = self._offset
+        for offset, size in self._packets():
+            end = offset + size
+
+        if end < self.size:
+            logger.warning('Dropping %d bytes of broken packet from %s',
+                           self.size - end, self.path)
+            self._file.truncate(end)
+
+    def _packets(self):
+        """Find pending packets.
+
+        Must be called with `self._lock` held.
+
+        :rtype: generator
+        :return: `(offset, size)` of every pending packet, until the first
+            broken one.
+        """
+
+        size = self.size
+        if size <= self._offset:
+            return
+
+        data = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        try:
+            offset = self._offset
+            while offset < size:
+                header_size = protocol.header_size(
+                    data[offset:offset + 5])
+                if header_size is None:
+                    return
+                try:
+                    header = protocol.unpack_header(
+                        data[offset:offset + header_size], self.max_size)
+                except socket.error:
+                    header = None
+                if header is None:
+                    return
+                packet_size = header_size + header[1]
+                if offset + packet_size > size:
+                    return
+                yield offset, packet_size
+                offset += packet_size
+        finally:
+            data.close()
+
+    def _compact(self):
+        """Drop delivered packets from the beginning of the file.
+
+        Must be called with `self._lock` held.
+        """
+
+        if not self._offset:
+            return
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as tmp:
+            self._file.seek(self._offset)
+            while True:
+                block = self._file.read(1 << 20)
+                if not block:
+                    break
+                tmp.write(block)
+
+        # Crash between these steps leads to duplicates, not to losses
+        self._offset = 0
+        self._save_offset()
+        self._file.close()
+        _replace(tmp_path, self.path)
+        self._file = open(self.path, 'ab+')
+
+    def append(self, packet):
+        """Add packet to the end of spool.
+
+        :type packet: bytes
+        :param packet: Packet framed by zabbix protocol.
+
+        :rtype: bool
+        :return: `False` if there was no space and packet was dropped.
+        """
+
+        with self._lock:
+            if self.size + len(packet) > self.max_size:
+                self._compact()
+            if self.size + len(packet) > self.max_size:
+                self.dropped += 1
+                logger.error('Spool %s is full, dropping packet of %d bytes',
+                             self.path, len(packet))
+                return False
+
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(packet)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+        return True
+
+    def replay(self, send):
+        """Send pending packets in order.
+
+        Replay stops at the first packet `send` fails for, it stays in
+        spool and is sent first next time.
+
+        :type send: function
+        :param send: Function which takes packet and sends it. It has to
+            raise an exception if packet was not delivered.
+
+        :rtype: int
+        :return: Number of delivered packets.
+        """
+
+        delivered = 0
+        with self._lock:
+            for offset, size in list(self._packets()):
+                self._file.seek(offset)
+                send(self._file.read(size))
+                self._offset = offset + size
+                self._save_offset()
+                delivered += 1
+
+            if self._offset and self._offset >= self.size:
+                # Everything is delivered, start from scratch
+                self._file.truncate(0)
+                self._offset = 0
+                self._save_offset()
+
+        return delivered
+
+    def close(self):
+        """Close spool file."""
+
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,354 @@
+"""In-process fake servers used by tests and benchmarks."""
+import json
+import os
+import socket
+import ssl
+import struct
+import threading
+import time
+
+# Python 2 and 3 compatibility
+try:
+    import socketserver
+    from http.server import BaseHTTPRequestHandler
+except ImportError:
+    import SocketServer as socketserver
+    from BaseHTTPServer import BaseHTTPRequestHandler
+
+from pyzabbix import protocol
+
+
+class _ServerThread(object):
+    """Run `serve_forever` of a socketserver in a daemon thread."""
+
+    _thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class _TrapperHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+
+        while True:
+            try:
+                header = protocol.read_header(self.request)
+            except socket.error:
+                return
+            if header is None:
+                return
+
+            flags, body_len, uncompressed_len = header
+            body = protocol.unpack_data(
+                protocol.recv_exactly(self.request, body_len),
+                uncompressed_len)
+            body = json.loads(body.decode())
+            data = body.get('data', [])
+
+            with server.lock:
+                index = server.request_count
+                server.request_count += 1
+                if server.record:
+                    server.requests.append(body)
+                server.values += len(data)
+
+            if server.latency:
+                time.sleep(server.latency)
+
+            fault = server.fault
+            if callable(fault):
+                fault = fault(index, body)
+            if fault and not self.inject(fault):
+                return
+
+            failed = 0
+            if server.reject:
+                failed = sum(1 for item in data if server.reject(item))
+            reply = json.dumps({
+                'response': 'failed' if fault == 'failed' else 'success',
+                'info': server.info.format(processed=len(data) - failed,
+                                           failed=failed, total=len(data),
+                                           seconds='0.000050'),
+            }).encode()
+            # Reply is compressed if request was, like Zabbix does
+            level = None
+            if flags & protocol.FLAG_COMPRESSED:
+                level = 6
+            self.request.sendall(protocol.pack(reply, level))
+
+            if not server.keepalive:
+                return
+
+    def inject(self, fault):
+        """Break the exchange as `fault` says.
+
+        :return: True if reply should still be sent.
+        """
+        if fault == 'failed':
+            return True
+        if fault == 'garbage':
+            self.request.sendall(b'HTTP/1.1 400 Bad Request\r\n\r\n')
+        elif fault == 'bad_json':
+            self.request.sendall(protocol.pack(b'<html>Bad Gateway</html>'))
+        elif fault == 'truncate':
+            reply = b'{"response":"success","info":"processed: 1"}'
+            self.request.sendall(protocol.pack(reply)[:20])
+        elif fault == 'stall':
+            self.server.stopped.wait()
+        elif fault != 'close':
+            raise ValueError('Unknown fault: {0}'.format(fault))
+        return False
+
+
+class FakeTrapper(_ServerThread, socketserver.ThreadingMixIn,
+                  socketserver.TCPServer):
+    """Minimal Zabbix trapper speaking `ZBXD` framing on 127.0.0.1.
+
+    Compressed requests (flag `0x02`) are accepted and replied to with
+    compressed replies. Real Zabbix closes the connection after every
+    reply, which is also the default here. With `keepalive=True` the
+    connection is kept open and further requests are read from it.
+
+    `latency` seconds are slept before every reply to emulate network round
+    trip. Values for which `reject` function returns true are counted as
+    failed, like values of unknown items. `info` is the format of reply
+    `info`, with `processed`, `failed`, `total` and `seconds` fields.
+
+    `fault` breaks replies, it is one of :data:`FAULTS` for every request
+    or a function which takes the request index and body and returns a
+    fault or None:
+
+    - `'close'` - close connection without reply
+    - `'garbage'` - reply with something which is not zabbix protocol
+    - `'bad_json'` - reply with a well framed packet which is not JSON
+    - `'truncate'` - close connection in the middle of reply
+    - `'stall'` - never reply, until the server is stopped
+    - `'failed'` - reply with `"response": "failed"`
+
+    With `record=False` request bodies are not kept in :attr:`requests`,
+    to benchmark without growing memory.
+
+    >>> with FakeTrapper() as trapper:
+    ...     ZabbixSender(*trapper.server_address).send(metrics)
+    """
+
+    FAULTS = ('close', 'garbage', 'bad_json', 'truncate', 'stall',
+              'failed')
+
+    INFO = ('processed: {processed}; failed: {failed}; total: {total}; '
+            'seconds spent: {seconds}')
+
+    allow_reuse_address = True
+    request_queue_size = 128
+    daemon_threads = True
+
+    def __init__(self, keepalive=False, latency=0, reject=None, info=INFO,
+                 fault=None, record=True):
+        socketserver.TCPServer.__init__(self, ('127.0.0.1', 0),
+                                        _TrapperHandler)
+        self.keepalive = keepalive
+        self.latency = latency
+        self.reject = reject
+        self.info = info
+        self.fault = fault
+        self.record = record
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.request_count = 0
+        self.values = 0
+        self.requests = []
+
+    def stop(self):
+        self.stopped.set()
+        _ServerThread.stop(self)
+
+
+def fake_hosts(count):
+    """`host.get` objects of `count` hosts with `output: extend`."""
+
+    return [{'hostid': str(10000 + i), 'host': 'host{0}'.format(i),
+             'name': 'Host {0}'.format(i), 'status': '0',
+             'available': '1', 'proxy_hostid': '0', 'description': '',
+             'maintenance_status': '0', 'flags': '0'}
+            for i in range(count)]
+
+
+def fake_items(count, hosts=1):
+    """`item.get` objects of `count` items spread over `hosts` hosts."""
+
+    return [{'itemid': str(20000 + i), 'hostid': str(10000 + i % hosts),
+             'name': 'Item {0}'.format(i), 'key_': 'key[{0}]'.format(i),
+             'type': '2', 'value_type': '0', 'delay': '0', 'history': '90d',
+             'trends': '365d', 'status': '0', 'state': '0', 'units': '',
+             'lastclock': '1500000000', 'lastvalue': '0.5', 'error': ''}
+            for i in range(count)]
+
+
+def select(objects, params):
+    """Apply `filter`, `<object>ids`, `output` and `limit` of `.get` params
+    to `objects`, like the frontend does."""
+
+    params = params or {}
+    for field, values in (params.get('filter') or {}).items():
+        if values is None:
+            continue
+        if not isinstance(values, list):
+            values = [values]
+        values = set(str(v) for v in values)
+        objects = [o for o in objects if o.get(field) in values]
+
+    for field in ('hostids', 'itemids'):
+        if field in params:
+            ids = params[field]
+            ids = set(str(i) for i in (ids if isinstance(ids, list)
+                                       else [ids]))
+            objects = [o for o in objects if o.get(field[:-1]) in ids]
+
+    if 'limit' in params:
+        objects = objects[:int(params['limit'])]
+
+    output = params.get('output', 'extend')
+    if output != 'extend':
+        objects = [dict((k, o[k]) for k in output if k in o)
+                   for o in objects]
+
+    return objects
+
+
+class _FrontendHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length'))
+        body = json.loads(self.rfile.read(length).decode())
+
+        with server.lock:
+            server.request_count += 1
+            if server.record:
+                server.requests.append(body)
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if isinstance(body, list):
+            reply = [server.reply(call) for call in body]
+        else:
+            reply = server.reply(body)
+        reply = json.dumps(reply).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        if isinstance(body, dict) and body.get('method') in server.broken:
+            # Reset connection in the middle of the reply
+            self.wfile.write(reply[:len(reply) // 2])
+            self.wfile.flush()
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER,
+                                       struct.pack('ii', 1, 0))
+            os.close(self.connection.detach())
+            self.close_connection = True
+            return
+        self.wfile.write(reply)
+
+
+class FakeFrontend(_ServerThread, socketserver.ThreadingMixIn,
+                   socketserver.TCPServer):
+    """Minimal Zabbix frontend serving JSON-RPC on 127.0.0.1 over HTTP/1.1
+    keep-alive connections.
+
+    `results` maps method name to its `result`, or to a function which
+    takes `params` and returns the result. Methods without a result reply
+    with `Method not found` error. With `use_ssl=True` it serves HTTPS with
+    the self-signed certificate from `tests/data/ssl`.
+
+    `user.login`, `host.get` and `item.get` are served out of the box,
+    `host.get` and `item.get` return `hosts` and `items` objects from
+    :func:`fake_hosts` and :func:`fake_items` filtered by :func:`select`.
+    `latency` seconds are slept before every reply. With `record=False`
+    requests are not kept in :attr:`requests`, only counted in
+    :attr:`request_count`. Replies to methods in :attr:`broken` are cut in
+    the middle by connection reset.
+
+    >>> with FakeFrontend() as frontend:
+    ...     ZabbixAPI(frontend.url).host.get()
+    """
+
+    allow_reuse_address = True
+    request_queue_size = 128
+    daemon_threads = True
+
+    def __init__(self, results=None, use_ssl=False, hosts=0, items=0,
+                 latency=0, record=True):
+        socketserver.TCPServer.__init__(self, ('127.0.0.1', 0),
+                                        _FrontendHandler)
+        self.use_ssl = use_ssl
+        if use_ssl:
+            folder = os.path.join(os.path.dirname(__file__), 'data/ssl')
+            ctx = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+            ctx.load_cert_chain(os.path.join(folder, 'nginx.crt'),
+                                os.path.join(folder, 'nginx.key'))
+            self.socket = ctx.wrap_socket(self.socket, server_side=True)
+        self.results = {
+            'apiinfo.version': '3.0.0',
+            'user.login': '0424bd59b807674191e7d77572075f33',
+            'user.logout': True,
+        }
+        host_objects = fake_hosts(hosts)
+        item_objects = fake_items(items, max(hosts, 1))
+        self.results['host.get'] = lambda params: select(host_objects, params)
+        self.results['item.get'] = lambda params: select(item_objects, params)
+        self.results.update(results or {})
+        self.latency = latency
+        self.record = record
+        self.broken = set()
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.request_count = 0
+        self.requests = []
+
+    @property
+    def url(self):
+        scheme = 'https' if self.use_ssl else 'http'
+        return '{0}://{1}:{2}'.format(scheme, *self.server_address)
+
+    def reply(self, call):
+        if call['method'] not in self.results:
+            return {'jsonrpc': '2.0', 'id': call.get('id'),
+                    'error': {'code': -32601, 'message': 'Method not found.',
+                              'data': 'Incorrect method.'}}
+
+        result = self.results[call['method']]
+        if callable(result):
+            result = result(call.get('params'))
+        return {'jsonrpc': '2.0', 'result': result, 'id': call.get('id')}
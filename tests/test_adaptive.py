@@ -0,0 +1,121 @@
+import socket
+
+from unittest import TestCase
+
+from pyzabbix import ZabbixMetric, ZabbixSender
+from pyzabbix.adaptive import AdaptiveChunkSize
+
+from .servers import FakeTrapper
+
+
+class TestAdaptiveChunkSize(TestCase):
+    def sizes(self, sizer):
+        return [size for _, size, _ in sizer.history]
+
+    def reasons(self, sizer):
+        return [reason for _, _, reason in sizer.history]
+
+    def test_init_err(self):
+        with self.assertRaises(ValueError):
+            AdaptiveChunkSize(min_size=0)
+        with self.assertRaises(ValueError):
+            AdaptiveChunkSize(min_size=100, max_size=10)
+
+    def test_grow_when_idle(self):
+        sizer = AdaptiveChunkSize(100, max_size=1000, target=1)
+        sizer.success(100, 0.01)
+        sizer.success(200, 0.3)
+        self.assertEqual(sizer.size, 333)
+        # Within target band size is kept
+        sizer.success(333, 0.7)
+        sizer.success(333, 0.5)
+        self.assertEqual(sizer.size, 333)
+        sizer.success(333, 0.01)
+        sizer.success(666, 0.01)
+        self.assertEqual(sizer.size, 1000)
+        self.assertEqual(self.sizes(sizer), [100, 200, 333, 666, 1000])
+        self.assertEqual(self.reasons(sizer)[1:], ['idle'] * 4)
+
+    def test_shrink_when_slow(self):
+        sizer = AdaptiveChunkSize(1000, target=1)
+        sizer.success(1000, 1.25)
+        self.assertEqual(sizer.size, 800)
+        sizer.success(800, 10)
+        self.assertEqual(sizer.size, 400)
+        self.assertEqual(self.reasons(sizer)[1:], ['slow', 'slow'])
+
+    def test_shrink_when_loaded(self):
+        sizer = AdaptiveChunkSize(1000, target=1)
+        sizer.success(1000, 0.6, 0.01)
+        sizer.success(1000, 0.6, 0.05)
+        self.assertEqual((sizer.size, self.reasons(sizer)[-1]),
+                         (750, 'loaded'))
+        # Coarse server time tells nothing
+        sizer.success(750, 0.6, 0.0005)
+        self.assertEqual(sizer.size, 750)
+
+    def test_failure(self):
+        sizer = AdaptiveChunkSize(100, min_size=30)
+        sizer.failure(socket.timeout())
+        sizer.failure(socket.error('reset'))
+        self.assertEqual(self.sizes(sizer), [100, 50, 30])
+        self.assertEqual(self.reasons(sizer), ['initial', 'timeout',
+                                               'failure'])
+
+    def test_small_last_chunk(self):
+        sizer = AdaptiveChunkSize(100)
+        sizer.success(5, 0.001)
+        self.assertEqual(sizer.size, 100)
+
+    def test_history_size(self):
+        sizer = AdaptiveChunkSize(1024, min_size=1, history_size=5)
+        for _ in range(10):
+            sizer.failure(socket.error())
+        self.assertEqual(self.sizes(sizer), [16, 8, 4, 2, 1])
+
+
+class TestZabbixSenderAdaptive(TestCase):
+    def setUp(self):
+        self.metrics = [ZabbixMetric('host', 'key%d' % i, i)
+                        for i in range(1000)]
+
+    def test_fixed(self):
+        zs = ZabbixSender()
+        self.assertIsNone(zs.chunk_sizer)
+        self.assertEqual(zs.chunk_size_history, [])
+
+    def test_init_err(self):
+        with self.assertRaises(ValueError):
+            ZabbixSender(adaptive_chunk_size=True, min_chunk_size=500,
+                         max_chunk_size=100)
+
+    def test_send_grows(self):
+        with FakeTrapper() as trapper:
+            zs = ZabbixSender(*trapper.server_address, chunk_size=10,
+                              adaptive_chunk_size=True, max_chunk_size=300,
+                              chunk_target_time=5)
+            result = zs.send(self.metrics)
+
+        self.assertEqual(result.processed, 1000)
+        sizes = [len(r['data']) for r in trapper.requests]
+        self.assertEqual(sizes, [10, 20, 40, 80, 160, 300, 300, 90])
+        self.assertEqual([s for _, s, _ in zs.chunk_size_history],
+                         [10, 20, 40, 80, 160, 300])
+
+    def test_send_shrinks_on_failure(self):
+        def fault(index, body):
+            return 'close' if index < 2 else None
+
+        with FakeTrapper(fault=fault) as trapper:
+            zs = ZabbixSender(*trapper.server_address, chunk_size=400,
+                              adaptive_chunk_size=True, retries=2,
+                              retry_backoff=0.01, chunk_target_time=5)
+            result = zs.send(self.metrics)
+
+        self.assertEqual(result.processed, 1000)
+        self.assertEqual([(s, r) for _, s, r in zs.chunk_size_history][:4],
+                         [(400, 'initial'), (200, 'failure'),
+                          (100, 'failure'), (200, 'idle')])
+        # Retried chunk keeps its size, the next one is smaller
+        self.assertEqual(len(trapper.requests[2]['data']), 400)
+        self.assertEqual(len(trapper.requests[3]['data']), 200)
@@ -0,0 +1,197 @@
+import socket
+import sys
+import time
+
+from unittest import TestCase, skipIf
+
+from pyzabbix import (ZabbixAPIException, ZabbixMetric, ZabbixResponse,
+                      ZabbixSenderException)
+
+from .servers import FakeFrontend, FakeTrapper
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from pyzabbix.aio import AsyncZabbixAPI, AsyncZabbixSender
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@skipIf(sys.version_info < (3, 5), "asyncio client requires python 3.5+")
+class TestAsyncZabbixSender(TestCase):
+    def setUp(self):
+        self.metrics = [ZabbixMetric('host', 'key%d' % i, i)
+                        for i in range(10)]
+
+    def test_send(self):
+        with FakeTrapper() as trapper:
+            host, port = trapper.server_address
+            zs = AsyncZabbixSender(host, port, chunk_size=3)
+            result = run(zs.send(self.metrics))
+
+        self.assertIsInstance(result, ZabbixResponse)
+        self.assertEqual(result.chunk, 4)
+        self.assertEqual(result.processed, 10)
+
+    def test_send_compression(self):
+        with FakeTrapper() as trapper:
+            host, port = trapper.server_address
+            zs = AsyncZabbixSender(host, port, chunk_size=3, compression=True)
+            result = run(zs.send(self.metrics))
+
+        self.assertEqual(result.chunk, 4)
+        self.assertEqual(result.processed, 10)
+
+    def test_send_concurrency(self):
+        with FakeTrapper(latency=0.05) as trapper:
+            host, port = trapper.server_address
+            zs = AsyncZabbixSender(host, port, chunk_size=1, concurrency=10)
+            start = time.time()
+            result = run(zs.send(self.metrics))
+            elapsed = time.time() - start
+
+        self.assertEqual(result.chunk, 10)
+        self.assertEqual(trapper.connections, 10)
+        # Serial sending would take 10 * 0.05 seconds
+        self.assertLess(elapsed, 0.4)
+
+    def test_send_generator(self):
+        metrics = (ZabbixMetric('host', 'key%d' % i, i) for i in range(95))
+        with FakeTrapper() as trapper:
+            host, port = trapper.server_address
+            zs = AsyncZabbixSender(host, port, chunk_size=10, concurrency=3)
+            result = run(zs.send(metrics))
+
+        self.assertEqual(result.chunk, 10)
+        self.assertEqual(trapper.values, 95)
+
+    def test_send_timeout(self):
+        with FakeTrapper(latency=0.5) as trapper:
+            host, port = trapper.server_address
+            zs = AsyncZabbixSender(host, port, timeout=0.05)
+            with self.assertRaises(socket.timeout):
+                run(zs.send(self.metrics))
+
+    def test_send_partial_failure(self):
+        with FakeTrapper() as trapper:
+            host, port = trapper.server_address
+            zs = AsyncZabbixSender(host, port, chunk_size=5, concurrency=2)
+            original = zs._chunk_send
+
+            def chunk_send(metrics):
+                if metrics[0].key == 'key5':
+                    raise socket.error('refused')
+                return original(metrics)
+
+            zs._chunk_send = chunk_send
+            with self.assertRaises(ZabbixSenderException) as cm:
+                run(zs.send(self.metrics))
+
+        self.assertEqual(cm.exception.response.processed, 5)
+        self.assertEqual(cm.exception.response.errors[0][0], 1)
+
+
+@skipIf(sys.version_info < (3, 5), "asyncio client requires python 3.5+")
+class TestAsyncZabbixAPI(TestCase):
+    def setUp(self):
+        self.frontend = FakeFrontend({
+            'host.get': [{'hostid': '10084', 'host': 'Zabbix server',
+                          'name': 'Zabbix server'}],
+            'item.get': lambda params: [{'itemid': '23298',
+                                         'name': 'Test Item',
+                                         'hostid': params['hostids'][0]}],
+        }).start()
+
+        # Coroutines are run without async syntax, which is invalid before
+        # Python 3.5 and so could not be even loaded there
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+        self.frontend.stop()
+
+    def session(self, call, **kwargs):
+        """Run coroutine `call(z)` between login and logout."""
+
+        z = AsyncZabbixAPI(self.frontend.url, **kwargs)
+        self.loop.run_until_complete(z.__aenter__())
+        try:
+            return z, self.loop.run_until_complete(call(z))
+        finally:
+            self.loop.run_until_complete(z.__aexit__(None, None, None))
+
+    def test_login_logout(self):
+        def call(z):
+            self.assertEqual(z.auth, '0424bd59b807674191e7d77572075f33')
+            return z.api_version()
+
+        z, version = self.session(call)
+        self.assertEqual(version, '3.0.0')
+        self.assertIsNone(z.auth)
+        methods = [r['method'] for r in self.frontend.requests]
+        self.assertEqual(methods,
+                         ['user.login', 'apiinfo.version', 'user.logout'])
+
+    def test_concurrent_calls_reuse_connections(self):
+        def call(z):
+            return asyncio.gather(
+                *[z.item.get(hostids=[i]) for i in range(50)])
+
+        _, results = self.session(call, pool_size=4)
+        self.assertEqual([r[0]['hostid'] for r in results], list(range(50)))
+        self.assertLessEqual(self.frontend.connections, 4)
+
+    def test_get_id(self):
+        _, hostid = self.session(
+            lambda z: z.get_id('host', 'Zabbix server'))
+        self.assertEqual(hostid, 10084)
+
+    def test_get_ids(self):
+        def call(z):
+            return z.get_ids('host', ['Zabbix server', 'missing'])
+
+        _, ids = self.session(call)
+        self.assertEqual(ids, {'Zabbix server': 10084})
+
+    def test_timeout_not_resent(self):
+        self.frontend.results['host.create'] = {'hostids': ['10085']}
+        z = AsyncZabbixAPI(self.frontend.url, timeout=0.2)
+        self.loop.run_until_complete(z.__aenter__())
+
+        self.frontend.latency = 0.5
+        with self.assertRaises(asyncio.TimeoutError):
+            self.loop.run_until_complete(z.host.create(host='new'))
+        self.frontend.latency = 0
+        self.loop.run_until_complete(z.__aexit__(None, None, None))
+
+        methods = [r['method'] for r in self.frontend.requests]
+        self.assertEqual(methods.count('host.create'), 1)
+
+    def test_reset_reply_not_resent(self):
+        self.frontend.results['host.create'] = {'hostids': ['10085']}
+        self.frontend.broken.add('host.create')
+
+        with self.assertRaises((ConnectionError, asyncio.IncompleteReadError)):
+            self.session(lambda z: z.host.create(host='new'))
+
+        methods = [r['method'] for r in self.frontend.requests]
+        self.assertEqual(methods.count('host.create'), 1)
+
+    def test_sync_only(self):
+        z = AsyncZabbixAPI(self.frontend.url)
+        with self.assertRaises(TypeError):
+            z.iter('host.get')
+        with self.assertRaises(TypeError):
+            z.batch()
+
+    def test_error(self):
+        with self.assertRaises(ZabbixAPIException) as cm:
+            self.session(lambda z: z.host2.get())
+        self.assertEqual(cm.exception.code, -32601)
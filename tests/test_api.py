@@ -1,4 +1,5 @@
 import json
+import socket
 
 import unittest
 from pyzabbix import ZabbixAPI, ZabbixAPIException, ssl_context_compat
@@ -9,6 +10,8 @@ except ImportError:
     from unittest.mock import patch
 from sys import version_info
 
+from .servers import FakeFrontend
+
 # For Python 2 and 3 compatibility
 if version_info[0] == 2:
     urlopen = 'urllib2.urlopen'
@@ -187,5 +190,320 @@ class TestZabbixAPI(unittest.TestCase):
             cm.exception.json.count(HideSensitiveService.HIDEMASK),
             1)
 
+    def test_batch(self):
+        login = {'jsonrpc': '2.0', 'id': '1',
+                 'result': '0424bd59b807674191e7d77572075f33'}
+        # Responses of a batch could come in any order
+        batch_ret = [
+            {'jsonrpc': '2.0', 'id': '3',
+             'error': {'code': -32602, 'message': 'Invalid params.',
+                       'data': 'No permissions.'}},
+            {'jsonrpc': '2.0', 'result': {'hostids': ['10084']}, 'id': '2'},
+            {'jsonrpc': '2.0', 'result': '3.0.0', 'id': '1'},
+        ]
+        self.urlopen_mock.side_effect = [MockResponse(json.dumps(login)),
+                                         MockResponse(json.dumps(batch_ret))]
+
+        zapi = ZabbixAPI()
+        with zapi.batch() as batch:
+            version = batch.apiinfo.version()
+            update = batch.host.update(hostid='10084', status=1)
+            delete = batch.host.delete('10085')
+            with self.assertRaises(ZabbixAPIException):
+                version.result
+
+        self.assertEqual(self.urlopen_mock.call_count, 2)
+        sent = json.loads(self.urlopen_mock.call_args[0][0].data.decode())
+        self.assertEqual([r['id'] for r in sent], ['1', '2', '3'])
+        self.assertNotIn('auth', sent[0])
+        self.assertEqual(sent[1]['auth'], login['result'])
+        self.assertEqual(sent[2]['params'], ['10085'])
+
+        self.assertEqual(version.result, '3.0.0')
+        self.assertEqual(update.result, {'hostids': ['10084']})
+        with self.assertRaises(ZabbixAPIException) as cm:
+            delete.result
+        self.assertEqual(cm.exception.code, -32602)
+
+    def test_batch_size(self):
+        login = {'jsonrpc': '2.0', 'id': '1',
+                 'result': '0424bd59b807674191e7d77572075f33'}
+        self.urlopen_mock.return_value = MockResponse(json.dumps(login))
+        zapi = ZabbixAPI()
+
+        def reply(req, **kwargs):
+            calls = json.loads(req.data.decode())
+            return MockResponse(json.dumps(
+                [{'jsonrpc': '2.0', 'result': c['params'], 'id': c['id']}
+                 for c in calls]))
+
+        self.urlopen_mock.side_effect = reply
+        self.urlopen_mock.reset_mock()
+        batch = zapi.batch(size=2)
+        calls = [batch.host.get(hostids=[i]) for i in range(5)]
+        batch.execute()
+
+        self.assertEqual(self.urlopen_mock.call_count, 3)
+        self.assertEqual([c.result['hostids'][0] for c in calls],
+                         list(range(5)))
+
+    def test_batch_empty(self):
+        login = {'jsonrpc': '2.0', 'id': '1',
+                 'result': '0424bd59b807674191e7d77572075f33'}
+        self.urlopen_mock.return_value = MockResponse(json.dumps(login))
+        zapi = ZabbixAPI()
+        self.urlopen_mock.reset_mock()
+        with zapi.batch() as batch:
+            pass
+        self.assertEqual(batch.execute(), [])
+
+        # Calls executed inside the block are not sent again on exit
+        self.urlopen_mock.return_value = MockResponse(json.dumps(
+            [{'jsonrpc': '2.0', 'result': '3.0.0', 'id': '1'}]))
+        with zapi.batch() as batch:
+            version = batch.apiinfo.version()
+            batch.execute()
+
+        self.assertEqual(self.urlopen_mock.call_count, 1)
+        self.assertEqual(version.result, '3.0.0')
+
     def tearDown(self):
         self.patcher.stop()
+
+
+class TestZabbixAPIKeepAlive(unittest.TestCase):
+
+    def setUp(self):
+        self.frontend = FakeFrontend({
+            'host.get': [{'hostid': '10084', 'host': 'Zabbix server'}],
+        }).start()
+
+    def tearDown(self):
+        self.frontend.stop()
+
+    def test_reuse_connection(self):
+        with ZabbixAPI(self.frontend.url, use_keep_alive=True) as zapi:
+            for _ in range(5):
+                zapi.host.get()
+            self.assertEqual(zapi.api_version(), '3.0.0')
+        self.assertIsNone(zapi._connection)
+
+        # user.login, 5 * host.get, apiinfo.version, user.logout
+        self.assertEqual(len(self.frontend.requests), 8)
+        self.assertEqual(self.frontend.connections, 1)
+
+    def test_reconnect(self):
+        zapi = ZabbixAPI(self.frontend.url, use_keep_alive=True)
+        zapi._connection.sock.shutdown(socket.SHUT_RDWR)
+
+        self.assertEqual(zapi.host.get()[0]['hostid'], '10084')
+        self.assertEqual(self.frontend.connections, 2)
+        zapi.close()
+
+    def test_timeout_not_resent(self):
+        zapi = ZabbixAPI(self.frontend.url, use_keep_alive=True,
+                         timeout=0.2)
+        self.frontend.latency = 0.5
+        self.frontend.results['host.create'] = {'hostids': ['10085']}
+
+        with self.assertRaises(socket.timeout):
+            zapi.host.create(host='new')
+        zapi.close()
+
+        methods = [r['method'] for r in self.frontend.requests]
+        self.assertEqual(methods.count('host.create'), 1)
+        self.assertEqual(self.frontend.connections, 1)
+
+    def test_error(self):
+        zapi = ZabbixAPI(self.frontend.url, use_keep_alive=True)
+        with self.assertRaises(ZabbixAPIException) as cm:
+            zapi.host2.get()
+        self.assertEqual(cm.exception.code, -32601)
+        zapi.close()
+
+
+class TestZabbixAPIIter(unittest.TestCase):
+
+    def setUp(self):
+        # Several values share the same clock to cross page borders
+        self.history = [{'itemid': '1', 'clock': str(1000 + i // 3),
+                         'value': str(i), 'ns': '0'} for i in range(20)]
+        self.history += [{'itemid': '2', 'clock': '1010',
+                          'value': str(i), 'ns': str(i)} for i in range(7)]
+        self.history.sort(key=lambda v: int(v['clock']))
+        self.items = [{'itemid': str(i), 'name': 'item%d' % i}
+                      for i in range(25)]
+        self.trends = [{'itemid': itemid, 'clock': str(3600 * i),
+                        'value_avg': str(i)}
+                       for itemid in ('1', '2') for i in range(7)]
+        self.problems = [{'eventid': str(i), 'name': 'problem%d' % i}
+                         for i in range(5)]
+        self.frontend = FakeFrontend({
+            'history.get': self.history_get,
+            'item.get': self.item_get,
+            'trend.get': self.trend_get,
+            'problem.get': self.problem_get,
+        }).start()
+        self.zapi = ZabbixAPI(self.frontend.url, use_keep_alive=True)
+
+    def tearDown(self):
+        self.zapi.close()
+        self.frontend.stop()
+
+    def history_get(self, params):
+        values = [v for v in self.history
+                  if int(v['clock']) >= int(params.get('time_from', 0))]
+        return values[:params['limit']]
+
+    def item_get(self, params):
+        items = self.items
+        if 'itemids' in params:
+            items = [i for i in items if i['itemid'] in params['itemids']]
+        if params['output'] != 'extend':
+            items = [dict((k, i[k]) for k in params['output'])
+                     for i in items]
+        return items
+
+    def trend_get(self, params):
+        # No sorting, trends come in order of their table key
+        values = [v for v in self.trends
+                  if v['itemid'] in params['itemids'] and
+                  int(v['clock']) >= int(params.get('time_from', 0))]
+        return values[:params['limit']]
+
+    def problem_get(self, params):
+        problems = self.problems
+        if 'eventids' in params:
+            problems = [p for p in problems
+                        if p['eventid'] in params['eventids']]
+        return problems
+
+    def test_iter_history(self):
+        result = list(self.zapi.iter('history.get', {'itemids': ['1', '2']},
+                                     page_size=4))
+        self.assertEqual(result, self.history)
+        for request in self.frontend.requests[1:]:
+            self.assertLessEqual(request['params']['limit'], 8)
+
+    def test_iter_objects(self):
+        result = list(self.zapi.iter('item.get', {'output': 'extend'},
+                                     page_size=10))
+        self.assertEqual(result, self.items)
+
+        requests = self.frontend.requests[1:]
+        self.assertEqual(requests[0]['params']['output'], ['itemid'])
+        self.assertEqual([len(r['params']['itemids']) for r in requests[1:]],
+                         [10, 10, 5])
+
+    def test_iter_trends(self):
+        result = list(self.zapi.iter('trend.get', {'itemids': ['1', '2']},
+                                     page_size=3))
+        self.assertEqual(result, self.trends)
+        for request in self.frontend.requests[1:]:
+            self.assertNotIn('sortfield', request['params'])
+            self.assertEqual(len(request['params']['itemids']), 1)
+
+    def test_iter_id_name(self):
+        result = list(self.zapi.iter('problem.get', page_size=2))
+        self.assertEqual(result, self.problems)
+        self.assertEqual(self.frontend.requests[1]['params']['output'],
+                         ['eventid'])
+
+    def test_iter_unsupported(self):
+        with self.assertRaises(ValueError):
+            self.zapi.iter('settings.get')
+        with self.assertRaises(ValueError):
+            self.zapi.iter('host.create', {'host': 'new'})
+        with self.assertRaises(ValueError):
+            self.zapi.iter('item.get', {'countOutput': True})
+
+    def test_iter_missing_id(self):
+        self.frontend.results['proxygroup.get'] = [{'proxy_groupid': '1'}]
+        self.frontend.results['widget.get'] = [{'name': 'widget'}]
+
+        self.assertEqual(list(self.zapi.iter('proxygroup.get')),
+                         [{'proxy_groupid': '1'}])
+        with self.assertRaises(ValueError) as cm:
+            list(self.zapi.iter('widget.get'))
+        self.assertIn('widget.get', str(cm.exception))
+        self.assertIn('widgetid', str(cm.exception))
+
+
+class TestZabbixAPIGetIds(unittest.TestCase):
+
+    def setUp(self):
+        self.hosts = [{'hostid': str(10000 + i), 'name': 'host%d' % i,
+                       'host': 'host%d' % i, 'status': '0'}
+                      for i in range(10)]
+        self.frontend = FakeFrontend({
+            'host.get': self.host_get,
+            'host.update': {'hostids': ['10001']},
+            'host.delete': {'hostids': ['10001']},
+            'item.get': lambda params: [{'itemid': '23298', 'name': 'cpu'}],
+        }).start()
+        self.zapi = ZabbixAPI(self.frontend.url, use_keep_alive=True)
+
+    def tearDown(self):
+        self.zapi.close()
+        self.frontend.stop()
+
+    def host_get(self, params):
+        names = params['filter']['name']
+        return [dict((k, h[k]) for k in params['output'])
+                for h in self.hosts if h['name'] in names]
+
+    def test_get_ids(self):
+        result = self.zapi.get_ids('host', ['host1', 'host2', 'missing'])
+        self.assertEqual(result, {'host1': 10001, 'host2': 10002})
+
+        request = self.frontend.requests[-1]['params']
+        self.assertEqual(request['output'], ['hostid', 'name'])
+        self.assertEqual(request['filter']['name'],
+                         ['host1', 'host2', 'missing'])
+
+    def test_get_ids_memoized(self):
+        self.zapi.get_ids('host', ['host1', 'host2'])
+        result = self.zapi.get_ids('host', ['host2', 'host3'])
+        self.assertEqual(result, {'host2': 10002, 'host3': 10003})
+        self.assertEqual(self.frontend.requests[-1]['params']['filter'],
+                         {'name': ['host3']})
+
+        count = len(self.frontend.requests)
+        self.zapi.get_ids('host', ['host1', 'host3'])
+        self.assertEqual(len(self.frontend.requests), count)
+
+    def test_get_ids_invalidated(self):
+        self.zapi.get_ids('host', ['host1'])
+        self.zapi.host.update(hostid='10001', name='renamed')
+        self.zapi.get_ids('host', ['host1'])
+        self.assertEqual(self.frontend.requests[-1]['method'], 'host.get')
+
+    def test_get_ids_invalidated_by_host_delete(self):
+        self.zapi.get_ids('item', ['cpu'], hostid=10001)
+        self.zapi.host.delete('10001')
+        self.zapi.get_ids('item', ['cpu'], hostid=10001)
+        self.assertEqual(self.frontend.requests[-1]['method'], 'item.get')
+
+
+class TestZabbixAPICanned(unittest.TestCase):
+
+    def setUp(self):
+        self.frontend = FakeFrontend(hosts=5, items=20).start()
+        self.zapi = ZabbixAPI(self.frontend.url, use_keep_alive=True)
+
+    def tearDown(self):
+        self.zapi.close()
+        self.frontend.stop()
+
+    def test_get_id(self):
+        self.assertEqual(self.zapi.get_id('host', 'Host 3'), 10003)
+        self.assertEqual(self.zapi.get_id('host'),
+                         [10000, 10001, 10002, 10003, 10004])
+        self.assertIsNone(self.zapi.get_id('host', 'missing'))
+
+    def test_item_get(self):
+        items = self.zapi.item.get(hostids='10001', output=['itemid', 'key_'],
+                                   limit=3)
+        self.assertEqual(items, [{'itemid': '20001', 'key_': 'key[1]'},
+                                 {'itemid': '20006', 'key_': 'key[6]'},
+                                 {'itemid': '20011', 'key_': 'key[11]'}])
@@ -0,0 +1,145 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+from unittest import TestCase
+
+from pyzabbix import BufferedZabbixSender, ZabbixMetric, ZabbixSender
+
+from .servers import FakeTrapper
+from .test_dispatch import closed_port
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestBufferedZabbixSender(TestCase):
+    def setUp(self):
+        self.trapper = FakeTrapper().start()
+        self.metrics = [ZabbixMetric('host', 'key%d' % i, i)
+                        for i in range(10)]
+
+    def tearDown(self):
+        self.trapper.stop()
+
+    def sender(self, chunk_size=5, **kwargs):
+        zs = ZabbixSender(*self.trapper.server_address,
+                          chunk_size=chunk_size)
+        return BufferedZabbixSender(zs, **kwargs)
+
+    def test_flush_by_size(self):
+        with self.sender(chunk_size=5, max_latency=60) as zbx:
+            zbx.put_many(self.metrics[:7])
+            self.assertTrue(wait_for(lambda: zbx.sent == 5))
+            self.assertEqual(self.trapper.values, 5)
+        self.assertEqual(zbx.sent, 7)
+
+    def test_flush_by_latency(self):
+        with self.sender(chunk_size=100, max_latency=0.05) as zbx:
+            for m in self.metrics[:3]:
+                self.assertTrue(zbx.put(m))
+            self.assertTrue(wait_for(lambda: zbx.sent == 3, timeout=1))
+
+    def test_flush(self):
+        with self.sender(chunk_size=100, max_latency=60) as zbx:
+            zbx.put_many(self.metrics)
+            self.assertTrue(zbx.flush(timeout=5))
+            self.assertEqual(self.trapper.values, 10)
+
+    def test_close(self):
+        zbx = self.sender(chunk_size=100, max_latency=60)
+        zbx.put_many(self.metrics)
+        zbx.close()
+
+        self.assertEqual((zbx.queued, zbx.sent), (10, 10))
+        self.assertEqual(self.trapper.values, 10)
+        with self.assertRaises(ValueError):
+            zbx.put(self.metrics[0])
+
+    def test_many_threads(self):
+        with self.sender(chunk_size=7, max_latency=0.05) as zbx:
+            threads = [threading.Thread(target=zbx.put_many,
+                                        args=(self.metrics,))
+                       for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual((zbx.queued, zbx.sent), (80, 80))
+        self.assertEqual(self.trapper.values, 80)
+
+    def test_drop_new(self):
+        with self.sender(chunk_size=100, max_latency=60, maxsize=4,
+                         overflow='drop_new') as zbx:
+            self.assertEqual(zbx.put_many(self.metrics), 4)
+            self.assertEqual([m.key for m in zbx._queue],
+                             ['key0', 'key1', 'key2', 'key3'])
+        self.assertEqual((zbx.sent, zbx.dropped), (4, 6))
+
+    def test_drop_old(self):
+        with self.sender(chunk_size=100, max_latency=60, maxsize=4,
+                         overflow='drop_old') as zbx:
+            self.assertEqual(zbx.put_many(self.metrics), 10)
+            self.assertEqual([m.key for m in zbx._queue],
+                             ['key6', 'key7', 'key8', 'key9'])
+        self.assertEqual((zbx.sent, zbx.dropped), (4, 6))
+
+    def test_block_timeout(self):
+        with self.sender(chunk_size=100, max_latency=60, maxsize=1,
+                         block_timeout=0.05) as zbx:
+            start = time.time()
+            self.assertEqual(zbx.put_many(self.metrics[:2]), 1)
+            self.assertGreaterEqual(time.time() - start, 0.05)
+        self.assertEqual(zbx.dropped, 1)
+
+    def test_failed(self):
+        # Nothing listens on the port after the socket is closed
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        addr = sock.getsockname()
+        sock.close()
+
+        zbx = BufferedZabbixSender(ZabbixSender(*addr, chunk_size=5))
+        zbx.put_many(self.metrics)
+        zbx.close()
+        self.assertEqual((zbx.sent, zbx.failed), (0, 10))
+        self.assertIsInstance(zbx.last_error, socket.error)
+
+    def test_failed_chunk_sizes(self):
+        def fault(index, body):
+            keys = [d['key'] for d in body['data']]
+            return 'close' if 'key9' in keys else None
+
+        # 13 metrics coalesce into 10 values, only the last one is lost
+        metrics = [ZabbixMetric('host', 'key0', i) for i in range(3)]
+        metrics += self.metrics
+        self.trapper.fault = fault
+        zs = ZabbixSender(*self.trapper.server_address, chunk_size=3,
+                          workers=5, coalesce='last')
+        zbx = BufferedZabbixSender(zs, max_latency=60)
+        zbx.put_many(metrics)
+        zbx.close()
+
+        self.assertEqual((zbx.sent, zbx.failed), (12, 1))
+
+    def test_spooled(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        zs = ZabbixSender(*closed_port(), chunk_size=5,
+                          spool=os.path.join(folder, 'spool'))
+        zbx = BufferedZabbixSender(zs, max_latency=60)
+        zbx.put_many(self.metrics)
+        zbx.close()
+
+        self.assertEqual((zbx.sent, zbx.failed, zbx.spooled), (0, 0, 10))
+
+    def test_overflow_err(self):
+        with self.assertRaises(ValueError):
+            BufferedZabbixSender(overflow='ignore')
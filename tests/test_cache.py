@@ -0,0 +1,125 @@
+from unittest import TestCase
+# Python 2 and 3 compatibility
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from pyzabbix import ZabbixAPI, ZabbixAPICache
+
+from .servers import FakeFrontend
+
+
+class TestZabbixAPICache(TestCase):
+    def test_key_canonical(self):
+        key1 = ZabbixAPICache.key('host.get', {'a': 1, 'b': [1, 2]})
+        key2 = ZabbixAPICache.key('host.get', {'b': [1, 2], 'a': 1})
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, ZabbixAPICache.key('item.get', {'a': 1}))
+
+    def test_key_auth(self):
+        key = ZabbixAPICache.key('host.get', {}, 'token1')
+        self.assertNotIn('token1', key)
+        self.assertEqual(key, ZabbixAPICache.key('host.get', {}, 'token1'))
+        self.assertNotEqual(key, ZabbixAPICache.key('host.get', {}, 'token2'))
+        self.assertNotEqual(key, ZabbixAPICache.key('host.get', {}))
+
+    def test_cacheable(self):
+        self.assertTrue(ZabbixAPICache.cacheable('host.get'))
+        self.assertTrue(ZabbixAPICache.cacheable('apiinfo.version'))
+        self.assertFalse(ZabbixAPICache.cacheable('host.update'))
+        self.assertFalse(ZabbixAPICache.cacheable('user.login'))
+
+    @patch('pyzabbix.cache.time.time')
+    def test_ttl(self, mock_time):
+        mock_time.return_value = 100
+        cache = ZabbixAPICache(ttl=10, ttls={'apiinfo.version': 100})
+        cache.set('k1', 'host.get', b'1')
+        cache.set('k2', 'apiinfo.version', b'2')
+
+        mock_time.return_value = 111
+        self.assertIsNone(cache.get('k1'))
+        self.assertEqual(cache.get('k2'), b'2')
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru(self):
+        cache = ZabbixAPICache(maxsize=2)
+        cache.set('k1', 'host.get', b'1')
+        cache.set('k2', 'host.get', b'2')
+        cache.get('k1')
+        cache.set('k3', 'host.get', b'3')
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('k2'))
+        self.assertEqual(cache.get('k1'), b'1')
+
+    def test_invalidate(self):
+        cache = ZabbixAPICache()
+        cache.set('k1', 'host.get', b'1')
+        cache.set('k2', 'hostgroup.get', b'2')
+        cache.set('k3', 'mediatype.get', b'3')
+
+        cache.invalidate('host.get')
+        self.assertEqual(len(cache), 3)
+
+        cache.invalidate('host.update')
+        self.assertIsNone(cache.get('k1'))
+        self.assertIsNone(cache.get('k2'))
+        self.assertEqual(cache.get('k3'), b'3')
+
+
+class TestZabbixAPIWithCache(TestCase):
+    def setUp(self):
+        self.frontend = FakeFrontend({
+            'host.get': [{'hostid': '10084'}],
+            'host.create': {'hostids': ['10085']},
+        }).start()
+        self.cache = ZabbixAPICache()
+        self.zapi = ZabbixAPI(self.frontend.url, use_keep_alive=True,
+                              cache=self.cache)
+
+    def tearDown(self):
+        self.zapi.close()
+        self.frontend.stop()
+
+    def count(self, method):
+        return len([r for r in self.frontend.requests
+                    if r['method'] == method])
+
+    def test_cached(self):
+        for _ in range(3):
+            hosts = self.zapi.host.get(output=['hostid'])
+            self.assertEqual(hosts, [{'hostid': '10084'}])
+            # Callers get their own copy
+            hosts.append(None)
+            self.zapi.api_version()
+
+        self.assertEqual(self.count('host.get'), 1)
+        self.assertEqual(self.count('apiinfo.version'), 1)
+        self.assertEqual(self.cache.hits, 4)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_not_shared_between_users(self):
+        other = ZabbixAPI(self.frontend.url, use_keep_alive=True,
+                          cache=self.cache)
+        other.auth = 'another user'
+        try:
+            self.zapi.host.get(output=['hostid'])
+            other.host.get(output=['hostid'])
+            self.zapi.host.get(output=['hostid'])
+        finally:
+            other.close()
+        self.assertEqual(self.count('host.get'), 2)
+
+    def test_invalidated_by_write(self):
+        self.zapi.host.get(output=['hostid'])
+        self.zapi.host.create(host='new')
+        self.zapi.host.get(output=['hostid'])
+        self.assertEqual(self.count('host.get'), 2)
+
+    def test_errors_not_cached(self):
+        self.frontend.results.pop('host.get')
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                self.zapi.host.get()
+        self.assertEqual(self.count('host.get'), 2)
@@ -0,0 +1,169 @@
+import socket
+import time
+
+from unittest import TestCase
+
+from pyzabbix import ZabbixMetric, ZabbixSender
+from pyzabbix.dispatch import (Broadcast, Failover, LeastLatency,
+                               RoundRobin)
+
+from .servers import FakeTrapper
+
+
+def closed_port():
+    """Address on which nothing listens."""
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    address = sock.getsockname()
+    sock.close()
+    return address
+
+
+class TestDispatcher(TestCase):
+    def setUp(self):
+        self.addresses = [('a', 1), ('b', 2), ('c', 3)]
+
+    def test_broadcast(self):
+        dispatcher = Broadcast()
+        dispatcher.failure(('a', 1), socket.error())
+        self.assertEqual(dispatcher.targets(self.addresses), self.addresses)
+        self.assertEqual(dispatcher.stats[('a', 1)].failed, 1)
+        self.assertTrue(dispatcher.stats[('a', 1)].healthy)
+
+    def test_failover_backoff(self):
+        dispatcher = Failover(backoff=0.05, max_backoff=0.08)
+        dispatcher.failure(('a', 1), socket.error())
+        self.assertEqual(dispatcher.targets(self.addresses),
+                         [('b', 2), ('c', 3), ('a', 1)])
+        self.assertFalse(dispatcher.stats[('a', 1)].healthy)
+
+        time.sleep(0.06)
+        self.assertEqual(dispatcher.targets(self.addresses), self.addresses)
+
+        # Second failure doubles backoff up to max_backoff
+        dispatcher.failure(('a', 1), socket.error())
+        stats = dispatcher.stats[('a', 1)]
+        self.assertAlmostEqual(stats.down_until - time.time(), 0.08,
+                               delta=0.02)
+
+        dispatcher.success(('a', 1), 0.01)
+        self.assertTrue(stats.healthy)
+        self.assertEqual(stats.consecutive_failures, 0)
+        self.assertEqual(dispatcher.targets(self.addresses), self.addresses)
+
+    def test_all_down(self):
+        dispatcher = Failover()
+        dispatcher.failure(('b', 2), socket.error())
+        dispatcher.failure(('a', 1), socket.error())
+        dispatcher.failure(('c', 3), socket.error())
+        self.assertEqual(dispatcher.targets(self.addresses),
+                         [('b', 2), ('a', 1), ('c', 3)])
+
+    def test_round_robin(self):
+        dispatcher = RoundRobin()
+        first = [dispatcher.targets(self.addresses)[0] for _ in range(6)]
+        self.assertEqual(first, self.addresses * 2)
+
+    def test_least_latency(self):
+        dispatcher = LeastLatency()
+        dispatcher.success(('a', 1), 0.3)
+        dispatcher.success(('b', 2), 0.1)
+        # Endpoint without latency is probed first
+        self.assertEqual(dispatcher.targets(self.addresses)[0], ('c', 3))
+
+        dispatcher.success(('c', 3), 0.2)
+        self.assertEqual(dispatcher.targets(self.addresses),
+                         [('b', 2), ('c', 3), ('a', 1)])
+
+    def test_delivery(self):
+        ok = {'response': 'success'}
+        delivery = Failover(backoff=0.05).delivery(self.addresses)
+        tried = []
+        for address in delivery:
+            tried.append(address)
+            if address == ('a', 1):
+                delivery.failure(address, socket.error())
+            else:
+                delivery.success(address, 0.01, ok)
+        self.assertEqual(tried, [('a', 1), ('b', 2)])
+        self.assertEqual(delivery.result(), ok)
+
+        delivery = Failover().delivery(self.addresses)
+        for address in delivery:
+            delivery.success(address, 0.01, False)
+        with self.assertRaises(socket.error):
+            delivery.result()
+
+        delivery = Broadcast().delivery(self.addresses)
+        with self.assertRaises(socket.error):
+            delivery.success(('a', 1), 0.01, {'response': 'failed'})
+
+
+class TestZabbixSenderDispatch(TestCase):
+    def setUp(self):
+        self.metrics = [ZabbixMetric('host', 'key%d' % i, i)
+                        for i in range(10)]
+
+    def test_init_err(self):
+        with self.assertRaises(ValueError):
+            ZabbixSender(dispatch='random')
+
+    def test_broadcast(self):
+        with FakeTrapper() as first, FakeTrapper() as second:
+            zs = ZabbixSender(chunk_size=5)
+            zs.zabbix_uri = [first.server_address, second.server_address]
+            zs.send(self.metrics)
+
+        self.assertEqual((first.values, second.values), (10, 10))
+
+    def test_broadcast_failure(self):
+        with FakeTrapper() as trapper:
+            zs = ZabbixSender(chunk_size=5)
+            zs.zabbix_uri = [closed_port(), trapper.server_address]
+            with self.assertRaises(socket.error):
+                zs.send(self.metrics)
+
+        self.assertEqual(trapper.values, 0)
+
+    def test_broadcast_retry(self):
+        def fault(index, body):
+            return 'close' if index == 0 else None
+
+        with FakeTrapper() as first, FakeTrapper(fault=fault) as second:
+            zs = ZabbixSender(chunk_size=5, retries=1, retry_backoff=0.01)
+            zs.zabbix_uri = [first.server_address, second.server_address]
+            zs.send(self.metrics)
+
+        # Retry of the first chunk goes only to the server which failed
+        self.assertEqual((first.values, second.values), (10, 15))
+
+    def test_failover(self):
+        dead = closed_port()
+        with FakeTrapper() as trapper:
+            zs = ZabbixSender(chunk_size=5, dispatch='failover')
+            zs.zabbix_uri = [dead, trapper.server_address]
+            result = zs.send(self.metrics)
+
+        self.assertEqual(result.processed, 10)
+        self.assertEqual(trapper.values, 10)
+        # Dead endpoint is tried once, then backed off
+        self.assertEqual(zs.stats[dead].failed, 1)
+        self.assertEqual(zs.stats[trapper.server_address].sent, 2)
+        self.assertIsNotNone(zs.stats[trapper.server_address].latency)
+
+    def test_failover_all_failed(self):
+        zs = ZabbixSender(dispatch='failover')
+        zs.zabbix_uri = [closed_port(), closed_port()]
+        with self.assertRaises(socket.error):
+            zs.send(self.metrics)
+
+    def test_round_robin(self):
+        with FakeTrapper() as first, FakeTrapper() as second:
+            zs = ZabbixSender(chunk_size=2, dispatch='round_robin')
+            zs.zabbix_uri = [first.server_address, second.server_address]
+            result = zs.send(self.metrics)
+
+        self.assertEqual(result.processed, 10)
+        self.assertEqual(first.values + second.values, 10)
+        self.assertEqual((len(first.requests), len(second.requests)), (3, 2))
@@ -0,0 +1,120 @@
+import socket
+
+from unittest import TestCase
+# Python 2 and 3 compatibility
+try:
+    from mock import MagicMock, patch
+except ImportError:
+    from unittest.mock import MagicMock, patch
+
+from pyzabbix import ZabbixMetric, ZabbixSender
+from pyzabbix.pool import ZabbixConnectionPool
+
+from .servers import FakeTrapper
+
+
+class TestZabbixConnectionPool(TestCase):
+    def setUp(self):
+        self.connect = MagicMock(side_effect=lambda addr: MagicMock())
+        self.addr = ('127.0.0.1', 10051)
+
+    @patch('pyzabbix.pool.ZabbixConnectionPool._is_alive',
+           return_value=True)
+    def test_reuse(self, mock_alive):
+        pool = ZabbixConnectionPool(self.connect)
+        conn, reused = pool.acquire(self.addr)
+        self.assertFalse(reused)
+        pool.release(self.addr, conn)
+
+        conn2, reused = pool.acquire(self.addr)
+        self.assertTrue(reused)
+        self.assertIs(conn2, conn)
+        self.assertEqual(self.connect.call_count, 1)
+
+    @patch('pyzabbix.pool.ZabbixConnectionPool._is_alive',
+           return_value=False)
+    def test_health_check(self, mock_alive):
+        pool = ZabbixConnectionPool(self.connect)
+        conn, _ = pool.acquire(self.addr)
+        pool.release(self.addr, conn)
+
+        conn2, reused = pool.acquire(self.addr)
+        self.assertFalse(reused)
+        self.assertIsNot(conn2, conn)
+        conn.close.assert_called_once_with()
+
+    @patch('pyzabbix.pool.ZabbixConnectionPool._is_alive',
+           return_value=True)
+    @patch('pyzabbix.pool.time.time')
+    def test_idle_eviction(self, mock_time, mock_alive):
+        mock_time.return_value = 100
+        pool = ZabbixConnectionPool(self.connect, idle_timeout=10)
+        conn, _ = pool.acquire(self.addr)
+        pool.release(self.addr, conn)
+
+        mock_time.return_value = 111
+        conn2, reused = pool.acquire(self.addr)
+        self.assertFalse(reused)
+        conn.close.assert_called_once_with()
+
+    def test_connect_error_frees_slot(self):
+        self.connect.side_effect = socket.error
+        pool = ZabbixConnectionPool(self.connect, maxsize=1)
+        for _ in range(2):
+            with self.assertRaises(socket.error):
+                pool.acquire(self.addr)
+
+
+class TestZabbixSenderPool(TestCase):
+    def setUp(self):
+        self.metrics = [ZabbixMetric('host', 'key%d' % i, i)
+                        for i in range(10)]
+
+    def test_keepalive(self):
+        with FakeTrapper(keepalive=True) as trapper:
+            host, port = trapper.server_address
+            with ZabbixSender(host, port, chunk_size=2,
+                              use_pool=True) as zs:
+                result = zs.send(self.metrics)
+
+        self.assertEqual(result.chunk, 5)
+        self.assertEqual(result.processed, 10)
+        self.assertEqual(trapper.connections, 1)
+
+    def test_server_closes_connection(self):
+        with FakeTrapper(keepalive=False) as trapper:
+            host, port = trapper.server_address
+            with ZabbixSender(host, port, chunk_size=2,
+                              use_pool=True) as zs:
+                result = zs.send(self.metrics)
+
+        self.assertEqual(result.chunk, 5)
+        self.assertEqual(result.processed, 10)
+        self.assertEqual(trapper.values, 10)
+        self.assertEqual(trapper.connections, 5)
+
+    def test_bad_reply_frees_slot(self):
+        with FakeTrapper(keepalive=True, fault='bad_json') as trapper:
+            host, port = trapper.server_address
+            with ZabbixSender(host, port, use_pool=True,
+                              pool_size=2) as zs:
+                for _ in range(3):
+                    with self.assertRaises(ValueError):
+                        zs.send(self.metrics)
+
+        self.assertEqual(trapper.request_count, 3)
+
+    def test_timeout_not_resent(self):
+        def fault(index, body):
+            return 'stall' if index == 1 else None
+
+        with FakeTrapper(keepalive=True, fault=fault) as trapper:
+            host, port = trapper.server_address
+            with ZabbixSender(host, port, chunk_size=5, timeout=0.2,
+                              use_pool=True) as zs:
+                with self.assertRaises(socket.timeout):
+                    zs.send(self.metrics)
+
+            # Values of the timed out chunk could be stored already
+            self.assertEqual(trapper.request_count, 2)
+            self.assertEqual(trapper.connections, 1)
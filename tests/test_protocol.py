@@ -0,0 +1,114 @@
+import socket
+import struct
+import threading
+import time
+import zlib
+
+from unittest import TestCase
+
+from pyzabbix import protocol
+
+
+class TestProtocol(TestCase):
+    def test_pack(self):
+        packet = protocol.pack(b'{"request":"sender data"}')
+        self.assertEqual(packet[:13],
+                         b'ZBXD\x01\x19\x00\x00\x00\x00\x00\x00\x00')
+        self.assertEqual(packet[13:], b'{"request":"sender data"}')
+
+    def test_pack_compressed(self):
+        data = b'{"host":"host","key":"key","value":"1"},' * 100
+        packet = protocol.pack(data, 6)
+        flags, data_len, uncompressed_len = protocol.unpack_header(
+            packet[:13])
+        self.assertEqual(flags, protocol.FLAG_PROTOCOL |
+                         protocol.FLAG_COMPRESSED)
+        self.assertEqual(data_len, len(packet) - 13)
+        self.assertEqual(uncompressed_len, len(data))
+        self.assertEqual(protocol.unpack_data(packet[13:], uncompressed_len),
+                         data)
+
+    def test_pack_max_size(self):
+        with self.assertRaises(ValueError):
+            protocol.pack(b'x' * 11, max_size=10)
+
+    def test_header_size(self):
+        self.assertEqual(protocol.header_size(b'ZBXD\x01'), 13)
+        self.assertEqual(protocol.header_size(b'ZBXD\x03'), 13)
+        self.assertEqual(protocol.header_size(b'ZBXD\x05'), 21)
+        self.assertIsNone(protocol.header_size(b'ZBXD\x02'))
+        self.assertIsNone(protocol.header_size(b'ZBXD\x09'))
+        self.assertIsNone(protocol.header_size(b'IDDQD'))
+
+    def test_unpack_header(self):
+        self.assertEqual(protocol.unpack_header(
+            b'ZBXD\x01' + struct.pack('<II', 16, 0)), (1, 16, None))
+        self.assertEqual(protocol.unpack_header(
+            b'ZBXD\x03' + struct.pack('<II', 16, 20)), (3, 16, 20))
+        self.assertIsNone(protocol.unpack_header(b'ZBXD\x01\x10'))
+
+    def test_unpack_header_large(self):
+        header = b'ZBXD\x07' + struct.pack('<QQ', 1 << 32, 1 << 33)
+        self.assertEqual(protocol.unpack_header(header, max_size=1 << 34),
+                         (7, 1 << 32, 1 << 33))
+        with self.assertRaises(socket.error):
+            protocol.unpack_header(header)
+
+    def test_unpack_data_wrong_length(self):
+        with self.assertRaises(socket.error):
+            protocol.unpack_data(zlib.compress(b'data'), 5)
+
+
+class TestProtocolSocket(TestCase):
+    def setUp(self):
+        self.client, self.server = socket.socketpair()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+
+    def test_read_packet_slow(self):
+        data = b'x' * 200000
+        packet = protocol.pack(data)
+
+        def write():
+            for i in range(0, len(packet), 50000):
+                self.server.sendall(packet[i:i + 50000])
+                time.sleep(0.01)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        result = protocol.read_packet(self.client)
+        writer.join()
+
+        self.assertEqual(result, data)
+
+    def test_read_packet_compressed(self):
+        data = b'{"response":"success"}'
+        self.server.sendall(protocol.pack(data, 1))
+        result = protocol.read_packet(self.client)
+        self.assertEqual(result, data)
+        self.assertIs(type(result), bytes)
+
+    def test_recv_exactly(self):
+        self.server.sendall(b'abcdef')
+        self.server.close()
+        result = protocol.recv_exactly(self.client, 4)
+        self.assertEqual((result, type(result)), (b'abcd', bytes))
+        self.assertEqual(protocol.recv_exactly(self.client, 4), b'ef')
+
+    def test_read_packet_truncated(self):
+        self.server.sendall(protocol.pack(b'x' * 100)[:50])
+        self.server.close()
+        with self.assertRaises(socket.error):
+            protocol.read_packet(self.client)
+
+    def test_read_packet_invalid(self):
+        self.server.sendall(b'IDDQD')
+        self.server.close()
+        self.assertIsNone(protocol.read_packet(self.client))
+
+    def test_read_packet_max_size(self):
+        self.server.sendall(protocol.pack(b'x' * 100))
+        with self.assertRaises(socket.error):
+            protocol.read_packet(self.client, max_size=50)
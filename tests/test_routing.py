@@ -0,0 +1,162 @@
+from unittest import TestCase
+
+from pyzabbix import (MetricBatch, RoutingZabbixSender, ZabbixAPI,
+                      ZabbixMetric, ZabbixSenderException)
+from pyzabbix.routing import routes_from_api
+
+from .servers import FakeFrontend, FakeTrapper
+from .test_dispatch import closed_port
+
+
+class TestRoutingZabbixSender(TestCase):
+    def setUp(self):
+        self.metrics = [ZabbixMetric('host%d' % (i % 4), 'key%d' % i, i)
+                        for i in range(20)]
+
+    def hosts(self, trapper):
+        return sorted(set(d['host'] for r in trapper.requests
+                          for d in r['data']))
+
+    def test_route(self):
+        zs = RoutingZabbixSender({'a': 'proxy1', 'b': 'proxy2:10055',
+                                  'c': ('proxy3', 10057)}, default='server')
+        self.assertEqual(zs.route('a'), ('proxy1', 10051))
+        self.assertEqual(zs.route('b'), ('proxy2', 10055))
+        self.assertEqual(zs.route('c'), ('proxy3', 10057))
+        self.assertEqual(zs.route('d'), ('server', 10051))
+
+    def test_send(self):
+        with FakeTrapper() as first, FakeTrapper() as second, \
+                FakeTrapper() as server:
+            routes = {'host0': first.server_address,
+                      'host1': first.server_address,
+                      'host2': second.server_address}
+            with RoutingZabbixSender(routes, server.server_address,
+                                     chunk_size=3) as zs:
+                result = zs.send(self.metrics)
+
+        self.assertEqual((result.processed, result.total), (20, 20))
+        self.assertEqual(result.chunk, 4 + 2 + 2)
+        self.assertEqual(self.hosts(first), ['host0', 'host1'])
+        self.assertEqual(self.hosts(second), ['host2'])
+        self.assertEqual(self.hosts(server), ['host3'])
+        # Order of metrics of one host is kept
+        keys = [d['key'] for r in second.requests for d in r['data']]
+        self.assertEqual(keys, [m.key for m in self.metrics
+                                if m.host == 'host2'])
+
+    def test_send_function(self):
+        with FakeTrapper() as trapper:
+            zs = RoutingZabbixSender(lambda host: trapper.server_address)
+            result = zs.send(self.metrics)
+
+        self.assertEqual(result.processed, 20)
+
+    def test_send_batch(self):
+        batch = MetricBatch('host0', ['key0', 'key1'], [1, 2])
+        with FakeTrapper() as trapper:
+            zs = RoutingZabbixSender({'host0': trapper.server_address})
+            result = zs.send(batch)
+
+        self.assertEqual(result.processed, 2)
+
+    def test_send_batch_unicode_host(self):
+        batch = MetricBatch(u'host0', ['key0', 'key1'], [1, 2])
+        with FakeTrapper() as trapper:
+            zs = RoutingZabbixSender({'host0': trapper.server_address})
+            result = zs.send(batch)
+
+        self.assertEqual(result.processed, 2)
+        self.assertEqual(self.hosts(trapper), ['host0'])
+
+    def test_no_route(self):
+        with FakeTrapper() as trapper:
+            zs = RoutingZabbixSender({'host0': trapper.server_address})
+            with self.assertRaises(ValueError) as cm:
+                zs.send(self.metrics)
+
+        self.assertIn('host1, host2, host3', str(cm.exception))
+        # Nothing is sent if some hosts have no route
+        self.assertEqual(trapper.values, 0)
+
+    def test_endpoint_failure(self):
+        dead = closed_port()
+        with FakeTrapper() as trapper:
+            zs = RoutingZabbixSender(
+                {'host0': dead}, trapper.server_address)
+            with self.assertRaises(ZabbixSenderException) as cm:
+                zs.send(self.metrics)
+
+        result = cm.exception.response
+        self.assertEqual(result.processed, 15)
+        self.assertEqual([e for e, _ in result.errors], [dead])
+
+
+class TestRoutesFromApi(TestCase):
+    def test_routes_from_api(self):
+        proxies = [
+            {'proxyid': '1', 'host': 'passive', 'status': '6',
+             'interface': {'useip': '1', 'ip': '10.0.0.1', 'dns': '',
+                           'port': '10055'}},
+            {'proxyid': '2', 'host': 'active.example.com', 'status': '5',
+             'interface': []},
+            {'proxyid': '3', 'host': 'nat', 'status': '5', 'interface': []},
+        ]
+        hosts = [{'host': 'a', 'proxy_hostid': '1'},
+                 {'host': 'b', 'proxy_hostid': '2'},
+                 {'host': 'c', 'proxy_hostid': '3'},
+                 {'host': 'd', 'proxy_hostid': '0'}]
+
+        with FakeFrontend({'proxy.get': proxies,
+                           'host.get': hosts}) as frontend:
+            zapi = ZabbixAPI(frontend.url)
+            routes = routes_from_api(zapi, {'nat': '192.0.2.1:20051'})
+
+        self.assertEqual(routes, {'a': ('10.0.0.1', 10055),
+                                  'b': ('active.example.com', 10051),
+                                  'c': ('192.0.2.1', 20051)})
+
+    def test_routes_from_api_7(self):
+        proxies = [
+            {'proxyid': '1', 'name': 'passive', 'operating_mode': '1',
+             'address': '10.0.0.1', 'port': '10055'},
+            {'proxyid': '2', 'name': 'active', 'operating_mode': '0',
+             'address': '127.0.0.1', 'port': '10051'},
+        ]
+        hosts = [{'host': 'a', 'monitored_by': '1', 'proxyid': '1',
+                  'assigned_proxyid': '0'},
+                 {'host': 'b', 'monitored_by': '2', 'proxyid': '0',
+                  'assigned_proxyid': '2'},
+                 {'host': 'c', 'monitored_by': '0', 'proxyid': '0',
+                  'assigned_proxyid': '0'}]
+
+        with FakeFrontend({'apiinfo.version': '7.0.0', 'proxy.get': proxies,
+                           'host.get': hosts}) as frontend:
+            zapi = ZabbixAPI(frontend.url)
+            routes = routes_from_api(zapi)
+
+        self.assertEqual(routes, {'a': ('10.0.0.1', 10055),
+                                  'b': ('active', 10051)})
+
+    def test_refresh(self):
+        with FakeTrapper() as trapper:
+            address = '{0}:{1}'.format(*trapper.server_address)
+            proxies = [{'proxyid': '1', 'host': 'proxy', 'status': '5',
+                        'interface': []}]
+            hosts = [{'host': 'host0', 'proxy_hostid': '1'}]
+            with FakeFrontend({'proxy.get': proxies,
+                               'host.get': hosts}) as frontend:
+                zapi = ZabbixAPI(frontend.url)
+                zs = RoutingZabbixSender({'host0': closed_port()})
+                zs.send([])
+                zs.refresh(zapi, {'proxy': address})
+
+            result = zs.send(self.metrics())
+
+        self.assertEqual(zs.routes, {'host0': trapper.server_address})
+        self.assertEqual(result.processed, 2)
+        self.assertEqual(list(zs.senders), [trapper.server_address])
+
+    def metrics(self):
+        return [ZabbixMetric('host0', 'key', 1),
+                ZabbixMetric('host0', 'key', 2)]
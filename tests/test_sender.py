@@ -1,8 +1,11 @@
 import json
 import os
+import pickle
 import socket
 
 import struct
+import time
+import zlib
 
 from unittest import TestCase, skip
 # Python 2 and 3 compatibility
@@ -13,7 +16,29 @@ except ImportError:
     from unittest.mock import patch, call, mock_open
     autospec = True
 
-from pyzabbix import ZabbixMetric, ZabbixSender, ZabbixResponse
+from pyzabbix import (MetricBatch, ZabbixMetric, ZabbixSender, ZabbixResponse,
+                      ZabbixSenderException)
+from pyzabbix.sender import coalesce
+
+from .servers import FakeTrapper
+
+
+def recv_into(*chunks):
+    """Side effect of mocked `socket.recv_into` which returns `chunks`."""
+
+    chunks = list(chunks)
+
+    def side_effect(buf, nbytes=0):
+        if not chunks:
+            return 0
+        chunk = chunks.pop(0)
+        count = min(len(chunk), nbytes or len(buf))
+        buf[:count] = chunk[:count]
+        if count < len(chunk):
+            chunks.insert(0, chunk[count:])
+        return count
+
+    return side_effect
 
 
 class TestZabbixResponse(TestCase):
@@ -34,6 +59,20 @@ class TestZabbixResponse(TestCase):
                              'chunk':     zr._chunk})
         self.assertEqual(zr.__repr__(), result)
 
+    def test_merge(self):
+        zr = ZabbixResponse()
+        zr.parse({'info': 'processed: 2; failed: 1; total: 3; '
+                          'seconds spent: 0.000050'})
+        zr.add_merged(4)
+        zr.add_error(0, socket.error())
+
+        result = ZabbixResponse()
+        result.merge(zr)
+        result.merge(zr, errors=False)
+        self.assertEqual((result.processed, result.failed, result.total,
+                          result.chunk, result.merged), (4, 2, 6, 2, 8))
+        self.assertEqual(len(result.errors), 1)
+
 
 class TestZabbixMetric(TestCase):
     def test_init(self):
@@ -46,11 +85,40 @@ class TestZabbixMetric(TestCase):
         with self.assertRaises(ValueError):
             ZabbixMetric('host1', 'key1', 100500, '1457358608.01')
 
+    def test_init_ns(self):
+        zm = ZabbixMetric('host1', 'key1', 100500, 1457358608, 525000000)
+        self.assertEqual((zm.clock, zm.ns), (1457358608, 525000000))
+
+        zm = ZabbixMetric('host1', 'key1', 100500, 1457358608.25)
+        self.assertEqual((zm.clock, zm.ns), (1457358608, 250000000))
+
+        zm = ZabbixMetric('host1', 'key1', 100500, ns=525000000)
+        self.assertIsNone(zm.ns)
+        self.assertNotIn('ns', vars(zm))
+
+        with self.assertRaises(ValueError):
+            ZabbixMetric('host1', 'key1', 100500, 1457358608, 10 ** 9)
+
     def test_repr(self):
         zm = ZabbixMetric('host1', 'key1', 100500)
         zm_repr = json.loads(zm.__repr__())
         self.assertEqual(zm_repr, zm.__dict__)
 
+    def test_slots(self):
+        zm = ZabbixMetric('host1', 'key1', 100500, 1457358608)
+        with self.assertRaises(AttributeError):
+            zm.extra = 1
+        self.assertEqual(vars(zm), {'host': 'host1', 'key': 'key1',
+                                    'value': '100500', 'clock': 1457358608})
+        self.assertNotIn('clock', vars(ZabbixMetric('host1', 'key1', 1)))
+
+    def test_pickle(self):
+        for zm in (ZabbixMetric('host1', 'key1', 100500),
+                   ZabbixMetric('host1', 'key1', 100500, 1457358608.5)):
+            for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+                copy = pickle.loads(pickle.dumps(zm, proto))
+                self.assertEqual(vars(copy), vars(zm))
+
 
 class TestsZabbixSender(TestCase):
     def setUp(self):
@@ -110,6 +178,43 @@ failed: 10; total: 10; seconds spent: 0.000078"}
         self.assertIsInstance(result, list)
         self.assertEqual(len(result), 2)
 
+    def test_encode_request(self):
+        m = [ZabbixMetric('host1', 'key1', 1, 1457445366),
+             ZabbixMetric('host "2"', 'key2[\\]', 'line1\n\tline2')]
+        zs = ZabbixSender()
+        result = zs._encode_request(m)
+        self.assertIsInstance(result, bytes)
+
+        expected = json.loads(zs._create_request(zs._create_messages(m))
+                              .decode('utf-8'))
+        self.assertEqual(json.loads(result.decode('utf-8')), expected)
+
+    def test_encode_request_ns(self):
+        m = [ZabbixMetric('host1', 'key1', 1, 1457445366, 5),
+             ZabbixMetric('host1', 'key1', 2, 1457445366.5)]
+        zs = ZabbixSender()
+        result = json.loads(zs._encode_request(m).decode('utf-8'))
+        self.assertEqual([(d['clock'], d['ns']) for d in result['data']],
+                         [(1457445366, 5), (1457445366, 500000000)])
+
+    def test_encode_request_clock(self):
+        zs = ZabbixSender(request_clock=True)
+        for metrics in ([], [ZabbixMetric('host1', 'key1', 1)],
+                        MetricBatch('host1', ['key1'], [1])):
+            before = time.time()
+            result = json.loads(zs._encode_request(metrics).decode('utf-8'))
+            self.assertEqual(len(result['data']), len(metrics))
+            clock = result['clock'] + result['ns'] / 1e9
+            self.assertTrue(before - 1 < clock < time.time() + 1)
+
+        result = json.loads(zs._create_request(['{}']).decode('utf-8'))
+        self.assertIn('ns', result)
+
+    def test_encode_request_empty(self):
+        zs = ZabbixSender()
+        result = json.loads(zs._encode_request([]).decode('utf-8'))
+        self.assertEqual(result, {'request': 'sender data', 'data': []})
+
     def test_create_request(self):
         message = [
             '{"clock": "1457445366", "host": "host1",\
@@ -162,16 +267,39 @@ failed: 10; total: 10; seconds spent: 0.000078"}
 
     @patch('pyzabbix.sender.socket.socket', autospec=autospec)
     def test_get_response(self, mock_socket):
-        mock_socket.recv.side_effect = (self.resp_header, self.resp_body)
+        mock_socket.recv_into.side_effect = recv_into(
+            self.resp_header, self.resp_body)
 
         zs = ZabbixSender()
         result = zs._get_response(mock_socket)
-        mock_socket.recv.assert_has_calls([call(92)])
+        self.assertEqual(mock_socket.recv_into.call_count, 2)
         self.assertEqual(result['response'], 'success')
 
+    @patch('pyzabbix.sender.socket.socket', autospec=autospec)
+    def test_get_response_in_pieces(self, mock_socket):
+        body = self.resp_body
+        mock_socket.recv_into.side_effect = recv_into(
+            self.resp_header[:7], self.resp_header[7:], body[:10],
+            body[10:50], body[50:])
+
+        zs = ZabbixSender()
+        result = zs._get_response(mock_socket)
+        self.assertEqual(mock_socket.recv_into.call_count, 5)
+        self.assertEqual(result['response'], 'success')
+
+    @patch('pyzabbix.sender.socket.socket', autospec=autospec)
+    def test_get_response_truncated(self, mock_socket):
+        mock_socket.recv_into.side_effect = recv_into(
+            self.resp_header, self.resp_body[:50])
+
+        zs = ZabbixSender()
+        with self.assertRaises(socket.error):
+            zs._get_response(mock_socket)
+
     @patch('pyzabbix.sender.socket.socket', autospec=autospec)
     def test_get_response_fail(self, mock_socket):
-        mock_socket.recv.side_effect = (b'IDDQD', self.resp_body)
+        mock_socket.recv_into.side_effect = recv_into(b'IDDQD',
+                                                      self.resp_body)
 
         zs = ZabbixSender()
         result = zs._get_response(mock_socket)
@@ -179,7 +307,8 @@ failed: 10; total: 10; seconds spent: 0.000078"}
 
     @patch('pyzabbix.sender.socket.socket', autospec=autospec)
     def test_get_response_fail_s_close(self, mock_socket):
-        mock_socket.recv.side_effect = (b'IDDQD', self.resp_body)
+        mock_socket.recv_into.side_effect = recv_into(b'IDDQD',
+                                                      self.resp_body)
         mock_socket.close.side_effect = socket.error
 
         zs = ZabbixSender()
@@ -190,7 +319,8 @@ failed: 10; total: 10; seconds spent: 0.000078"}
     def test_send(self, mock_socket):
         mock_data = b'\x01\\\x00\x00\x00\x00\x00\x00\x00'
         mock_socket.return_value = mock_socket
-        mock_socket.recv.side_effect = (b'ZBXD', mock_data, self.resp_body)
+        mock_socket.recv_into.side_effect = recv_into(b'ZBXD', mock_data,
+                                                      self.resp_body)
 
         zm = ZabbixMetric('host1', 'key1', 100500, 1457358608)
         zs = ZabbixSender()
@@ -214,7 +344,7 @@ failed: 10; total: 10; seconds spent: 0.000078"}
     def test_send_failed(self, mock_socket):
         mock_data = b'\x01\\\x00\x00\x00\x00\x00\x00\x00'
         mock_socket.return_value = mock_socket
-        mock_socket.recv.side_effect = (b'ZBXD', mock_data, b'''
+        mock_socket.recv_into.side_effect = recv_into(b'ZBXD', mock_data, b'''
 {"response": "suces","info":"processed: 0; failed: \
 10; total: 10; seconds spent: 0.000078"}
 ''')
@@ -223,3 +353,403 @@ failed: 10; total: 10; seconds spent: 0.000078"}
         zs = ZabbixSender()
         with self.assertRaises(socket.error):
             zs.send([zm])
+
+    def test_max_packet_size(self):
+        zm = ZabbixMetric('host1', 'key1', 100500, 1457358608)
+        zs = ZabbixSender(max_packet_size=50)
+        with self.assertRaises(ValueError):
+            zs.send([zm])
+
+    @patch('pyzabbix.sender.socket.socket', autospec=autospec)
+    def test_max_packet_size_response(self, mock_socket):
+        mock_socket.recv_into.side_effect = recv_into(
+            self.resp_header, self.resp_body)
+
+        zs = ZabbixSender(max_packet_size=50)
+        with self.assertRaises(socket.error):
+            zs._get_response(mock_socket)
+
+    def test_send_large_chunk(self):
+        metrics = [ZabbixMetric('host', 'key%d' % i, 'x' * 100)
+                   for i in range(20000)]
+        with FakeTrapper() as trapper:
+            host, port = trapper.server_address
+            zs = ZabbixSender(host, port, chunk_size=20000)
+            result = zs.send(metrics)
+
+        self.assertEqual(result.chunk, 1)
+        self.assertEqual(result.processed, 20000)
+
+
+class TestsZabbixSenderCompression(TestCase):
+    def setUp(self):
+        self.metrics = [ZabbixMetric('host', 'key%d' % i, i)
+                        for i in range(10)]
+
+    def test_create_packet(self):
+        zs = ZabbixSender(compression=True, compression_level=9)
+        request = zs._encode_request(self.metrics)
+        packet = zs._create_packet(request)
+        self.assertEqual(packet[:5], b'ZBXD\x03')
+        data_len, request_len = struct.unpack('<II', packet[5:13])
+        self.assertEqual(data_len, len(packet) - 13)
+        self.assertEqual(request_len, len(request))
+        self.assertLess(data_len, len(request))
+        self.assertEqual(zlib.decompress(packet[13:]), request)
+
+    @patch('pyzabbix.sender.socket.socket', autospec=autospec)
+    def test_get_response(self, mock_socket):
+        body = b'{"response":"success","info":"processed: 1; failed: 0; ' \
+               b'total: 1; seconds spent: 0.000050"}'
+        data = zlib.compress(body)
+        mock_socket.recv_into.side_effect = recv_into(
+            b'ZBXD\x03' + struct.pack('<II', len(data), len(body)), data)
+
+        zs = ZabbixSender()
+        result = zs._get_response(mock_socket)
+        self.assertEqual(result['response'], 'success')
+
+    @patch('pyzabbix.sender.socket.socket', autospec=autospec)
+    def test_get_response_wrong_length(self, mock_socket):
+        data = zlib.compress(b'{"response":"success"}')
+        mock_socket.recv_into.side_effect = recv_into(
+            b'ZBXD\x03' + struct.pack('<II', len(data), 100), data)
+
+        zs = ZabbixSender()
+        with self.assertRaises(socket.error):
+            zs._get_response(mock_socket)
+
+    def test_send(self):
+        with FakeTrapper() as trapper:
+            host, port = trapper.server_address
+            zs = ZabbixSender(host, port, chunk_size=4, compression=True)
+            result = zs.send(self.metrics)
+
+        self.assertEqual(result.chunk, 3)
+        self.assertEqual(result.processed, 10)
+        keys = [d['key'] for r in trapper.requests for d in r['data']]
+        self.assertEqual(keys, [m.key for m in self.metrics])
+
+
+class TestsZabbixSenderWorkers(TestCase):
+    def setUp(self):
+        self.metrics = [ZabbixMetric('host', 'key%d' % i, i)
+                        for i in range(10)]
+
+    def test_send(self):
+        with FakeTrapper() as trapper:
+            host, port = trapper.server_address
+            with ZabbixSender(host, port, chunk_size=3, workers=4) as zs:
+                result = zs.send(self.metrics)
+
+        self.assertEqual(result.chunk, 4)
+        self.assertEqual(result.processed, 10)
+        self.assertEqual(result.errors, [])
+        keys = sorted(d['key'] for r in trapper.requests for d in r['data'])
+        self.assertEqual(keys, sorted(m.key for m in self.metrics))
+
+    def test_send_partial_failure(self):
+        zs = ZabbixSender(chunk_size=3, workers=2)
+        original = zs._chunk_send
+
+        def chunk_send(metrics, accepted=None):
+            if metrics[0].key == 'key3':
+                raise socket.timeout
+            return original(metrics, accepted)
+
+        with FakeTrapper() as trapper:
+            zs.zabbix_uri = [trapper.server_address]
+            with patch.object(zs, '_chunk_send', side_effect=chunk_send):
+                with self.assertRaises(socket.error) as cm:
+                    zs.send(self.metrics)
+        zs.close()
+
+        self.assertIsInstance(cm.exception, ZabbixSenderException)
+        result = cm.exception.response
+        self.assertEqual(result.chunk, 3)
+        self.assertEqual(result.processed, 7)
+        self.assertEqual(result.unsent, 3)
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(result.errors[0][0], 1)
+        self.assertIsInstance(result.errors[0][1], socket.timeout)
+
+
+class TestMetricBatch(TestCase):
+    def test_init_err(self):
+        with self.assertRaises(ValueError):
+            MetricBatch('host', ['key1', 'key2'], [1])
+        with self.assertRaises(ValueError):
+            MetricBatch(['host'], ['key1', 'key2'], [1, 2])
+        with self.assertRaises(ValueError):
+            MetricBatch('host', ['key1', 'key2'], [1, 2], clock=[1])
+
+    def test_slice_is_view(self):
+        batch = MetricBatch('host', ['key%d' % i for i in range(10)],
+                            list(range(10)))
+        view = batch[2:8][1:3]
+        self.assertEqual(len(view), 2)
+        self.assertIs(view.keys, batch.keys)
+        self.assertEqual([m.key for m in view], ['key3', 'key4'])
+        self.assertEqual(len(batch[20:]), 0)
+
+    def test_unicode_host(self):
+        batch = MetricBatch(u'hostx', ['a', 'b', 'c', 'd', 'e'],
+                            [1, 2, 3, 4, 5])
+        self.assertEqual(batch.hosts, u'hostx')
+        self.assertEqual(set(m.host for m in batch), set(['hostx']))
+        data = json.loads((b'[' + batch.encode() + b']').decode('utf-8'))
+        self.assertEqual(set(d['host'] for d in data), set(['hostx']))
+
+    def test_pickle(self):
+        batch = MetricBatch('host', ['key1', 'key2', 'key3'], [1, 2, 3],
+                            clock=1457358608.5)[1:]
+        for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+            copy = pickle.loads(pickle.dumps(batch, proto))
+            self.assertEqual(copy.encode(), batch.encode())
+
+    def test_getitem(self):
+        batch = MetricBatch(['host1', 'host2'], ['key1', 'key2'], [1, 2],
+                            clock=[1457358608, 1457358609])
+        zm = batch[-1]
+        self.assertIsInstance(zm, ZabbixMetric)
+        self.assertEqual(vars(zm), {'host': 'host2', 'key': 'key2',
+                                    'value': '2', 'clock': 1457358609})
+        with self.assertRaises(IndexError):
+            batch[2]
+
+    def test_init_ns(self):
+        batch = MetricBatch('host', ['key1', 'key2'], [1, 2],
+                            clock=[1457358608.5, 1457358609])
+        self.assertEqual(batch.ns, [500000000, 0])
+        self.assertEqual(batch[1].ns, 0)
+
+        batch = MetricBatch('host', ['key1', 'key2'], [1, 2],
+                            clock=1457358608, ns=[1, 2])
+        self.assertEqual(batch[1:].ns, [1, 2])
+        self.assertEqual(batch[1:][0].ns, 2)
+
+        with self.assertRaises(ValueError):
+            MetricBatch('host', ['key1', 'key2'], [1, 2],
+                        clock=[1457358608, 1457358609], ns=[1])
+
+    def test_encode_request(self):
+        zs = ZabbixSender()
+        for clock, ns in ((None, None), (1457358608, None),
+                          ([1457358608, 1457358609], None),
+                          (1457358608.5, None), (1457358608, 7),
+                          ([1457358608, 1457358609], [7, 8]),
+                          (1457358608, [7, 8]),
+                          ([1457358608.25, 1457358609], None)):
+            for host in ('host "1"', ['host1', 'host%s']):
+                batch = MetricBatch(host, ['key1', 'key2[\\]'], [1.5, 'a\n'],
+                                    clock=clock, ns=ns)
+                self.assertEqual(
+                    json.loads(zs._encode_request(batch).decode('utf-8')),
+                    json.loads(zs._encode_request(list(batch))
+                               .decode('utf-8')))
+
+    def test_send(self):
+        batch = MetricBatch('host', ['key%d' % i for i in range(10)],
+                            list(range(10)), clock=1457358608)
+        with FakeTrapper() as trapper:
+            result = ZabbixSender(*trapper.server_address,
+                                  chunk_size=4).send(batch)
+
+        self.assertEqual(result.chunk, 3)
+        self.assertEqual(result.processed, 10)
+        data = [d for r in trapper.requests for d in r['data']]
+        self.assertEqual(data[9], {'host': 'host', 'key': 'key9',
+                                   'value': '9', 'clock': 1457358608})
+
+
+class TestsZabbixSenderStreaming(TestCase):
+    def generate(self, trapper, count, max_ahead):
+        for i in range(count):
+            # Metrics are pulled only shortly before they are sent
+            self.assertLessEqual(i - trapper.values, max_ahead)
+            yield ZabbixMetric('host', 'key%d' % i, i)
+
+    def test_send_generator(self):
+        with FakeTrapper() as trapper:
+            zs = ZabbixSender(*trapper.server_address, chunk_size=10)
+            result = zs.send(self.generate(trapper, 95, 10))
+
+        self.assertEqual(result.chunk, 10)
+        self.assertEqual(result.processed, 95)
+
+    def test_send_generator_workers(self):
+        with FakeTrapper() as trapper:
+            with ZabbixSender(*trapper.server_address, chunk_size=10,
+                              workers=2) as zs:
+                result = zs.send(self.generate(trapper, 200, 50))
+
+        self.assertEqual(result.chunk, 20)
+        self.assertEqual(result.processed, 200)
+
+
+class TestsZabbixSenderDiagnose(TestCase):
+    def setUp(self):
+        self.metrics = [ZabbixMetric('host', 'key%d' % i, i)
+                        for i in range(16)]
+        self.bad = {'key3', 'key4', 'key11'}
+
+    def reject(self, item):
+        return item['key'] in self.bad
+
+    def test_diagnose(self):
+        with FakeTrapper(reject=self.reject) as trapper:
+            zs = ZabbixSender(*trapper.server_address, chunk_size=8,
+                              diagnose=True)
+            result = zs.send(self.metrics)
+
+        self.assertEqual((result.processed, result.failed), (13, 3))
+        self.assertEqual(sorted(result.rejected),
+                         [('host', 'key11'), ('host', 'key3'),
+                          ('host', 'key4')])
+        # Counters are not affected by extra sends
+        self.assertEqual(result.chunk, 2)
+
+    def test_diagnose_budget(self):
+        with FakeTrapper(reject=self.reject) as trapper:
+            zs = ZabbixSender(*trapper.server_address, chunk_size=16,
+                              diagnose=True, diagnose_max_sends=1)
+            result = zs.send(self.metrics)
+
+        self.assertEqual(len(trapper.requests), 2)
+        self.assertEqual(result.failed, 3)
+        self.assertEqual(result.rejected, [])
+
+    def test_diagnose_workers(self):
+        batch = MetricBatch('host', ['key%d' % i for i in range(16)],
+                            list(range(16)))
+        with FakeTrapper(reject=self.reject) as trapper:
+            with ZabbixSender(*trapper.server_address, chunk_size=4,
+                              workers=2, diagnose=True) as zs:
+                result = zs.send(batch)
+
+        self.assertEqual(sorted(result.rejected),
+                         [('host', 'key11'), ('host', 'key3'),
+                          ('host', 'key4')])
+
+    def test_no_diagnose(self):
+        with FakeTrapper(reject=self.reject) as trapper:
+            zs = ZabbixSender(*trapper.server_address, chunk_size=8)
+            result = zs.send(self.metrics)
+
+        self.assertEqual(len(trapper.requests), 2)
+        self.assertEqual(result.failed, 3)
+        self.assertEqual(result.rejected, [])
+
+
+class TestsZabbixSenderFaults(TestCase):
+    def setUp(self):
+        self.metrics = [ZabbixMetric('host', 'key%d' % i, i)
+                        for i in range(10)]
+
+    def test_faults(self):
+        for fault in ('close', 'garbage', 'truncate', 'stall', 'failed'):
+            with FakeTrapper(fault=fault) as trapper:
+                zs = ZabbixSender(*trapper.server_address, timeout=0.2)
+                with self.assertRaises(socket.error):
+                    zs.send(self.metrics)
+
+    def test_retry_fault(self):
+        def fault(index, body):
+            return 'close' if index == 0 else None
+
+        with FakeTrapper(fault=fault) as trapper:
+            zs = ZabbixSender(*trapper.server_address, chunk_size=5,
+                              retries=1, retry_backoff=0.01)
+            result = zs.send(self.metrics)
+
+        self.assertEqual((result.chunk, result.processed), (2, 10))
+        self.assertEqual(len(trapper.requests), 3)
+
+    def test_failover_fault(self):
+        with FakeTrapper(fault='garbage') as bad, FakeTrapper() as good:
+            zs = ZabbixSender(dispatch='failover')
+            zs.zabbix_uri = [bad.server_address, good.server_address]
+            result = zs.send(self.metrics)
+
+        self.assertEqual(result.processed, 10)
+        self.assertEqual(zs.stats[bad.server_address].failed, 1)
+
+    def test_info(self):
+        info = 'Processed {processed} Failed {failed} Total {total} ' \
+               'Seconds spent {seconds}'
+        with FakeTrapper(info=info) as trapper:
+            zs = ZabbixSender(*trapper.server_address)
+            result = zs.send(self.metrics)
+
+        self.assertEqual((result.processed, result.total), (10, 10))
+
+
+class TestCoalesce(TestCase):
+    def setUp(self):
+        self.metrics = [ZabbixMetric('host', 'a', 1, 1457358608),
+                        ZabbixMetric('host', 'b', 'x', 1457358608),
+                        ZabbixMetric('host', 'a', 4, 1457358609),
+                        ZabbixMetric('other', 'a', 5, 1457358608),
+                        ZabbixMetric('host', 'a', 2.5, 1457358610),
+                        ZabbixMetric('host', 'b', 'y', 1457358609)]
+
+    def values(self, metrics):
+        return [(m.host, m.key, m.value) for m in metrics]
+
+    def test_last(self):
+        result, merged = coalesce(self.metrics, 'last')
+        self.assertEqual(merged, 3)
+        self.assertEqual(self.values(result), [('host', 'a', '2.5'),
+                                               ('host', 'b', 'y'),
+                                               ('other', 'a', '5')])
+        self.assertEqual(result[0].clock, 1457358610)
+
+    def test_aggregate(self):
+        expected = {'min': '1', 'max': '4', 'sum': '7.5', 'avg': '2.5'}
+        for policy, value in expected.items():
+            result, merged = coalesce(self.metrics, policy)
+            self.assertEqual(merged, 3)
+            self.assertEqual(result[0].value, value)
+            self.assertEqual(result[0].clock, 1457358610)
+            # Non-numeric values are not aggregated
+            self.assertEqual(result[1].value, 'y')
+
+    def test_avg_int(self):
+        metrics = [ZabbixMetric('host', 'a', v) for v in (1, 2, 3)]
+        self.assertEqual(coalesce(metrics, 'avg')[0][0].value, '2')
+
+    def test_keep_all(self):
+        self.assertEqual(coalesce(self.metrics, 'keep_all'),
+                         (self.metrics, 0))
+
+    def test_no_duplicates(self):
+        batch = MetricBatch('host', ['a', 'b'], [1, 2])
+        self.assertEqual(coalesce(batch, 'sum'), (batch, 0))
+
+    def test_generator(self):
+        result, merged = coalesce((m for m in self.metrics), 'last')
+        self.assertEqual((len(result), merged), (3, 3))
+
+    def test_policy_err(self):
+        with self.assertRaises(ValueError):
+            coalesce(self.metrics, 'median')
+        with self.assertRaises(ValueError):
+            ZabbixSender(coalesce='median')
+
+    def test_send(self):
+        with FakeTrapper() as trapper:
+            zs = ZabbixSender(*trapper.server_address, chunk_size=2,
+                              coalesce='max')
+            result = zs.send(self.metrics)
+
+        self.assertEqual((result.processed, result.merged), (3, 3))
+        self.assertEqual([d['value'] for r in trapper.requests
+                          for d in r['data']], ['4', 'y', '5'])
+
+    def test_send_workers(self):
+        with FakeTrapper() as trapper:
+            with ZabbixSender(*trapper.server_address, chunk_size=1,
+                              workers=2, coalesce='last') as zs:
+                result = zs.send(self.metrics)
+
+        self.assertEqual((result.processed, result.merged), (3, 3))
@@ -0,0 +1,207 @@
+import os
+import shutil
+import socket
+import tempfile
+
+from unittest import TestCase
+# Python 2 and 3 compatibility
+try:
+    from mock import patch
+except ImportError:
+    from unittest.mock import patch
+
+from pyzabbix import (ZabbixMetric, ZabbixResponse, ZabbixSender,
+                      ZabbixSpool, protocol)
+
+from .servers import FakeTrapper
+from .test_dispatch import closed_port
+
+
+def failing_after(count, sent):
+    """Send function which delivers `count` packets into `sent`, then
+    fails."""
+
+    def send(packet):
+        if len(sent) >= count:
+            raise socket.error('down')
+        sent.append(packet)
+
+    return send
+
+
+class TestZabbixSpool(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'spool')
+        self.packets = [protocol.pack(('{"n":%d}' % i).encode())
+                        for i in range(5)]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_replay(self):
+        spool = ZabbixSpool(self.path)
+        for packet in self.packets:
+            self.assertTrue(spool.append(packet))
+        self.assertEqual(len(spool), 5)
+
+        sent = []
+        self.assertEqual(spool.replay(sent.append), 5)
+        self.assertEqual(sent, self.packets)
+        self.assertEqual((spool.pending, spool.size), (0, 0))
+
+    def test_replay_stops_on_error(self):
+        spool = ZabbixSpool(self.path)
+        for packet in self.packets:
+            spool.append(packet)
+
+        with self.assertRaises(socket.error):
+            spool.replay(failing_after(2, []))
+        self.assertEqual(len(spool), 3)
+
+        sent = []
+        self.assertEqual(spool.replay(sent.append), 3)
+        self.assertEqual(sent, self.packets[2:])
+
+    def test_restart(self):
+        spool = ZabbixSpool(self.path)
+        for packet in self.packets:
+            spool.append(packet)
+        with self.assertRaises(socket.error):
+            spool.replay(failing_after(2, []))
+        spool.close()
+
+        spool = ZabbixSpool(self.path)
+        self.assertEqual(len(spool), 3)
+        sent = []
+        spool.replay(sent.append)
+        self.assertEqual(sent, self.packets[2:])
+
+    def test_recover_partial_packet(self):
+        spool = ZabbixSpool(self.path)
+        spool.append(self.packets[0])
+        spool.close()
+        with open(self.path, 'ab') as f:
+            f.write(self.packets[1][:-2])
+
+        spool = ZabbixSpool(self.path)
+        self.assertEqual(spool.size, len(self.packets[0]))
+        spool.append(self.packets[2])
+        sent = []
+        spool.replay(sent.append)
+        self.assertEqual(sent, [self.packets[0], self.packets[2]])
+
+    def test_max_size(self):
+        size = len(self.packets[0])
+        spool = ZabbixSpool(self.path, max_size=size * 3)
+        for packet in self.packets[:3]:
+            self.assertTrue(spool.append(packet))
+        self.assertFalse(spool.append(self.packets[3]))
+        self.assertEqual(spool.dropped, 1)
+
+        # Delivered packets are compacted away to free space
+        with self.assertRaises(socket.error):
+            spool.replay(failing_after(1, []))
+        self.assertTrue(spool.append(self.packets[4]))
+        self.assertEqual(spool.size, size * 3)
+
+        sent = []
+        spool.replay(sent.append)
+        self.assertEqual(sent, [self.packets[1], self.packets[2],
+                                self.packets[4]])
+
+
+class TestZabbixSenderRetry(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'spool')
+        self.metrics = [ZabbixMetric('host', 'key%d' % i, i, 1457358608)
+                        for i in range(10)]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_retry(self):
+        with FakeTrapper() as trapper:
+            zs = ZabbixSender(*trapper.server_address, chunk_size=5,
+                              retries=2, retry_backoff=0.01)
+            original = zs._chunk_send
+            failures = [socket.timeout(), socket.error('reset')]
+
+            def chunk_send(metrics, accepted=None):
+                if failures:
+                    raise failures.pop(0)
+                return original(metrics, accepted)
+
+            with patch.object(zs, '_chunk_send', side_effect=chunk_send):
+                result = zs.send(self.metrics)
+
+        self.assertEqual(result.processed, 10)
+        self.assertEqual(trapper.values, 10)
+
+    def test_retries_exhausted(self):
+        zs = ZabbixSender(*closed_port(), retries=1, retry_backoff=0.01)
+        with patch('pyzabbix.sender.time.sleep') as mock_sleep:
+            with self.assertRaises(socket.error):
+                zs.send(self.metrics)
+        self.assertEqual(mock_sleep.call_count, 1)
+        self.assertLessEqual(mock_sleep.call_args[0][0], 0.01)
+
+    def test_rejected_not_retried(self):
+        zs = ZabbixSender(retries=3)
+        rejected = socket.error({'response': 'failed'})
+        with patch.object(zs, '_chunk_send', side_effect=rejected) as send:
+            with self.assertRaises(socket.error):
+                zs.send(self.metrics)
+        self.assertEqual(send.call_count, 1)
+
+    def test_spool_and_replay(self):
+        zs = ZabbixSender(*closed_port(), chunk_size=4, spool=self.path,
+                          request_clock=True)
+        result = zs.send(self.metrics)
+        self.assertEqual((result.chunk, result.spooled), (0, 3))
+        self.assertEqual(result.spooled_values, len(self.metrics))
+        zs.spool.close()
+
+        # Replay goes on in a new process
+        with FakeTrapper() as trapper:
+            zs = ZabbixSender(*trapper.server_address, chunk_size=4,
+                              spool=self.path)
+            result = zs.send(self.metrics[:2])
+
+        # Replayed chunks are in the result too
+        self.assertEqual((result.chunk, result.processed), (4, 12))
+        self.assertEqual(zs.spool.pending, 0)
+        keys = [d['key'] for r in trapper.requests for d in r['data']]
+        self.assertEqual(keys, [m.key for m in self.metrics] +
+                         ['key0', 'key1'])
+        # Spooled chunks do not carry stale request clock
+        self.assertNotIn('clock', trapper.requests[0])
+        self.assertEqual(trapper.requests[0]['data'][0],
+                         {'host': 'host', 'key': 'key0', 'value': '0',
+                          'clock': 1457358608})
+
+    def test_spool_keeps_order(self):
+        zs = ZabbixSender(*closed_port(), chunk_size=5, spool=self.path)
+        zs.send(self.metrics[:5])
+        with FakeTrapper() as trapper:
+            zs.zabbix_uri = [trapper.server_address]
+            with patch.object(zs, 'replay_spool',
+                              return_value=ZabbixResponse()):
+                result = zs.send(self.metrics[5:])
+            # Spool is not empty, so new chunk goes after spooled one
+            self.assertEqual(result.spooled, 1)
+            self.assertEqual(trapper.values, 0)
+
+            result = zs.replay_spool()
+        self.assertEqual(result.chunk, 2)
+        keys = [d['key'] for r in trapper.requests for d in r['data']]
+        self.assertEqual(keys, [m.key for m in self.metrics])
+
+    def test_spool_workers(self):
+        zs = ZabbixSender(*closed_port(), chunk_size=2, workers=3,
+                          spool=self.path)
+        result = zs.send(self.metrics)
+        zs.close()
+        self.assertEqual(result.spooled, 5)
+        self.assertEqual(len(zs.spool), 5)